@@ -0,0 +1,634 @@
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from PIL import Image, ImageDraw
+
+import cards
+import catalog_schema
+import covers
+import duplicates
+import facets
+import snapshots
+import storage
+from search_index import SearchIndex
+
+# Vocabulary for synthetic catalogs
+TITLE_NOUNS = [
+    "الأيام", "رحلة", "مدينة", "الحب", "تاريخ", "أسرار", "الحرب", "السلام", "البحر", "الصحراء",
+    "ذاكرة", "الجسد", "حديقة", "الأمير", "رسائل", "قصة", "ليالي", "الطريق", "الشمس", "القمر",
+    "مقدمة", "الفلسفة", "العلم", "الإيمان", "ثلاثية", "زقاق", "المدق", "موسم", "الهجرة", "عودة",
+    "الروح", "أصوات", "الليل", "النهر", "الغريب", "بيت", "الخبز", "شرق", "أولاد", "الحكاية",
+    "الضوء", "الجبل", "الريح", "الوطن", "المنفى", "نافذة", "ظلال", "أحلام", "سيرة", "حكايات",
+]
+TITLE_ADJECTIVES = [
+    "الأخيرة", "الضائعة", "الكبير", "الصغيرة", "المنسية", "البعيدة", "الجديدة", "القديمة",
+    "الذهبية", "السوداء", "البيضاء", "الحزينة", "الأولى", "الطويلة", "الخالدة", "المجهولة",
+]
+PLACES = [
+    "القاهرة", "بغداد", "دمشق", "بيروت", "الأندلس", "غرناطة", "مكة", "تونس", "فاس", "الخرطوم",
+    "عمّان", "القدس", "الإسكندرية", "حلب", "صنعاء", "مراكش",
+]
+FIRST_NAMES = [
+    "محمد", "أحمد", "نجيب", "طه", "غسان", "رضوى", "أحلام", "جبران", "مصطفى", "عباس",
+    "الطيب", "يوسف", "إبراهيم", "عبد الرحمن", "توفيق", "إحسان", "حنان", "نوال", "سحر", "ليلى",
+    "خالد", "عمر", "علي", "حسن", "سعاد", "فدوى", "محمود", "نزار", "أمين", "جمال",
+]
+FAMILY_NAMES = [
+    "حسين", "محفوظ", "كنفاني", "عاشور", "مستغانمي", "خليل جبران", "محمود", "العقاد", "صالح", "إدريس",
+    "الحكيم", "عبد القدوس", "الشيخ", "السعداوي", "خليفة", "بعلبكي", "درويش", "طوقان", "قباني", "معلوف",
+    "الغيطاني", "منيف", "الكوني", "جابر", "المنسي", "الخراط", "البساطي", "زيدان", "الأسواني", "النجار",
+]
+CLASSICAL_AUTHORS = ["ابن خلدون", "ابن رشد", "ابن سينا", "الجاحظ", "المتنبي", "أبو حيان التوحيدي"]
+NOTE_PHRASES = [
+    "كتاب ممتع", "أسلوب جميل", "يستحق القراءة مرة أخرى", "بداية بطيئة", "نهاية مؤثرة", "معلومات مفيدة",
+    "لغة صعبة", "أنصح به", "شخصيات عميقة", "ترجمة ضعيفة", "طويل بعض الشيء", "من أجمل ما قرأت",
+]
+CATEGORIES = storage.CATEGORIES
+STATUSES = storage.STATUSES
+
+# Shares of the synthetic catalog: books in a numbered volume, by a classical
+# author, with notes and (when covers are given) with a cover
+VOLUME_SHARE = 0.05
+CLASSICAL_SHARE = 0.05
+NOTES_SHARE = 0.7
+COVER_SHARE = 0.5
+# Reading lists are mostly unread, and ratings lean towards 4
+STATUS_WEIGHTS = [0.3, 0.1, 0.6]
+RATING_WEIGHTS = [0.05, 0.1, 0.25, 0.35, 0.25]
+
+# Queries used for the search comparison
+SEARCH_TERMS = ["الأيام", "محفوظ", "رحلة البحر", "ابن", "مدينه", "ذاكرة الجسد"]
+
+
+# Function to draw `rows` values from a vocabulary as an object array
+def pick(rng, values, rows, weights=None):
+    return np.array(values, dtype=object)[rng.choice(len(values), rows, p=weights)]
+
+
+# Function to generate a synthetic catalog with the app's columns
+# Titles follow a few common Arabic title patterns and authors combine first
+# and family names; statuses and ratings are skewed like a real reading list.
+# With cover_names, about COVER_SHARE of the books get one of those covers.
+def generate_catalog(rows, seed=0, cover_names=None):
+    rng = np.random.default_rng(seed)
+    nouns = pick(rng, TITLE_NOUNS, rows)
+    patterns = [
+        nouns,
+        nouns + " " + pick(rng, TITLE_ADJECTIVES, rows),
+        nouns + " في " + pick(rng, PLACES, rows),
+        nouns + " و" + pick(rng, TITLE_NOUNS, rows),
+        "رحلة إلى " + pick(rng, PLACES, rows),
+        nouns + " " + pick(rng, TITLE_NOUNS, rows) + " " + pick(rng, TITLE_ADJECTIVES, rows),
+    ]
+    titles = np.choose(rng.integers(0, len(patterns), rows), patterns)
+    volumes = rng.random(rows) < VOLUME_SHARE
+    titles[volumes] = titles[volumes] + " - الجزء " + rng.integers(2, 6, volumes.sum()).astype(str).astype(object)
+
+    authors = pick(rng, FIRST_NAMES, rows) + " " + pick(rng, FAMILY_NAMES, rows)
+    classical = rng.random(rows) < CLASSICAL_SHARE
+    authors[classical] = pick(rng, CLASSICAL_AUTHORS, classical.sum())
+
+    # Two different phrases per note
+    first = rng.integers(0, len(NOTE_PHRASES), rows)
+    second = (first + rng.integers(1, len(NOTE_PHRASES), rows)) % len(NOTE_PHRASES)
+    phrases = np.array(NOTE_PHRASES, dtype=object)
+    notes = phrases[first] + "، " + phrases[second]
+    notes[rng.random(rows) >= NOTES_SHARE] = ""
+
+    covers_column = np.full(rows, None, dtype=object)
+    if cover_names:
+        with_cover = rng.random(rows) < COVER_SHARE
+        covers_column[with_cover] = pick(rng, cover_names, with_cover.sum())
+
+    published = np.datetime64("1900-01-01") + rng.integers(0, 125 * 365, rows)
+    added = np.datetime64("2015-01-01") + rng.integers(0, 10 * 365, rows)
+    return pd.DataFrame({
+        "عنوان": titles,
+        "مؤلف": authors,
+        "تصنيف": pick(rng, CATEGORIES, rows),
+        "تاريخ النشر": published.astype(str).astype(object),
+        "عدد الصفحات": np.clip(rng.lognormal(5.5, 0.5, rows), 40, 1500).astype(int),
+        "الحالة": pick(rng, STATUSES, rows, STATUS_WEIGHTS),
+        "التقييم": rng.choice(np.arange(1, 6), rows, p=RATING_WEIGHTS),
+        "ملاحظات": notes,
+        "تاريخ الإضافة": added.astype(str).astype(object),
+        "صورة الغلاف": covers_column,
+    })
+
+
+# Cover sizes generated for the suite, from a small scan to a phone photo
+COVER_SIZES = [(300, 450), (600, 900), (1200, 1800), (2000, 3000)]
+COVER_FORMATS = ["JPEG", "PNG"]
+
+
+# Function to generate a synthetic cover: coloured shapes over a little noise,
+# so that the encoders have some texture to work on
+def generate_cover(rng, size, image_format):
+    width, height = size
+    img = Image.new("RGB", size, tuple(rng.integers(0, 256, 3).tolist()))
+    draw = ImageDraw.Draw(img)
+    for _ in range(12):
+        x0, x1 = sorted(rng.integers(0, width, 2).tolist())
+        y0, y1 = sorted(rng.integers(0, height, 2).tolist())
+        shape = draw.ellipse if rng.random() < 0.5 else draw.rectangle
+        shape((x0, y0, x1, y1), fill=tuple(rng.integers(0, 256, 3).tolist()))
+    img = Image.blend(img, Image.effect_noise(size, 40).convert("RGB"), 0.1)
+    buffer = io.BytesIO()
+    img.save(buffer, format=image_format, **({"quality": 90} if image_format == "JPEG" else {}))
+    return buffer.getvalue()
+
+
+# Function to time a callable, returning the median in milliseconds
+def median_ms(func, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+# Function reproducing the original in-memory filter: isin masks for status
+# and category and a str.contains scan of titles and authors
+def legacy_filter(df, statuses=None, categories=None, search=None):
+    mask = pd.Series(True, index=df.index)
+    if statuses:
+        mask &= df["الحالة"].isin(statuses)
+    if categories:
+        mask &= df["تصنيف"].isin(categories)
+    if search:
+        mask &= (
+            df["عنوان"].astype(str).str.contains(search, case=False, regex=False) |
+            df["مؤلف"].astype(str).str.contains(search, case=False, regex=False)
+        )
+    return df[mask]
+
+
+# Search: linear str.contains scan versus the inverted index
+def bench_search(sizes):
+    print(f"{'rows':>9} {'str.contains ms':>16} {'index build s':>14} {'index search ms':>16}")
+    for rows in sizes:
+        df = generate_catalog(rows)
+        scan = statistics.median(
+            median_ms(lambda: legacy_filter(df, search=term), repeat=3) for term in SEARCH_TERMS
+        )
+        index = SearchIndex()
+        start = time.perf_counter()
+        index.rebuild(df)
+        build = time.perf_counter() - start
+        lookup = statistics.median(
+            median_ms(lambda: index.search(term), repeat=20) for term in SEARCH_TERMS
+        )
+        print(f"{rows:>9} {scan:>16.2f} {build:>14.2f} {lookup:>16.3f}")
+
+
+# Function reproducing the original per-row card loop (iterrows + f-string)
+def legacy_cards_html(df, cover_uri):
+    blocks = []
+    for _, book in df.iterrows():
+        stars = "⭐" * int(book["التقييم"])
+        status_color = {
+            "تمت القراءة": "#28a745",
+            "قيد القراءة": "#ffc107",
+            "لم تتم القراءة بعد": "#6c757d"
+        }
+        uri = cover_uri(book["صورة الغلاف"]) if pd.notna(book.get("صورة الغلاف")) and book["صورة الغلاف"] else None
+        cover_img_html = f'<img src="{uri}" class="book-cover" alt="غلاف الكتاب">' if uri else cards.NO_COVER_HTML
+        blocks.append(f"""
+            <div class="book-card">
+                {cover_img_html}
+                <div class="book-details">
+                    <h3>{book["عنوان"]}</h3>
+                    <p>المؤلف: {book["مؤلف"]}</p>
+                    <p>التصنيف: {book["تصنيف"]}</p>
+                    <p>تاريخ النشر: {book["تاريخ النشر"]}</p>
+                    <p>عدد الصفحات: {book["عدد الصفحات"]}</p>
+                    <p>الحالة: <span style="color: {status_color.get(book["الحالة"], "#000")};">{book["الحالة"]}</span></p>
+                    <p>التقييم: {stars}</p>
+                    <p>ملاحظات: {book["ملاحظات"]}</p>
+                    <p><small>تاريخ الإضافة: {book["تاريخ الإضافة"]}</small></p>
+                </div>
+            </div>
+            """)
+    return blocks
+
+
+# Card HTML: the original iterrows loop versus the column-wise renderer
+def bench_cards(sizes):
+    print(f"{'cards':>9} {'iterrows ms':>12} {'vectorised ms':>14} {'ms per 1k (old/new)':>22}")
+    no_cover = lambda name: None
+    for rows in sizes:
+        df = generate_catalog(rows)
+        legacy = median_ms(lambda: legacy_cards_html(df, no_cover), repeat=3)
+        batched = median_ms(lambda: cards.render_cards_html(df, no_cover), repeat=3)
+        per_k = f"{legacy * 1000 / rows:.2f}/{batched * 1000 / rows:.2f}"
+        print(f"{rows:>9} {legacy:>12.2f} {batched:>14.2f} {per_k:>22}")
+
+
+# Memory and status/category filter time: default dtypes versus the typed schema
+def bench_schema(sizes):
+    print(f"{'rows':>9} {'default MB':>11} {'typed MB':>9} {'ratio':>6} {'isin ms (default/typed)':>24}")
+    for rows in sizes:
+        df = generate_catalog(rows)
+        typed = catalog_schema.apply_schema(df)
+        before = df.memory_usage(deep=True).sum() / 2**20
+        after = typed.memory_usage(deep=True).sum() / 2**20
+        statuses = STATUSES[:2]
+        categories = CATEGORIES[:3]
+        plain = median_ms(lambda: legacy_filter(df, statuses, categories))
+        compact = median_ms(lambda: legacy_filter(typed, statuses, categories))
+        print(f"{rows:>9} {before:>11.1f} {after:>9.1f} {before / after:>6.1f} {f'{plain:.2f}/{compact:.2f}':>24}")
+
+
+# Storage formats: file size and full load, CSV versus Parquet
+def bench_formats(sizes):
+    print(f"{'rows':>9} {'csv MB':>7} {'parquet MB':>11} {'csv load ms':>12} {'parquet load ms':>16}")
+    with tempfile.TemporaryDirectory() as folder:
+        for rows in sizes:
+            df = generate_catalog(rows).set_axis(range(1, rows + 1))
+            csv_path = os.path.join(folder, f"books_{rows}.csv")
+            parquet_path = os.path.join(folder, f"books_{rows}.parquet")
+            storage.write_atomic(catalog_schema.apply_schema(df), csv_path)
+            storage.write_parquet_atomic(df, parquet_path)
+            csv_backend = storage.CsvBackend(csv_path)
+            parquet_backend = storage.ParquetBackend(parquet_path)
+            csv_load = median_ms(csv_backend.read_all, repeat=3)
+            parquet_load = median_ms(parquet_backend.read_all, repeat=3)
+            print(
+                f"{rows:>9} {os.path.getsize(csv_path) / 2**20:>7.1f} {os.path.getsize(parquet_path) / 2**20:>11.1f} "
+                f"{csv_load:>12.1f} {parquet_load:>16.1f}"
+            )
+
+
+# Duplicate detection: building the index (on the first lookup), add-time
+# lookups of slightly misspelt titles and the whole-catalog cluster report
+# The synthetic titles are drawn from a limited vocabulary, so many cluster
+def bench_duplicates(sizes):
+    print(f"{'rows':>9} {'index build s':>14} {'lookup ms':>10} {'clusters s':>11} {'clusters':>9} {'books':>8}")
+    for rows in sizes:
+        df = catalog_schema.apply_schema(generate_catalog(rows).set_axis(range(1, rows + 1)))
+        index = duplicates.DuplicateIndex()
+        index.rebuild(df)
+        keys = [duplicates.book_key(f"{title}ة", author) for title, author in zip(df["عنوان"][:20], df["مؤلف"][:20])]
+        start = time.perf_counter()
+        index.lookup(keys[:1])
+        build = time.perf_counter() - start
+        lookup = statistics.median(median_ms(lambda: index.lookup([key]), repeat=3) for key in keys)
+        start = time.perf_counter()
+        report = duplicates.duplicate_clusters(df)
+        clusters = time.perf_counter() - start
+        print(f"{rows:>9} {build:>14.2f} {lookup:>10.2f} {clusters:>11.2f} {report['cluster'].nunique():>9} {len(report):>8}")
+
+
+# Function to time the snapshot undo log: recording one edited book against
+# the whole catalog, a CSV edit including its record, the compressed history
+# of those edits, and restoring the catalog to before them
+def bench_snapshots(sizes, edits=20):
+    print(f"{'rows':>9} {'record ms':>10} {'edit ms':>8} {'history KiB':>12} {'restore s':>10}")
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as folder:
+            backend = storage.CsvBackend(os.path.join(folder, "books.csv"))
+            backend.save(generate_catalog(rows).set_axis(range(1, rows + 1)))
+            df = backend.load()
+            record = median_ms(lambda: backend.record_snapshot(df, [("edit", rows // 2, None)]))
+            shutil.rmtree(backend.snapshots.folder)
+            at = snapshots.timestamp()
+            keys = np.random.default_rng(0).choice(df.index.to_numpy(), edits, replace=False)
+            titles = [df.at[key, "عنوان"] for key in keys]
+            times = [elapsed_ms(lambda: backend.update(key, title, {"التقييم": 1})) for key, title in zip(keys, titles)]
+            history = backend.snapshots.size() / 1024
+            start = time.perf_counter()
+            backend.restore(at)
+            restore = time.perf_counter() - start
+            print(f"{rows:>9} {record:>10.2f} {statistics.median(times):>8.2f} {history:>12.1f} {restore:>10.2f}")
+
+
+# Function to time the facet indexes: building them (on the first query), the
+# status/category filter against the isin masks they replace, all five facets
+# at once, an OR of two facets, a sorted query and patching them for an edit
+def bench_facets(sizes):
+    print(
+        f"{'rows':>9} {'build s':>8} {'isin ms':>8} {'facet ms':>9} {'all ms':>7} "
+        f"{'any ms':>7} {'sorted ms':>10} {'edit ms':>8}"
+    )
+    for rows in sizes:
+        df = catalog_schema.apply_schema(generate_catalog(rows).set_axis(range(1, rows + 1)))
+        index = facets.FacetIndex()
+        index.rebuild(df)
+        build = elapsed_ms(lambda: index.query({})) / 1000
+        isin = median_ms(lambda: legacy_filter(df, STATUSES[:1], CATEGORIES[:2]))
+        facet = median_ms(lambda: index.query({"status": STATUSES[:1], "category": CATEGORIES[:2]}))
+        every = median_ms(lambda: index.query({
+            "status": STATUSES[:1], "category": CATEGORIES[:1], "rating": [4, 5],
+            "author": list(df["مؤلف"][:3]), "year": (1900, 1950),
+        }))
+        either = median_ms(lambda: index.query({"status": STATUSES[:1], "rating": [5]}, match="any"))
+        index.query({}, sort="rating")
+        ordered = median_ms(lambda: index.query({"category": CATEGORIES[:1]}, sort="rating", descending=True))
+        changes = [("edit", rows // 2, {"التقييم": 1, "الحالة": STATUSES[0]})]
+        edited = storage.apply_changes(df, changes)
+        edit = elapsed_ms(lambda: index.apply(changes, edited))
+        print(
+            f"{rows:>9} {build:>8.2f} {isin:>8.2f} {facet:>9.2f} {every:>7.2f} "
+            f"{either:>7.2f} {ordered:>10.2f} {edit:>8.2f}"
+        )
+
+
+# Catalog files of the suite, named like the app's defaults so that the
+# headless app run finds the CSV catalog
+SUITE_FILES = {"csv": "books_data.csv", "sqlite": "books_data.db", "parquet": "books_data.parquet"}
+SUITE_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+# Books per page of rendered cards
+SUITE_PAGE_SIZE = 20
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main2.py")
+
+
+# Function to time one call in milliseconds
+def elapsed_ms(func):
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1000
+
+
+# Function to generate covers of every size and format into a covers folder
+# and process them as an upload would be (orientation, scaling, re-encoding
+# and thumbnails), timing each one
+# Returns the cover filenames and the median timings per size and format
+def bench_cover_encoding(books_folder, count, seed=0):
+    rng = np.random.default_rng(seed)
+    names = []
+    timings = {}
+    for number in range(count):
+        size = COVER_SIZES[number % len(COVER_SIZES)]
+        image_format = COVER_FORMATS[number // len(COVER_SIZES) % len(COVER_FORMATS)]
+        data = generate_cover(rng, size, image_format)
+        name = covers.content_name(data, image_format)
+        timing = timings.setdefault(f"{size[0]}x{size[1]} {image_format}", {"upload_kb": [], "process_ms": []})
+        timing["upload_kb"].append(len(data) / 1024)
+        timing["process_ms"].append(elapsed_ms(lambda: covers.process_cover(books_folder, name, data)))
+        names.append(name)
+    return names, {
+        label: {"count": len(timing["process_ms"]), **{key: statistics.median(values) for key, values in timing.items()}}
+        for label, timing in timings.items()
+    }
+
+
+# Function to render a page of cards with inline cover thumbnails, as the app
+# does with COVER_SERVING = "inline"
+def render_page(page_df, books_folder):
+    def cover_uri(name):
+        thumbnail = covers.get_thumbnail(books_folder, name)
+        payload = covers.payload_cache.get(os.path.join(books_folder, thumbnail)) if thumbnail else None
+        return f"data:{covers.image_mime(thumbnail)};base64,{payload}" if payload else None
+    return cards.render_cards_html(page_df, cover_uri)
+
+
+# Function to run the app headlessly on the catalog in `folder` (Streamlit's
+# AppTest runs the script in this process, without a browser) and time the
+# first run, a plain rerun, a status filter and a search
+def bench_app(folder, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    cwd = os.getcwd()
+    os.chdir(folder)
+    try:
+        app = AppTest.from_file(MAIN_SCRIPT, default_timeout=timeout)
+        results = {"first_run_ms": elapsed_ms(app.run)}
+        results["rerun_ms"] = statistics.median(elapsed_ms(app.run) for _ in range(3))
+        app.multiselect[0].select(STATUSES[0])
+        results["filter_rerun_ms"] = elapsed_ms(app.run)
+        app.text_input[0].input(SEARCH_TERMS[0])
+        results["search_rerun_ms"] = elapsed_ms(app.run)
+        results["errors"] = [exception.value for exception in app.exception]
+    finally:
+        os.chdir(cwd)
+    return results
+
+
+# Function to measure one catalog size: saving and loading the whole catalog,
+# adding a book, the filter and search queries behind "عرض الكتب", rendering
+# a page of cards (with cold and warm cover caches) and, for CSV, the app
+# itself run headlessly
+def bench_suite_size(rows, backend_name, folder, cover_names, app_timeout):
+    repeat = 1 if rows >= 1_000_000 else 3
+    df = catalog_schema.apply_schema(generate_catalog(rows, cover_names=cover_names).set_axis(range(1, rows + 1)))
+    backend = storage.open_backend(backend_name, os.path.join(folder, SUITE_FILES[backend_name]))
+    results = {"rows": rows}
+    results["save_data_ms"] = statistics.median(elapsed_ms(lambda: backend.save(df)) for _ in range(repeat))
+    results["file_mb"] = os.path.getsize(backend.path) / 2**20
+
+    def cold_load():
+        backend.invalidate()
+        backend.load()
+    results["load_data_cold_ms"] = statistics.median(elapsed_ms(cold_load) for _ in range(repeat))
+    results["load_data_warm_ms"] = median_ms(backend.load)
+    new_book = generate_catalog(1, seed=rows).iloc[0].to_dict()
+    results["add_book_ms"] = median_ms(lambda: backend.add(new_book))
+
+    results["filter_ms"] = median_ms(lambda: backend.facet_query({"status": STATUSES[:1], "category": CATEGORIES[:2]}))
+    results["search_ms"] = statistics.median(median_ms(lambda: backend.facet_query({}, search=term), repeat=3) for term in SEARCH_TERMS)
+
+    page_df = backend.load().iloc[:SUITE_PAGE_SIZE]
+    books_folder = os.path.join(folder, "books")
+
+    def cold_cards():
+        covers.payload_cache.resize(0)
+        covers.payload_cache.resize(covers.PAYLOAD_CACHE_BYTES)
+        render_page(page_df, books_folder)
+    results["cards_cold_ms"] = median_ms(cold_cards, repeat=3)
+    results["cards_warm_ms"] = median_ms(lambda: render_page(page_df, books_folder))
+    results["cards_html_kb"] = len(render_page(page_df, books_folder).encode("utf-8")) / 1024
+
+    if backend_name == "csv":
+        results["app"] = bench_app(folder, app_timeout)
+    return results
+
+
+# Function to compare a suite result with an earlier one, metric by metric
+# Ratios above 1 mean the current run is slower
+def compare_results(baseline, current):
+    print(f"{'rows':>9} {'metric':<22} {'baseline':>11} {'current':>11} {'ratio':>7}")
+    for rows, metrics in current["sizes"].items():
+        before = baseline.get("sizes", {}).get(rows)
+        if before is None:
+            continue
+        flat_now = {**metrics, **{f"app.{key}": value for key, value in metrics.get("app", {}).items()}}
+        flat_before = {**before, **{f"app.{key}": value for key, value in before.get("app", {}).items()}}
+        for metric, value in flat_now.items():
+            old = flat_before.get(metric)
+            if metric.endswith("_ms") and isinstance(old, (int, float)) and old:
+                print(f"{rows:>9} {metric:<22} {old:>11.2f} {value:>11.2f} {value / old:>7.2f}")
+
+
+# The whole suite: cover encoding once, then every catalog size in a fresh
+# folder; results are printed, saved as JSON and optionally compared with a
+# previous results file
+def bench_suite(sizes, backend_name, cover_count, output, baseline=None, app_timeout=600):
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pandas": pd.__version__,
+        "backend": backend_name,
+        "sizes": {},
+    }
+    with tempfile.TemporaryDirectory() as covers_folder:
+        cover_names, results["covers"] = bench_cover_encoding(covers_folder, cover_count)
+        print(f"{'cover':>16} {'count':>6} {'upload KB':>10} {'process ms':>11}")
+        for label, timing in results["covers"].items():
+            print(f"{label:>16} {timing['count']:>6} {timing['upload_kb']:>10.1f} {timing['process_ms']:>11.1f}")
+
+        print(
+            f"{'rows':>9} {'save ms':>9} {'cold load ms':>13} {'add ms':>8} {'filter ms':>10} "
+            f"{'search ms':>10} {'cards ms (cold/warm)':>21} {'app first/rerun ms':>19}"
+        )
+        for rows in sizes:
+            with tempfile.TemporaryDirectory() as folder:
+                # Every catalog shares the same generated covers
+                shutil.copytree(covers_folder, os.path.join(folder, "books"))
+                size = bench_suite_size(rows, backend_name, folder, cover_names, app_timeout)
+            results["sizes"][str(rows)] = size
+            app = size.get("app", {})
+            app_times = f"{app['first_run_ms']:.0f}/{app['rerun_ms']:.0f}" if app else "-"
+            card_times = f"{size['cards_cold_ms']:.1f}/{size['cards_warm_ms']:.1f}"
+            print(
+                f"{rows:>9} {size['save_data_ms']:>9.1f} {size['load_data_cold_ms']:>13.1f} {size['add_book_ms']:>8.2f} "
+                f"{size['filter_ms']:>10.2f} {size['search_ms']:>10.2f} "
+                f"{card_times:>21} {app_times:>19}"
+            )
+            for error in app.get("errors", []):
+                print(f"  app error: {error}")
+
+    with open(output, "w", encoding="utf-8") as output_file:
+        json.dump(results, output_file, ensure_ascii=False, indent=2)
+    print(f"Results saved to {output}")
+    if baseline:
+        with open(baseline, "r", encoding="utf-8") as baseline_file:
+            compare_results(json.load(baseline_file), results)
+
+
+# Function run by each stress-test process: several threads that add books,
+# edit their own books from stale copies and race on the notes of book 1
+def stress_writer(backend_name, path, writer, threads, books):
+    backend = storage.open_backend(backend_name, path)
+    conflicts = []
+
+    def run(thread):
+        tag = f"w{writer}t{thread}"
+        for number in range(books):
+            backend.add({**generate_catalog(1, seed=number).iloc[0].to_dict(), "عنوان": f"{tag}-{number}", "عدد الصفحات": 1})
+            own = backend.ids_for_title(f"{tag}-{number}")
+            key = next(iter(own))
+            base_version = backend.catalog_version()
+            base = backend.get_book(key).to_dict()
+            backend.update(key, base["عنوان"], {"عدد الصفحات": 2}, base, base_version)
+            shared_version = backend.catalog_version()
+            shared = backend.get_book(1).to_dict()
+            time.sleep(0.001)
+            try:
+                backend.update(1, shared["عنوان"], {"ملاحظات": f"{tag}-{number}"}, shared, shared_version)
+            except storage.EditConflict:
+                conflicts.append(tag)
+
+    workers = [threading.Thread(target=run, args=(thread,)) for thread in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return len(conflicts)
+
+
+# Catalog file of each backend in the concurrency check
+CONCURRENCY_FILES = {"csv": "books.csv", "sqlite": "books.db", "parquet": "books.parquet"}
+
+
+# Function to run processes x threads writers adding and editing one catalog
+# in folder, and count the books lost, duplicated or whose stale but
+# non-conflicting edit was not merged; stats tells whether the maintained
+# statistics match a recount
+def concurrency_check(backend_name, folder, books, processes, threads):
+    path = os.path.join(folder, CONCURRENCY_FILES[backend_name])
+    seed = storage.open_backend(backend_name, path)
+    seed.add({**generate_catalog(1).iloc[0].to_dict(), "عنوان": "shared"})
+    start = time.perf_counter()
+    with ProcessPoolExecutor(processes) as pool:
+        conflicts = sum(pool.map(
+            stress_writer, [backend_name] * processes, [path] * processes, range(processes),
+            [threads] * processes, [books] * processes
+        ))
+    elapsed = time.perf_counter() - start
+    seed.invalidate()
+    df = seed.load()
+    titles = df["عنوان"].value_counts()
+    expected = {f"w{p}t{t}-{n}" for p in range(processes) for t in range(threads) for n in range(books)}
+    return {
+        "books": len(expected),
+        "seconds": elapsed,
+        "lost": len(expected - set(titles.index)),
+        "duplicated": int((titles[titles.index.isin(expected)] > 1).sum()),
+        "unmerged": int((df.loc[df["عنوان"].isin(expected), "عدد الصفحات"] != 2).sum()),
+        "conflicts": conflicts,
+        "stats": seed.verify_stats(),
+    }
+
+
+# Concurrent writers: processes x threads adding and editing one catalog
+# Checks that no book is lost or duplicated, that non-conflicting stale
+# edits are merged, and that the maintained stats match a recount
+def bench_concurrency(books, processes, threads):
+    print(f"{'backend':>8} {'writers':>8} {'books':>6} {'seconds':>8} {'lost':>5} {'dup':>4} {'unmerged':>9} {'conflicts':>10} {'stats':>6}")
+    for backend_name in CONCURRENCY_FILES:
+        with tempfile.TemporaryDirectory() as folder:
+            result = concurrency_check(backend_name, folder, books, processes, threads)
+        print(
+            f"{backend_name:>8} {processes * threads:>8} {result['books']:>6} {result['seconds']:>8.1f} {result['lost']:>5} "
+            f"{result['duplicated']:>4} {result['unmerged']:>9} {result['conflicts']:>10} {str(result['stats']):>6}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Book tracker benchmarks")
+    parser.add_argument("benchmark", choices=["search", "cards", "schema", "formats", "duplicates", "snapshots", "facets", "concurrency", "suite"])
+    parser.add_argument("--sizes", type=int, nargs="+", default=None, help="catalog sizes (default: 10k 100k 1M; suite: 1k to 1M)")
+    parser.add_argument("--processes", type=int, default=4, help="writer processes (concurrency)")
+    parser.add_argument("--threads", type=int, default=4, help="writer threads per process (concurrency)")
+    parser.add_argument("--backend", choices=list(SUITE_FILES), default="csv", help="storage backend (suite)")
+    parser.add_argument("--covers", type=int, default=16, help="generated covers (suite)")
+    parser.add_argument("--output", default="benchmark_results.json", help="results file (suite)")
+    parser.add_argument("--compare", default=None, help="earlier results file to compare with (suite)")
+    args = parser.parse_args()
+    if args.sizes is None:
+        args.sizes = SUITE_SIZES if args.benchmark == "suite" else [10_000, 100_000, 1_000_000]
+
+    if args.benchmark == "search":
+        bench_search(args.sizes)
+    elif args.benchmark == "cards":
+        bench_cards(args.sizes)
+    elif args.benchmark == "schema":
+        bench_schema(args.sizes)
+    elif args.benchmark == "formats":
+        bench_formats(args.sizes)
+    elif args.benchmark == "duplicates":
+        bench_duplicates(args.sizes)
+    elif args.benchmark == "snapshots":
+        bench_snapshots(args.sizes)
+    elif args.benchmark == "facets":
+        bench_facets(args.sizes)
+    elif args.benchmark == "suite":
+        bench_suite(args.sizes, args.backend, args.covers, args.output, args.compare)
+    elif args.benchmark == "concurrency":
+        # --sizes is the number of books each writer thread adds
+        for books in args.sizes:
+            bench_concurrency(books, args.processes, args.threads)
@@ -0,0 +1,394 @@
+import atexit
+import os
+import re
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+import catalog_schema
+import covers
+import duplicates
+import storage
+
+# Rows read and validated per chunk
+IMPORT_CHUNK_SIZE = 10_000
+
+# Rejected rows kept for the report; the rest are only counted
+MAX_REJECTED_REPORT = 1_000
+
+# Header names accepted besides the Arabic column names
+COLUMN_ALIASES = {
+    "title": "عنوان",
+    "author": "مؤلف",
+    "category": "تصنيف",
+    "published": "تاريخ النشر",
+    "publication_date": "تاريخ النشر",
+    "pages": "عدد الصفحات",
+    "status": "الحالة",
+    "rating": "التقييم",
+    "notes": "ملاحظات",
+    "added": "تاريخ الإضافة",
+}
+
+IMPORT_FORMATS = ["csv", "jsonl", "json", "xlsx"]
+
+WHITESPACE = re.compile(r"\s+")
+
+
+# Function to read an import file chunk by chunk as text columns
+# JSON arrays cannot be parsed incrementally with pandas alone, so they are
+# read whole and then chunked; use JSON Lines for very large files
+def read_chunks(source, file_format, chunk_size=IMPORT_CHUNK_SIZE):
+    if file_format == "csv":
+        yield from pd.read_csv(source, chunksize=chunk_size, dtype=str, keep_default_na=False)
+    elif file_format == "jsonl":
+        yield from pd.read_json(source, lines=True, chunksize=chunk_size, dtype=False)
+    elif file_format == "json":
+        df = pd.read_json(source, dtype=False)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+    elif file_format == "xlsx":
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(source, read_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(name).strip() if name is not None else "" for name in next(rows, [])]
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == chunk_size:
+                yield pd.DataFrame(batch, columns=header)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header)
+        workbook.close()
+    else:
+        raise ValueError(f"Unsupported import format: {file_format}")
+
+
+# Function to clean a text column: trimmed, single spaces, missing values blank
+def clean_text(chunk, column):
+    if column not in chunk.columns:
+        return pd.Series("", index=chunk.index, dtype=object)
+    values = chunk[column].astype(object)
+    values = values.where(values.notna(), "").astype(str)
+    return values.str.replace(WHITESPACE, " ", regex=True).str.strip()
+
+
+# Function to normalise a date column to YYYY-MM-DD, marking unparsable values
+def clean_date(chunk, column, default):
+    text = clean_text(chunk, column)
+    parsed = pd.to_datetime(text.where(text != ""), errors="coerce", format="mixed")
+    dates = parsed.dt.strftime("%Y-%m-%d").where(parsed.notna(), default)
+    invalid = (text != "") & parsed.isna()
+    return dates, invalid
+
+
+# Function to validate and normalise one chunk against the catalog schema
+# Returns the accepted rows (catalog columns only) and a Series of rejection
+# reasons for the rest
+def normalize_chunk(chunk, today=None):
+    today = today or datetime.now().strftime("%Y-%m-%d")
+    chunk = chunk.rename(columns=lambda name: COLUMN_ALIASES.get(str(name).strip().lower(), str(name).strip()))
+    rows = pd.DataFrame(index=chunk.index)
+    reasons = pd.Series("", index=chunk.index, dtype=object)
+
+    def reject(mask, reason):
+        reasons[mask & (reasons == "")] = reason
+
+    rows["عنوان"] = clean_text(chunk, "عنوان")
+    rows["مؤلف"] = clean_text(chunk, "مؤلف")
+    reject(rows["عنوان"] == "", "عنوان مفقود")
+    reject(rows["مؤلف"] == "", "اسم المؤلف مفقود")
+
+    rows["تصنيف"] = clean_text(chunk, "تصنيف").replace("", "أخرى")
+    reject(~rows["تصنيف"].isin(storage.CATEGORIES), "تصنيف غير معروف")
+
+    rows["تاريخ النشر"], invalid_date = clean_date(chunk, "تاريخ النشر", None)
+    reject(invalid_date, "تاريخ نشر غير صالح")
+
+    pages_text = clean_text(chunk, "عدد الصفحات")
+    pages = pd.to_numeric(pages_text.where(pages_text != ""), errors="coerce")
+    reject((pages_text != "") & ~((pages >= 1) & (pages % 1 == 0)), "عدد صفحات غير صالح")
+    rows["عدد الصفحات"] = pages
+
+    rows["الحالة"] = clean_text(chunk, "الحالة").replace("", "لم تتم القراءة بعد")
+    reject(~rows["الحالة"].isin(storage.STATUSES), "حالة قراءة غير معروفة")
+
+    rating_text = clean_text(chunk, "التقييم")
+    ratings = pd.to_numeric(rating_text.where(rating_text != ""), errors="coerce")
+    reject((rating_text != "") & ~(ratings.between(1, 5) & (ratings % 1 == 0)), "تقييم خارج النطاق 1-5")
+    rows["التقييم"] = ratings
+
+    rows["ملاحظات"] = clean_text(chunk, "ملاحظات")
+    rows["تاريخ الإضافة"], invalid_added = clean_date(chunk, "تاريخ الإضافة", today)
+    reject(invalid_added, "تاريخ إضافة غير صالح")
+    rows["صورة الغلاف"] = None
+
+    accepted = reasons == ""
+    rows = rows[accepted]
+    rows = rows.assign(**{
+        "عدد الصفحات": rows["عدد الصفحات"].astype("Int64"),
+        "التقييم": rows["التقييم"].astype("Int64"),
+    })
+    return rows, reasons[~accepted]
+
+
+# Function to import a whole file into the catalog in one committed write
+# Books already in the catalog are looked up in the backend's duplicate
+# index, so memory use is bounded by the chunk size plus the keys of the
+# imported rows
+def import_books(backend, source, file_format, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    seen = set()
+    report = {
+        "read": 0, "imported": 0, "duplicates": 0, "similar": 0, "rejected": 0,
+        "rejected_rows": [], "similar_rows": [],
+    }
+    writer = backend.bulk_writer()
+    try:
+        offset = 0
+        for chunk in read_chunks(source, file_format, chunk_size):
+            chunk = chunk.set_axis(range(offset + 1, offset + len(chunk) + 1))
+            offset += len(chunk)
+            report["read"] += len(chunk)
+
+            rows, reasons = normalize_chunk(chunk)
+            report["rejected"] += len(reasons)
+            room = MAX_REJECTED_REPORT - len(report["rejected_rows"])
+            report["rejected_rows"].extend(
+                {"الصف": row_number, "السبب": reason} for row_number, reason in reasons.iloc[:max(room, 0)].items()
+            )
+
+            # Drop rows already in the catalog or earlier in this file; rows
+            # that only look like a catalog book are imported but reported
+            row_keys = duplicates.book_keys(rows["عنوان"], rows["مؤلف"])
+            fresh = []
+            for row_number, key, matches in zip(rows.index, row_keys, backend.find_duplicates(row_keys)):
+                fresh.append(not matches["exact"] and key not in seen)
+                if not fresh[-1]:
+                    continue
+                seen.add(key)
+                if matches["similar"]:
+                    report["similar"] += 1
+                    if len(report["similar_rows"]) < MAX_REJECTED_REPORT:
+                        book_id, score = matches["similar"][0]
+                        report["similar_rows"].append({
+                            "الصف": row_number,
+                            "العنوان": rows.at[row_number, "عنوان"],
+                            "يشبه": backend.get_book(book_id)["عنوان"],
+                            "التشابه": round(score, 2),
+                        })
+            fresh = pd.Series(fresh, index=rows.index, dtype=bool)
+            report["duplicates"] += int((~fresh).sum())
+            writer.write(rows[fresh])
+
+            if progress:
+                progress(report)
+    except Exception:
+        writer.abort()
+        raise
+    report["imported"] = writer.commit()
+    return report
+
+
+# Rows serialised per chunk when exporting
+EXPORT_CHUNK_SIZE = 10_000
+
+# Export formats with their file extension and mime type
+EXPORT_FORMATS = {
+    "csv": ("csv", "text/csv"),
+    "jsonl": ("jsonl", "application/x-ndjson"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+    "xlsx": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+# Exports are written by background threads so the script thread never waits
+export_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="export")
+
+# Export files are temporary files with this prefix; ones older than
+# EXPORT_MAX_AGE seconds (left by ended sessions or an earlier process) are
+# removed whenever a new export starts
+EXPORT_PREFIX = "books_export_"
+EXPORT_MAX_AGE = 24 * 60 * 60
+
+# Export files of this process, removed when it exits
+live_exports = set()
+live_exports_lock = threading.Lock()
+
+
+# Function to remove a file that may already be gone
+def remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# Function to remove export files older than max_age seconds
+def remove_stale_exports(max_age=EXPORT_MAX_AGE):
+    folder = tempfile.gettempdir()
+    cutoff = time.time() - max_age
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        try:
+            if name.startswith(EXPORT_PREFIX) and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+# Function to remove the export files of this process when it exits
+@atexit.register
+def remove_live_exports():
+    with live_exports_lock:
+        for path in live_exports:
+            remove_file(path)
+        live_exports.clear()
+
+
+# Function to get the rows of a frame in fixed-size chunks, id as the first
+# column and dates in their on-disk text form
+def export_chunks(df, chunk_size):
+    for start in range(0, len(df), chunk_size):
+        chunk = catalog_schema.format_dates(df.iloc[start:start + chunk_size])
+        yield chunk.rename_axis(storage.ID_COLUMN).reset_index()
+
+
+# Function to get the Arrow schema of an export, fixed up front so that every
+# chunk (including ones where a column is entirely empty) writes the same types
+def arrow_schema(df):
+    import pyarrow as pa
+
+    fields = [pa.field(storage.ID_COLUMN, pa.int64())]
+    for column, dtype in df.dtypes.items():
+        if pd.api.types.is_integer_dtype(dtype):
+            fields.append(pa.field(column, pa.int64()))
+        elif pd.api.types.is_float_dtype(dtype):
+            fields.append(pa.field(column, pa.float64()))
+        else:
+            fields.append(pa.field(column, pa.string()))
+    return pa.schema(fields)
+
+
+# Function to write the rows of a frame to a binary stream chunk by chunk
+# progress is called with the number of rows written so far
+def write_export(df, file_format, out, chunk_size=EXPORT_CHUNK_SIZE, progress=None):
+    written = 0
+    if file_format == "csv":
+        # The BOM lets Excel detect UTF-8 and show the Arabic text correctly
+        out.write("\ufeff".encode("utf-8"))
+        out.write((",".join([storage.ID_COLUMN] + list(df.columns)) + "\n").encode("utf-8"))
+        for chunk in export_chunks(df, chunk_size):
+            out.write(chunk.to_csv(header=False, index=False).encode("utf-8"))
+            written += len(chunk)
+            if progress:
+                progress(written)
+    elif file_format == "jsonl":
+        for chunk in export_chunks(df, chunk_size):
+            out.write(chunk.to_json(orient="records", lines=True, force_ascii=False).encode("utf-8"))
+            written += len(chunk)
+            if progress:
+                progress(written)
+    elif file_format == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = arrow_schema(df)
+        with pq.ParquetWriter(out, schema) as writer:
+            for chunk in export_chunks(df, chunk_size):
+                chunk = chunk.astype({field.name: object for field in schema if field.type == pa.string()})
+                chunk = chunk.where(chunk.notna(), None)
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+                written += len(chunk)
+                if progress:
+                    progress(written)
+    elif file_format == "xlsx":
+        from openpyxl import Workbook
+
+        # Write-only workbooks spool rows to disk instead of keeping cell objects
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("الكتب")
+        sheet.append([storage.ID_COLUMN] + list(df.columns))
+        for chunk in export_chunks(df, chunk_size):
+            for row in chunk.itertuples(index=False):
+                sheet.append([storage.plain(value) for value in row])
+            written += len(chunk)
+            if progress:
+                progress(written)
+        workbook.save(out)
+    else:
+        raise ValueError(f"Unsupported export format: {file_format}")
+    return written
+
+
+# Function to write a ZIP holding the export plus the card thumbnail of every
+# cover it references, stored under covers/ with the cover's base name
+def write_export_archive(df, file_format, out, books_folder, chunk_size=EXPORT_CHUNK_SIZE, progress=None):
+    extension = EXPORT_FORMATS[file_format][0]
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as archive:
+        with archive.open(f"books.{extension}", "w") as member:
+            written = write_export(df, file_format, member, chunk_size, progress)
+        cover_names = df["صورة الغلاف"].dropna().unique() if "صورة الغلاف" in df.columns else []
+        for cover_filename in cover_names:
+            thumbnail = covers.get_thumbnail(books_folder, cover_filename)
+            if thumbnail is None:
+                continue
+            stem = os.path.splitext(cover_filename)[0]
+            arcname = f"covers/{stem}{os.path.splitext(thumbnail)[1]}"
+            # Thumbnails are already compressed images
+            archive.write(os.path.join(books_folder, thumbnail), arcname, compress_type=zipfile.ZIP_STORED)
+    return written
+
+
+# An export running in the background into a temporary file
+class ExportJob:
+    def __init__(self, df, file_format, with_covers=False, books_folder=None):
+        extension, mime = EXPORT_FORMATS[file_format]
+        self.total = len(df)
+        self.written = 0
+        self.file_name = f"books_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{'zip' if with_covers else extension}"
+        self.mime = "application/zip" if with_covers else mime
+        remove_stale_exports()
+        handle, self.path = tempfile.mkstemp(prefix=EXPORT_PREFIX, suffix=os.path.splitext(self.file_name)[1])
+        os.close(handle)
+        with live_exports_lock:
+            live_exports.add(self.path)
+        self.future = export_pool.submit(self.run, df, file_format, with_covers, books_folder)
+
+    def run(self, df, file_format, with_covers, books_folder):
+        with open(self.path, "wb") as out:
+            if with_covers:
+                write_export_archive(df, file_format, out, books_folder, progress=self.update)
+            else:
+                write_export(df, file_format, out, progress=self.update)
+        return self.path
+
+    def update(self, written):
+        self.written = written
+
+    def done(self):
+        return self.future.done()
+
+    def error(self):
+        return self.future.exception() if self.future.done() else None
+
+    def fraction(self):
+        return self.written / self.total if self.total else 1.0
+
+    def size(self):
+        return os.path.getsize(self.path)
+
+    # Remove the temporary file once the export is no longer offered
+    def discard(self):
+        self.future.cancel()
+        self.future.add_done_callback(lambda _: self.remove())
+
+    def remove(self):
+        remove_file(self.path)
+        with live_exports_lock:
+            live_exports.discard(self.path)
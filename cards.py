@@ -0,0 +1,74 @@
+import html
+
+import pandas as pd
+
+# Colour of the reading status on a card
+STATUS_COLORS = {
+    "تمت القراءة": "#28a745",
+    "قيد القراءة": "#ffc107",
+    "لم تتم القراءة بعد": "#6c757d"
+}
+
+# Star strings for every possible rating, built once
+STARS = {rating: "⭐" * rating for rating in range(6)}
+
+NO_COVER_HTML = '<div class="no-cover">لا توجد صورة</div>'
+PENDING_COVER_HTML = '<div class="no-cover">جاري معالجة الصورة...</div>'
+
+
+# Function to get a column as HTML-escaped strings, with missing values blank
+def text_column(df, column):
+    values = df[column].astype(object)
+    return values.where(values.notna(), "").astype(str).map(html.escape)
+
+
+# Function to get a date column as YYYY-MM-DD strings, with missing values blank
+def date_column(df, column):
+    if not pd.api.types.is_datetime64_any_dtype(df[column]):
+        return text_column(df, column)
+    return df[column].dt.strftime("%Y-%m-%d").fillna("")
+
+
+# Function to get a numeric column as whole-number strings, with missing values blank
+def number_column(df, column):
+    values = pd.to_numeric(df[column], errors="coerce").round().astype("Int64")
+    return values.astype(str).replace("<NA>", "")
+
+
+# Function to build the cover column: a thumbnail <img> or the no-cover box
+# cover_uri maps a cover filename to a data/static URI (or None when missing);
+# covers named in pending are still being processed and get a placeholder
+def cover_column(df, cover_uri, pending=frozenset()):
+    blocks = []
+    for name in df["صورة الغلاف"]:
+        uri = cover_uri(name) if isinstance(name, str) and name else None
+        if uri:
+            blocks.append(f'<img src="{html.escape(uri)}" class="book-cover" alt="غلاف الكتاب">')
+        else:
+            blocks.append(PENDING_COVER_HTML if name in pending else NO_COVER_HTML)
+    return pd.Series(blocks, index=df.index, dtype=object)
+
+
+# Function to build the HTML of all cards with column-wise string operations
+# Each card is kept on one line so that the joined markdown stays one HTML block
+def render_cards_html(df, cover_uri, pending=frozenset()):
+    if df.empty:
+        return ""
+    ratings = pd.to_numeric(df["التقييم"], errors="coerce").fillna(0).clip(0, 5).astype(int)
+    statuses = text_column(df, "الحالة")
+    status_colors = df["الحالة"].astype(object).map(STATUS_COLORS).fillna("#000")
+    cards = (
+        '<div class="book-card">' + cover_column(df, cover_uri, pending) +
+        '<div class="book-details">' +
+        "<h3>" + text_column(df, "عنوان") + "</h3>" +
+        "<p>المؤلف: " + text_column(df, "مؤلف") + "</p>" +
+        "<p>التصنيف: " + text_column(df, "تصنيف") + "</p>" +
+        "<p>تاريخ النشر: " + date_column(df, "تاريخ النشر") + "</p>" +
+        "<p>عدد الصفحات: " + number_column(df, "عدد الصفحات") + "</p>" +
+        '<p>الحالة: <span style="color: ' + status_colors + ';">' + statuses + "</span></p>" +
+        "<p>التقييم: " + ratings.map(STARS) + "</p>" +
+        "<p>ملاحظات: " + text_column(df, "ملاحظات") + "</p>" +
+        "<p><small>تاريخ الإضافة: " + date_column(df, "تاريخ الإضافة") + "</small></p>" +
+        "</div></div>"
+    )
+    return "\n".join(cards)
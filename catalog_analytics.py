@@ -0,0 +1,166 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Books count as read once they have this status
+READ_STATUS = "تمت القراءة"
+
+# Counters summed per group; every aggregate table has these columns
+COUNTERS = ["books", "read", "pages", "read_pages", "rating_sum", "rating_count"]
+
+# Authors with the most books kept in a snapshot, for the dashboard
+TOP_AUTHORS = 20
+
+# Catalog columns the aggregates are computed from
+SOURCE_COLUMNS = ["الحالة", "عدد الصفحات", "التقييم", "تاريخ الإضافة", "تصنيف", "مؤلف"]
+
+
+# Function to compute the per-book counters that the aggregates sum up
+def book_counters(df):
+    read = (df["الحالة"].astype(object) == READ_STATUS).to_numpy()
+    pages = pd.to_numeric(df["عدد الصفحات"], errors="coerce").fillna(0).astype("int64")
+    ratings = pd.to_numeric(df["التقييم"], errors="coerce")
+    return pd.DataFrame({
+        "books": 1,
+        "read": read.astype("int64"),
+        "pages": pages,
+        "read_pages": pages.where(read, 0),
+        "rating_sum": ratings.fillna(0).astype("int64"),
+        "rating_count": ratings.notna().astype("int64"),
+    }, index=df.index)
+
+
+# Function to compute the grouping keys of every dashboard table
+# total: one group for the whole catalog; monthly: the month the book was
+# added (YYYY-MM); ratings: the rating; categories and authors: the category
+# and the author
+def group_keys(df):
+    added = pd.to_datetime(df["تاريخ الإضافة"], errors="coerce")
+    return {
+        "total": pd.Series("all", index=df.index),
+        "monthly": added.dt.to_period("M"),
+        "ratings": pd.to_numeric(df["التقييم"], errors="coerce").round(),
+        "categories": df["تصنيف"],
+        "authors": df["مؤلف"],
+    }
+
+
+# Function to sum the counters of a frame per group of every table
+# weights (1 or -1 per row) turn the sums into a delta; group labels are made
+# plain Python values (strings, ints) so that deltas and totals line up
+# whatever dtype the column had
+def compute_aggregates(df, weights=None):
+    counters = book_counters(df)
+    if weights is not None:
+        counters = counters.mul(weights, axis=0)
+    aggregates = {}
+    for name, keys in group_keys(df).items():
+        grouped = counters.groupby(keys, observed=True, sort=False).sum()
+        if name == "monthly":
+            labels = grouped.index.astype(str)
+        elif name == "ratings":
+            labels = grouped.index.astype("int64")
+        else:
+            labels = grouped.index.astype(object)
+        aggregates[name] = grouped.set_axis(pd.Index(labels, dtype=object))
+    return aggregates
+
+
+# Function to copy the source columns of a few books out of a large frame
+# Scalar lookups avoid gathering whole Arrow-backed columns for one row
+def book_rows(df, keys):
+    keys = [key for key in keys if key in df.index]
+    return pd.DataFrame(
+        [[df.at[key, column] for column in SOURCE_COLUMNS] for key in keys],
+        index=keys, columns=SOURCE_COLUMNS, dtype=object
+    )
+
+
+# One aggregate table kept as group labels plus a counter matrix, so a write
+# can add its delta in place instead of realigning the whole table
+class AggregateTable:
+    def __init__(self, table):
+        self.labels = table.index
+        self.counts = table[COUNTERS].to_numpy(dtype="int64", copy=True)
+
+    def add(self, delta):
+        if delta.empty:
+            return
+        positions = self.labels.get_indexer(delta.index)
+        values = delta[COUNTERS].to_numpy(dtype="int64")
+        known = positions >= 0
+        np.add.at(self.counts, positions[known], values[known])
+        if not known.all():
+            self.labels = self.labels.append(delta.index[~known])
+            self.counts = np.vstack([self.counts, values[~known]])
+
+    # The table as a frame, without groups that no longer have books
+    def frame(self):
+        table = pd.DataFrame(self.counts, index=self.labels, columns=COUNTERS)
+        return table[table["books"] > 0]
+
+
+# Dashboard aggregates, kept up to date by the storage backend
+# The listener keeps a reference to the frame it last saw (frames are never
+# mutated once cached), so a write is applied by grouping only the changed
+# books: their old rows weighted -1 and their new rows weighted +1.
+class CatalogAnalytics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.frame = None
+        self.tables = None
+        self.snapshot_cache = None
+
+    # Backend listener hooks
+    def rebuild(self, df):
+        tables = {name: AggregateTable(table) for name, table in compute_aggregates(df).items()}
+        with self.lock:
+            self.frame = df
+            self.tables = tables
+            self.snapshot_cache = None
+
+    def apply(self, changes, df):
+        keys = list(dict.fromkeys(key for _, key, _ in changes))
+        with self.lock:
+            self.snapshot_cache = None
+            if self.frame is None:
+                self.frame = df
+                self.tables = {name: AggregateTable(table) for name, table in compute_aggregates(df).items()}
+                return
+            before = book_rows(self.frame, keys)
+            after = book_rows(df, keys)
+            rows = pd.concat([before, after], ignore_index=True)
+            weights = np.concatenate([np.full(len(before), -1), np.ones(len(after), dtype="int64")])
+            delta = compute_aggregates(rows, weights)
+            for name, table in self.tables.items():
+                table.add(delta[name])
+            self.frame = df
+
+    # The aggregate tables as frames, sorted for display; of the authors only
+    # the TOP_AUTHORS with the most books, selected without sorting the rest
+    # Built once per change and shared, so callers must not mutate them
+    def snapshot(self):
+        with self.lock:
+            if self.tables is None:
+                return None
+            if self.snapshot_cache is None:
+                tables = {name: table.frame() for name, table in self.tables.items()}
+                self.snapshot_cache = {
+                    "total": tables["total"],
+                    "monthly": tables["monthly"].sort_index(),
+                    "ratings": tables["ratings"].sort_index(),
+                    "categories": tables["categories"].sort_values("books", ascending=False),
+                    "authors": tables["authors"].nlargest(TOP_AUTHORS, "books"),
+                }
+            return self.snapshot_cache
+
+
+# Function to compare maintained aggregates with a full recomputation
+def aggregates_match(analytics, df):
+    with analytics.lock:
+        if analytics.tables is None:
+            return False
+        maintained = {name: table.frame() for name, table in analytics.tables.items()}
+    fresh = compute_aggregates(df)
+    return all(maintained[name].sort_index().equals(fresh[name].sort_index()) for name in fresh)
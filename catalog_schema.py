@@ -0,0 +1,124 @@
+import argparse
+import importlib.util
+
+import pandas as pd
+
+# Vocabularies of the categorical columns; values found in older data that
+# are not in these lists are kept as extra categories
+STATUSES = ["تمت القراءة", "قيد القراءة", "لم تتم القراءة بعد"]
+CATEGORIES = ["أدب", "تاريخ", "فلسفة", "علوم", "دين", "سياسة", "اقتصاد", "تنمية بشرية", "سيرة ذاتية", "أخرى"]
+CATEGORICAL_COLUMNS = {"الحالة": STATUSES, "تصنيف": CATEGORIES}
+
+# Small nullable integers: page counts fit in 32 bits, ratings are 1-5
+INTEGER_COLUMNS = {"عدد الصفحات": "Int32", "التقييم": "Int8"}
+
+# Dates are stored on disk as YYYY-MM-DD text
+DATE_COLUMNS = ["تاريخ النشر", "تاريخ الإضافة"]
+DATE_FORMAT = "%Y-%m-%d"
+
+TEXT_COLUMNS = ["عنوان", "مؤلف", "ملاحظات", "صورة الغلاف"]
+
+# Arrow-backed strings are far more compact than Python str objects; fall
+# back to pandas' own string dtype without pyarrow
+STRING_DTYPE = "string[pyarrow]" if importlib.util.find_spec("pyarrow") else "string"
+
+
+# Function to convert a column to its schema dtype
+# Columns that already have it (e.g. read from Parquet) are returned as is
+def typed_column(column, values, categories=None):
+    if categories is None and already_typed(column, values.dtype):
+        return values
+    if column in CATEGORICAL_COLUMNS:
+        known = list(categories) if categories is not None else list(CATEGORICAL_COLUMNS[column])
+        values = values.astype(object).where(values.notna(), None)
+        extra = sorted(set(values.dropna().unique()) - set(known), key=str)
+        return values.astype(pd.CategoricalDtype(known + extra))
+    if column in INTEGER_COLUMNS:
+        return pd.to_numeric(values, errors="coerce").round().astype(INTEGER_COLUMNS[column])
+    if column in DATE_COLUMNS:
+        return pd.to_datetime(values, errors="coerce", format=DATE_FORMAT)
+    if column in TEXT_COLUMNS:
+        values = values.astype(object)
+        return values.where(values.notna(), None).astype(STRING_DTYPE)
+    return values
+
+
+# Function to check whether a column already has its schema dtype
+def already_typed(column, dtype):
+    if column in CATEGORICAL_COLUMNS:
+        return isinstance(dtype, pd.CategoricalDtype)
+    if column in INTEGER_COLUMNS:
+        return dtype == INTEGER_COLUMNS[column]
+    if column in DATE_COLUMNS:
+        return pd.api.types.is_datetime64_any_dtype(dtype)
+    if column in TEXT_COLUMNS:
+        return dtype == STRING_DTYPE
+    return True
+
+
+# Function to convert a whole catalog frame to the compact schema
+def apply_schema(df):
+    return df.assign(**{column: typed_column(column, df[column]) for column in df.columns})
+
+
+# Function to type newly added rows like an existing typed frame
+# Returns both frames: the existing one only changes when a row brings a
+# category value it has not seen before
+def conform_rows(df, rows):
+    rows = rows.reindex(columns=df.columns)
+    for column in df.columns:
+        dtype = df[column].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            new_values = set(rows[column].dropna()) - set(dtype.categories)
+            if new_values:
+                df = df.assign(**{column: df[column].cat.add_categories(sorted(new_values, key=str))})
+            rows[column] = typed_column(column, rows[column], df[column].cat.categories)
+        elif dtype != object and (column in INTEGER_COLUMNS or column in DATE_COLUMNS or column in TEXT_COLUMNS):
+            rows[column] = typed_column(column, rows[column]).astype(dtype)
+    return df, rows
+
+
+# Function to convert a single value for assignment into a typed column
+def typed_value(df, column, value):
+    dtype = df[column].dtype
+    if value is None or value is pd.NA or isinstance(value, float) and value != value:
+        return df, None
+    if isinstance(dtype, pd.CategoricalDtype):
+        if value not in dtype.categories:
+            df[column] = df[column].cat.add_categories([value])
+        return df, value
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return df, pd.to_datetime(value, errors="coerce", format=DATE_FORMAT if isinstance(value, str) else None)
+    if isinstance(dtype, pd.api.extensions.ExtensionDtype) and pd.api.types.is_integer_dtype(dtype):
+        number = pd.to_numeric(value, errors="coerce")
+        return df, None if pd.isna(number) else int(round(number))
+    return df, value
+
+
+# Function to format the date columns back to their on-disk text form
+def format_dates(df):
+    return df.assign(**{
+        column: df[column].dt.strftime(DATE_FORMAT).astype(object).where(df[column].notna(), None)
+        for column in DATE_COLUMNS
+        if column in df.columns and pd.api.types.is_datetime64_any_dtype(df[column])
+    })
+
+
+# Function to report the memory used by every column, in bytes
+def memory_report(df):
+    usage = df.memory_usage(deep=True, index=False)
+    return pd.DataFrame({"dtype": df.dtypes.astype(str), "bytes": usage}).assign(
+        share=lambda report: report["bytes"] / report["bytes"].sum()
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare catalog memory with default and typed dtypes")
+    parser.add_argument("csv_path", nargs="?", default="books_data.csv")
+    args = parser.parse_args()
+
+    raw = pd.read_csv(args.csv_path, index_col=0)
+    typed = apply_schema(raw)
+    report = memory_report(raw)[["dtype", "bytes"]].join(memory_report(typed)[["dtype", "bytes"]], rsuffix="_typed")
+    print(report.to_string())
+    print(f"total: {report['bytes'].sum():,} -> {report['bytes_typed'].sum():,} bytes")
@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+from collections import Counter
+
+import pandas as pd
+
+
+# Function to read a numeric cell, treating blanks and text as missing
+def number_or_none(value):
+    number = pd.to_numeric(value, errors="coerce")
+    return None if pd.isna(number) else float(number)
+
+
+# Function to read a text cell, treating NaN as missing
+def text_or_none(value):
+    return value if isinstance(value, str) and value else None
+
+
+# Function to compute the statistics of a whole catalog from scratch
+def compute_stats(df):
+    pages = pd.to_numeric(df["عدد الصفحات"], errors="coerce")
+    ratings = pd.to_numeric(df["التقييم"], errors="coerce")
+    return {
+        "total": int(len(df)),
+        # Categorical columns also report categories with no books; skip those
+        "statuses": {str(k): int(v) for k, v in df["الحالة"].value_counts().items() if v},
+        "categories": {str(k): int(v) for k, v in df["تصنيف"].value_counts().items() if v},
+        "total_pages": float(pages.sum()),
+        "rating_sum": float(ratings.sum()),
+        "rating_count": int(ratings.count()),
+    }
+
+
+# Aggregates shown in the sidebar, kept up to date by the storage backend
+# Each book's contribution is remembered so that edits and deletes can be
+# subtracted without rescanning the catalog.
+class CatalogStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.contributions = {}
+        self.statuses = Counter()
+        self.categories = Counter()
+        self.total_pages = 0.0
+        self.rating_sum = 0.0
+        self.rating_count = 0
+
+    def contribution(self, row):
+        return (
+            text_or_none(row.get("الحالة")),
+            text_or_none(row.get("تصنيف")),
+            number_or_none(row.get("عدد الصفحات")),
+            number_or_none(row.get("التقييم")),
+        )
+
+    def count(self, contribution, sign):
+        status, category, pages, rating = contribution
+        if status is not None:
+            self.statuses[status] += sign
+            if not self.statuses[status]:
+                del self.statuses[status]
+        if category is not None:
+            self.categories[category] += sign
+            if not self.categories[category]:
+                del self.categories[category]
+        if pages is not None:
+            self.total_pages += sign * pages
+        if rating is not None:
+            self.rating_sum += sign * rating
+            self.rating_count += sign
+
+    # Backend listener hooks
+    def rebuild(self, df):
+        fresh = compute_stats(df)
+        pages = pd.to_numeric(df["عدد الصفحات"], errors="coerce").astype(object)
+        ratings = pd.to_numeric(df["التقييم"], errors="coerce").astype(object)
+        statuses = df["الحالة"].astype(object)
+        categories = df["تصنيف"].astype(object)
+        with self.lock:
+            self.contributions = {
+                key: (
+                    text_or_none(status), text_or_none(category),
+                    None if pd.isna(page) else float(page),
+                    None if pd.isna(rating) else float(rating),
+                )
+                for key, status, category, page, rating in zip(df.index, statuses, categories, pages, ratings)
+            }
+            self.statuses = Counter(fresh["statuses"])
+            self.categories = Counter(fresh["categories"])
+            self.total_pages = fresh["total_pages"]
+            self.rating_sum = fresh["rating_sum"]
+            self.rating_count = fresh["rating_count"]
+
+    def apply(self, changes, df):
+        with self.lock:
+            for _, key, _ in changes:
+                old = self.contributions.pop(key, None)
+                if old is not None:
+                    self.count(old, -1)
+                if key in df.index:
+                    new = self.contribution(df.loc[key])
+                    self.contributions[key] = new
+                    self.count(new, 1)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "total": len(self.contributions),
+                "statuses": dict(self.statuses),
+                "categories": dict(self.categories),
+                "total_pages": self.total_pages,
+                "rating_sum": self.rating_sum,
+                "rating_count": self.rating_count,
+            }
+
+
+# Function to get the average rating from a stats snapshot
+def average_rating(stats):
+    return stats["rating_sum"] / stats["rating_count"] if stats["rating_count"] else None
+
+
+# Function to compare incrementally maintained stats with a full recount
+def stats_match(maintained, fresh):
+    return (
+        maintained["total"] == fresh["total"]
+        and maintained["statuses"] == fresh["statuses"]
+        and maintained["categories"] == fresh["categories"]
+        and maintained["rating_count"] == fresh["rating_count"]
+        and abs(maintained["total_pages"] - fresh["total_pages"]) < 1e-6
+        and abs(maintained["rating_sum"] - fresh["rating_sum"]) < 1e-6
+    )
+
+
+# Function to persist a stats snapshot next to the data, tagged with its version
+def write_stats_file(path, version, stats):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as stats_file:
+        json.dump({"version": version, "stats": stats}, stats_file, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+# Function to read persisted stats if they belong to the given data version
+def read_stats_file(path, version):
+    try:
+        with open(path, "r", encoding="utf-8") as stats_file:
+            stored = json.load(stats_file)
+    except (OSError, ValueError):
+        return None
+    if stored.get("version") != json.loads(json.dumps(version)):
+        return None
+    return stored.get("stats")
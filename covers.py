@@ -0,0 +1,755 @@
+import argparse
+import base64
+import bisect
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from PIL import Image, ImageOps, features
+
+import instrumentation
+
+# Thumbnail sizes: the book card (.book-cover is 120x180) and the 150px wide
+# preview shown in the add/edit forms
+THUMBNAIL_SIZES = {
+    "card": (120, 180),
+    "preview": (150, None),
+}
+
+# Thumbnails are stored under the covers folder, named by content hash
+THUMBNAIL_FOLDER = ".thumbnails"
+MANIFEST_FILE = "manifest.json"
+
+# WebP is noticeably smaller for cover art; fall back to JPEG without libwebp
+THUMBNAIL_FORMAT = "WEBP" if features.check("webp") else "JPEG"
+THUMBNAIL_QUALITY = 80
+
+# Extensions for the formats PIL reports for uploaded covers
+FORMAT_EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp", "GIF": ".gif"}
+MIME_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png", ".webp": "image/webp", ".gif": "image/gif"}
+
+# Default memory budget for cached base64 cover payloads
+PAYLOAD_CACHE_BYTES = 64 * 1024 * 1024
+
+# Stored originals are turned upright and scaled down to fit this box
+MAX_COVER_SIZE = (1200, 1800)
+COVER_QUALITY = 90
+
+# Uploaded covers are decoded, normalised and thumbnailed on these threads,
+# so the Streamlit script thread only has to read the upload's header
+COVER_WORKERS = 2
+cover_pool = ThreadPoolExecutor(COVER_WORKERS, thread_name_prefix="covers")
+
+# Reprocess jobs are driven from their own thread, so a long job never holds
+# up the per-upload encodes on cover_pool
+reprocess_pool = ThreadPoolExecutor(1, thread_name_prefix="reprocess")
+
+manifest_lock = threading.Lock()
+manifests = {}
+# Folders whose in-memory manifest has entries not yet written to disk
+unsaved_manifests = set()
+
+# Garbage collection: files younger than the grace period are never removed,
+# since a cover is written around the time its book is saved, and each run
+# checks at most GC_BATCH_SIZE covers and thumbnails, resuming where the
+# previous run stopped
+GC_GRACE_SECONDS = 60 * 60
+GC_BATCH_SIZE = 10_000
+GC_STATE_FILE = "gc.json"
+
+# Covers queued or being processed, by path, and running reprocess jobs
+pending_lock = threading.RLock()
+pending = {}
+reprocess_jobs = {}
+
+# Marker created with O_EXCL next to a cover while it is being prepared, so
+# that the same upload arriving in two processes at once is processed only
+# once; a marker older than CLAIM_TIMEOUT seconds was left by a crashed
+# process and is taken over
+CLAIM_SUFFIX = ".claim"
+CLAIM_TIMEOUT = 10 * 60
+
+
+# Raised when an uploaded cover is not an image that can be read
+class InvalidCover(Exception):
+    pass
+
+
+# Bounded LRU cache of base64-encoded image files
+# Entries are keyed on (path, mtime, size) so a file replaced on disk is never
+# served stale; the budget counts the encoded payload bytes.
+class PayloadCache:
+    def __init__(self, max_bytes):
+        self.lock = threading.Lock()
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.keys_by_path = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.invalidate(path)
+            return None
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            payload = self.entries.get(key)
+            if payload is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                instrumentation.count("payload_cache_hits")
+                instrumentation.count("cover_payload_bytes", len(payload))
+                return payload
+            self.misses += 1
+        instrumentation.count("payload_cache_misses")
+        with open(path, "rb") as img_file:
+            payload = base64.b64encode(img_file.read()).decode()
+        instrumentation.count("cover_payload_bytes", len(payload))
+        self.put(key, payload)
+        return payload
+
+    def put(self, key, payload):
+        with self.lock:
+            path = key[0]
+            old_key = self.keys_by_path.get(path)
+            if old_key is not None:
+                self.size -= len(self.entries.pop(old_key, ""))
+            if len(payload) > self.max_bytes:
+                self.keys_by_path.pop(path, None)
+                return
+            self.entries[key] = payload
+            self.keys_by_path[path] = key
+            self.size += len(payload)
+            self.evict()
+
+    def evict(self):
+        while self.size > self.max_bytes and self.entries:
+            (path, _, _), payload = self.entries.popitem(last=False)
+            self.keys_by_path.pop(path, None)
+            self.size -= len(payload)
+            self.evictions += 1
+
+    # Drop a file's payload when its cover is replaced or removed
+    def invalidate(self, path):
+        with self.lock:
+            key = self.keys_by_path.pop(path, None)
+            if key is not None:
+                self.size -= len(self.entries.pop(key, ""))
+
+    def resize(self, max_bytes):
+        with self.lock:
+            self.max_bytes = max_bytes
+            self.evict()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+payload_cache = PayloadCache(PAYLOAD_CACHE_BYTES)
+
+
+# Function to get the mime type of an image file from its extension
+def image_mime(filename):
+    return MIME_TYPES.get(os.path.splitext(filename)[1].lower(), "image/jpeg")
+
+
+# Function to get the file extension matching an image's actual format
+def format_extension(image_format):
+    return FORMAT_EXTENSIONS.get((image_format or "").upper(), ".jpg")
+
+
+# Function to resize an image to one of the thumbnail sizes
+# The card size is cropped to fill the frame like CSS object-fit: cover
+def make_thumbnail(img, kind):
+    width, height = THUMBNAIL_SIZES[kind]
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, "white")
+        background.paste(img, mask=img.split()[-1])
+        img = background
+    if height is None:
+        height = max(1, round(img.height * width / img.width))
+        return img.resize((width, height), Image.LANCZOS)
+    return ImageOps.fit(img, (width, height), Image.LANCZOS)
+
+
+# Function to get the preview thumbnail of an uploaded file without consuming it
+def preview_thumbnail(uploaded_file):
+    uploaded_file.seek(0)
+    with Image.open(uploaded_file) as img:
+        thumbnail = make_thumbnail(img, "preview")
+    uploaded_file.seek(0)
+    return thumbnail
+
+
+# Function to encode a thumbnail in the configured format
+def encode_thumbnail(img):
+    buffer = io.BytesIO()
+    img.save(buffer, THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+# Function to turn a decoded cover upright and scale it down to MAX_COVER_SIZE
+def normalise_cover(img):
+    img = ImageOps.exif_transpose(img)
+    scale = min(MAX_COVER_SIZE[0] / img.width, MAX_COVER_SIZE[1] / img.height)
+    if scale < 1:
+        img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.LANCZOS)
+    return img
+
+
+# Function to check whether normalise_cover would change an image
+def needs_normalising(img):
+    return (
+        img.getexif().get(0x0112, 1) != 1
+        or img.width > MAX_COVER_SIZE[0]
+        or img.height > MAX_COVER_SIZE[1]
+    )
+
+
+# Function to encode a cover in its original format
+def encode_cover(img, image_format):
+    image_format = image_format if image_format in FORMAT_EXTENSIONS else "JPEG"
+    if image_format == "JPEG" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    buffer = io.BytesIO()
+    img.save(buffer, image_format, quality=COVER_QUALITY)
+    return buffer.getvalue()
+
+
+# Function to write a file atomically
+def write_file(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as out:
+        out.write(data)
+    os.replace(tmp_path, path)
+
+
+# Function to get the thumbnail folder for a covers folder
+def thumbnail_folder(books_folder):
+    folder = os.path.join(books_folder, THUMBNAIL_FOLDER)
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+# Function to load the manifest mapping cover files to their content hash
+# Keyed on (mtime, size) so replaced covers are re-hashed, and kept in memory
+# so rendering a card does not have to read the original to find its thumbnail
+def load_manifest(books_folder):
+    if books_folder not in manifests:
+        path = os.path.join(thumbnail_folder(books_folder), MANIFEST_FILE)
+        try:
+            with open(path, "r", encoding="utf-8") as manifest_file:
+                manifests[books_folder] = json.load(manifest_file)
+        except (OSError, ValueError):
+            manifests[books_folder] = {}
+    return manifests[books_folder]
+
+
+def save_manifest(books_folder):
+    path = os.path.join(thumbnail_folder(books_folder), MANIFEST_FILE)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as manifest_file:
+        json.dump(load_manifest(books_folder), manifest_file, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    unsaved_manifests.discard(books_folder)
+
+
+# Function to write the manifest only if entries were added since it was
+# last written; callers hold manifest_lock
+def flush_manifest(books_folder):
+    if books_folder in unsaved_manifests:
+        save_manifest(books_folder)
+
+
+# Function to get the content hash of a cover, hashing it only when it changed
+# Batch callers pass persist=False and call flush_manifest once at the end
+def cover_digest(books_folder, cover_filename, persist=True):
+    path = os.path.join(books_folder, cover_filename)
+    stat = os.stat(path)
+    with manifest_lock:
+        entry = load_manifest(books_folder).get(cover_filename)
+        if entry and entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return entry["digest"]
+    with open(path, "rb") as cover_file:
+        digest = hashlib.sha256(cover_file.read()).hexdigest()
+    with manifest_lock:
+        load_manifest(books_folder)[cover_filename] = {
+            "mtime": stat.st_mtime_ns, "size": stat.st_size, "digest": digest
+        }
+        if persist:
+            save_manifest(books_folder)
+        else:
+            unsaved_manifests.add(books_folder)
+    return digest
+
+
+# Function to get the cache-relative name of a thumbnail
+def thumbnail_name(digest, kind):
+    return os.path.join(THUMBNAIL_FOLDER, f"{digest}_{kind}{format_extension(THUMBNAIL_FORMAT)}")
+
+
+# Function to write every thumbnail size for an image that has the given digest
+# Existing thumbnails are kept unless replace is set
+def write_thumbnails(books_folder, digest, img, replace=False):
+    thumbnail_folder(books_folder)
+    for kind in THUMBNAIL_SIZES:
+        path = os.path.join(books_folder, thumbnail_name(digest, kind))
+        if os.path.exists(path) and not replace:
+            continue
+        write_file(path, encode_thumbnail(make_thumbnail(img, kind)))
+
+
+# Function to get a cover's thumbnail, generating it from the original if missing
+# Returns the name relative to the covers folder, or None if the cover is gone
+def get_thumbnail(books_folder, cover_filename, kind="card"):
+    if not cover_filename or not os.path.exists(os.path.join(books_folder, cover_filename)):
+        return None
+    digest = cover_digest(books_folder, cover_filename)
+    name = thumbnail_name(digest, kind)
+    if not os.path.exists(os.path.join(books_folder, name)):
+        try:
+            with Image.open(os.path.join(books_folder, cover_filename)) as img:
+                img.load()
+                write_thumbnails(books_folder, digest, img)
+        except OSError:
+            return None
+    return name
+
+
+# Function to publish a thumbnail into a static folder served by Streamlit
+# Thumbnails are named by content, so a published file never changes; it is
+# hard-linked (or copied where links are not possible) only once
+def publish_thumbnail(books_folder, thumbnail, static_folder):
+    name = os.path.basename(thumbnail)
+    target = os.path.join(static_folder, name)
+    if not os.path.exists(target):
+        os.makedirs(static_folder, exist_ok=True)
+        tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.link(os.path.join(books_folder, thumbnail), tmp_path)
+        except OSError:
+            shutil.copyfile(os.path.join(books_folder, thumbnail), tmp_path)
+        os.replace(tmp_path, target)
+    return name
+
+
+# Function to get the static URL of a published thumbnail
+# The ?v= content hash makes the static handler send a long-lived
+# Cache-Control header; its ETag is also derived from the file content
+def static_url(books_folder, thumbnail, static_folder, base_url):
+    name = publish_thumbnail(books_folder, thumbnail, static_folder)
+    return f"{base_url}/{name}?v={name.split('_', 1)[0]}"
+
+
+# Function to generate any missing thumbnails for every cover in the folder
+def backfill_thumbnails(books_folder):
+    created = 0
+    for entry in os.scandir(books_folder):
+        if entry.is_file() and os.path.splitext(entry.name)[1].lower() in MIME_TYPES:
+            digest = cover_digest(books_folder, entry.name, persist=False)
+            if os.path.exists(os.path.join(books_folder, thumbnail_name(digest, "card"))):
+                continue
+            if get_thumbnail(books_folder, entry.name):
+                created += 1
+    # The manifest is written once at the end rather than once per cover
+    with manifest_lock:
+        flush_manifest(books_folder)
+    return created
+
+
+# Function to decode, normalise and store an uploaded cover with its thumbnails
+# Runs on cover_pool; an upload PIL cannot decode is stored as it is
+def process_cover(books_folder, cover_filename, data):
+    path = os.path.join(books_folder, cover_filename)
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            image_format = img.format
+            img = normalise_cover(img)
+        data = encode_cover(img, image_format)
+    except (OSError, Image.DecompressionBombError):
+        img = None
+    write_file(path, data)
+    payload_cache.invalidate(path)
+    if img is not None:
+        write_thumbnails(books_folder, cover_digest(books_folder, cover_filename), img)
+    return cover_filename
+
+
+# Function to get the content-addressed filename of an uploaded cover: the
+# SHA-256 of the uploaded bytes plus the extension of the image format
+def content_name(data, image_format):
+    return hashlib.sha256(data).hexdigest() + format_extension(image_format)
+
+
+# Function to store an uploaded cover and return its filename
+# Only the image header is read here; the same image uploaded again (for this
+# or another book) maps to the same file and is not stored twice
+# Raises InvalidCover if the data is not an image
+def store_cover(books_folder, data):
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            cover_filename = content_name(data, img.format)
+    except (OSError, Image.DecompressionBombError) as error:
+        raise InvalidCover(str(error)) from error
+    path = os.path.join(books_folder, cover_filename)
+    with pending_lock:
+        if path in pending:
+            return cover_filename
+        if os.path.exists(path):
+            # Refresh the file's age so garbage collection leaves it alone
+            # while the book that now refers to it is being saved
+            os.utime(path)
+        elif claim_cover(path):
+            submit_cover(books_folder, cover_filename, data)
+    return cover_filename
+
+
+# Function to claim the preparation of a cover for this process
+# Returns False while another process holds a recent claim on it
+def claim_cover(path):
+    claim_path = path + CLAIM_SUFFIX
+    try:
+        os.close(os.open(claim_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        pass
+    try:
+        if time.time() - os.path.getmtime(claim_path) < CLAIM_TIMEOUT:
+            return False
+        os.remove(claim_path)
+    except OSError:
+        pass
+    try:
+        os.close(os.open(claim_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        return False
+
+
+# Function to queue an uploaded cover for processing in the background
+# The cover counts as pending until its file and thumbnails are written
+def submit_cover(books_folder, cover_filename, data):
+    path = os.path.join(books_folder, cover_filename)
+    with pending_lock:
+        future = cover_pool.submit(process_cover, books_folder, cover_filename, data)
+        pending[path] = future
+    future.add_done_callback(lambda done: forget_pending(path, done))
+    return future
+
+
+def forget_pending(path, future):
+    with pending_lock:
+        if pending.get(path) is future:
+            del pending[path]
+    try:
+        os.remove(path + CLAIM_SUFFIX)
+    except OSError:
+        pass
+
+
+# Function to get the names of the covers in a folder still being processed
+def pending_covers(books_folder):
+    with pending_lock:
+        paths = list(pending)
+    return {os.path.basename(path) for path in paths if os.path.dirname(path) == books_folder}
+
+
+# Function to wait until a cover is no longer pending
+def wait_for_cover(books_folder, cover_filename):
+    with pending_lock:
+        future = pending.get(os.path.join(books_folder, cover_filename))
+    if future is not None:
+        future.exception()
+
+
+# Function to delete a cover file, waiting for it first if it is still pending
+# Its thumbnails are named by content and may be shared, so they are kept
+def remove_cover(books_folder, cover_filename):
+    path = os.path.join(books_folder, cover_filename)
+    wait_for_cover(books_folder, cover_filename)
+    payload_cache.invalidate(path)
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# Function to reprocess one stored cover; runs in a worker process
+# The original is only rewritten if it needs turning or shrinking, so repeated
+# runs do not re-encode JPEGs again and again. Thumbnails are always rebuilt.
+# Returns the manifest entry for the parent process to record.
+def reprocess_cover(books_folder, cover_filename):
+    path = os.path.join(books_folder, cover_filename)
+    with open(path, "rb") as cover_file:
+        data = cover_file.read()
+    with Image.open(io.BytesIO(data)) as img:
+        image_format = img.format
+        changed = needs_normalising(img)
+        normalised = normalise_cover(img)
+    if changed:
+        data = encode_cover(normalised, image_format)
+        write_file(path, data)
+    digest = hashlib.sha256(data).hexdigest()
+    write_thumbnails(books_folder, digest, normalised, replace=True)
+    stat = os.stat(path)
+    return cover_filename, changed, {"mtime": stat.st_mtime_ns, "size": stat.st_size, "digest": digest}
+
+
+# Function to list the cover files of a folder
+def cover_files(books_folder):
+    return sorted(
+        entry.name for entry in os.scandir(books_folder)
+        if entry.is_file() and os.path.splitext(entry.name)[1].lower() in MIME_TYPES
+    )
+
+
+# Reprocess every cover on a process pool using all cores. The job is driven
+# from a background thread and counts its progress, like an export job;
+# processes are spawned rather than forked from the threaded app server.
+class ReprocessJob:
+    def __init__(self, books_folder, workers=None):
+        self.books_folder = books_folder
+        self.names = cover_files(books_folder)
+        self.total = len(self.names)
+        self.processed = 0
+        self.changed = 0
+        self.failed = []
+        self.workers = workers or os.cpu_count() or 1
+        self.future = reprocess_pool.submit(self.run)
+
+    def run(self):
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(self.workers, mp_context=context) as pool:
+            futures = {pool.submit(reprocess_cover, self.books_folder, name): name for name in self.names}
+            for future in as_completed(futures):
+                self.record(futures[future], future)
+        with manifest_lock:
+            save_manifest(self.books_folder)
+        return self.processed
+
+    def record(self, name, future):
+        try:
+            _, changed, entry = future.result()
+        except (OSError, Image.DecompressionBombError) as error:
+            self.failed.append((name, str(error)))
+        else:
+            with manifest_lock:
+                load_manifest(self.books_folder)[name] = entry
+            if changed:
+                payload_cache.invalidate(os.path.join(self.books_folder, name))
+                self.changed += 1
+        self.processed += 1
+
+    def done(self):
+        return self.future.done()
+
+    def error(self):
+        return self.future.exception() if self.future.done() else None
+
+    def fraction(self):
+        return self.processed / self.total if self.total else 1.0
+
+
+# Function to start reprocessing a folder, or get the job already running on it
+def start_reprocess(books_folder, workers=None):
+    with pending_lock:
+        job = reprocess_jobs.get(books_folder)
+        if job is None or job.done():
+            job = reprocess_jobs[books_folder] = ReprocessJob(books_folder, workers)
+        return job
+
+
+# Function to get the latest reprocess job of a folder, if any
+def reprocess_job(books_folder):
+    with pending_lock:
+        return reprocess_jobs.get(books_folder)
+
+
+# Function to read the garbage collection cursors of a covers folder
+def load_gc_state(books_folder):
+    try:
+        with open(os.path.join(thumbnail_folder(books_folder), GC_STATE_FILE), "r", encoding="utf-8") as state_file:
+            return json.load(state_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_gc_state(books_folder, state):
+    write_file(
+        os.path.join(thumbnail_folder(books_folder), GC_STATE_FILE),
+        json.dumps(state).encode("utf-8")
+    )
+
+
+# Function to take the next slice of a sorted name list after a cursor
+# Returns the slice and the cursor for the next run (None once it wraps);
+# without a limit every name is taken
+def next_batch(names, cursor, limit):
+    if not limit:
+        return names, None
+    start = bisect.bisect_right(names, cursor) if cursor else 0
+    batch = names[start:start + limit]
+    return batch, batch[-1] if start + limit < len(names) else None
+
+
+# Function to check whether a file is past the garbage collection grace period
+def collectable(path, grace):
+    try:
+        return time.time() - os.stat(path).st_mtime > grace
+    except OSError:
+        return False
+
+
+# Function to find (and optionally remove) cover files no book refers to,
+# covers referenced by books but missing on disk, and thumbnails no longer
+# belonging to any stored cover
+# referenced is the set of cover filenames used by the catalog. Each call
+# checks at most limit covers and limit thumbnails; call it repeatedly (the
+# returned "complete" flag is set when both passes have wrapped around).
+# Published copies of removed thumbnails are deleted from static_folder.
+# Covers in retained (used by books that a catalog restore could bring back)
+# are kept but not reported missing.
+def collect_garbage(books_folder, referenced, remove=False, limit=GC_BATCH_SIZE, grace=GC_GRACE_SECONDS, static_folder=None, retained=frozenset()):
+    state = load_gc_state(books_folder)
+    waiting = pending_covers(books_folder)
+    names = cover_files(books_folder)
+    stored = set(names)
+
+    batch, state["covers"] = next_batch(names, state.get("covers"), limit)
+    orphaned = [
+        name for name in batch
+        if name not in referenced and name not in retained and name not in waiting and collectable(os.path.join(books_folder, name), grace)
+    ]
+    missing = sorted(set(referenced) - stored - waiting)
+    if remove:
+        for name in orphaned:
+            remove_cover(books_folder, name)
+        stored.difference_update(orphaned)
+
+    # Thumbnails are named by the digest of the cover they were made from.
+    # Digests are taken from the manifest; only the covers of this batch are
+    # checked against their mtime and size, and only covers the manifest
+    # does not know yet (or that changed) are hashed, so a run reads at most
+    # its batch plus the new covers
+    checked = set(batch)
+    with manifest_lock:
+        known = {name: entry["digest"] for name, entry in load_manifest(books_folder).items()}
+    live = set()
+    for name in stored:
+        if name in known and name not in checked:
+            live.add(known[name])
+            continue
+        try:
+            live.add(cover_digest(books_folder, name, persist=False))
+        except OSError:
+            # Removed meanwhile, so its thumbnails are no longer needed
+            continue
+    folder = thumbnail_folder(books_folder)
+    thumbnails = sorted(
+        name for name in os.listdir(folder)
+        if "_" in name and not name.endswith(".tmp") and name != MANIFEST_FILE and name != GC_STATE_FILE
+    )
+    thumbnail_batch, state["thumbnails"] = next_batch(thumbnails, state.get("thumbnails"), limit)
+    orphaned_thumbnails = [
+        name for name in thumbnail_batch
+        if name.split("_", 1)[0] not in live and collectable(os.path.join(folder, name), grace)
+    ]
+    if remove:
+        for name in orphaned_thumbnails:
+            for path in [os.path.join(folder, name)] + ([os.path.join(static_folder, name)] if static_folder else []):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    # The manifest is written at most once per run
+    with manifest_lock:
+        manifest = load_manifest(books_folder)
+        if remove:
+            for name in [name for name in manifest if name not in stored]:
+                del manifest[name]
+                unsaved_manifests.add(books_folder)
+        flush_manifest(books_folder)
+    save_gc_state(books_folder, state)
+    return {
+        "checked": len(batch),
+        "checked_thumbnails": len(thumbnail_batch),
+        "orphaned": orphaned,
+        "missing": missing,
+        "orphaned_thumbnails": orphaned_thumbnails,
+        "removed": remove,
+        "complete": state["covers"] is None and state["thumbnails"] is None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Book cover tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    backfill = commands.add_parser("backfill", help="generate missing thumbnails for existing covers")
+    backfill.add_argument("books_folder", nargs="?", default="books")
+    reprocess = commands.add_parser("reprocess", help="re-normalise every cover and rebuild its thumbnails")
+    reprocess.add_argument("books_folder", nargs="?", default="books")
+    reprocess.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    gc = commands.add_parser("gc", help="report or remove orphaned covers and thumbnails, and list missing covers")
+    gc.add_argument("books_folder", nargs="?", default="books")
+    gc.add_argument("--catalog", default="books_data.csv", help="catalog file (.csv, .db or .parquet)")
+    gc.add_argument("--remove", action="store_true", help="delete orphaned files instead of only listing them")
+    gc.add_argument("--limit", type=int, default=GC_BATCH_SIZE, help="covers and thumbnails checked per run (0: all)")
+    gc.add_argument("--grace", type=int, default=GC_GRACE_SECONDS, help="never touch files younger than this many seconds")
+    gc.add_argument(
+        "--static-folder",
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "covers"),
+        help="folder thumbnails are published to (default: static/covers next to the app)"
+    )
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        print(f"Generated thumbnails for {backfill_thumbnails(args.books_folder)} covers")
+    elif args.command == "reprocess":
+        job = ReprocessJob(args.books_folder, args.workers)
+        job.future.result()
+        print(f"Reprocessed {job.processed} covers, rewrote {job.changed} originals")
+        for name, error in job.failed:
+            print(f"  failed: {name}: {error}")
+    elif args.command == "gc":
+        # Imported here so that cover worker processes do not load the storage stack
+        import storage
+        kind = {".db": "sqlite", ".parquet": "parquet"}.get(os.path.splitext(args.catalog)[1].lower(), "csv")
+        backend = storage.open_backend(kind, args.catalog)
+        report = collect_garbage(
+            args.books_folder, backend.referenced_covers(), remove=args.remove, limit=args.limit,
+            grace=args.grace, static_folder=args.static_folder, retained=backend.retained_covers()
+        )
+        action = "Removed" if args.remove else "Orphaned"
+        print(f"Checked {report['checked']} covers and {report['checked_thumbnails']} thumbnails")
+        print(f"{action} covers: {len(report['orphaned'])}")
+        for name in report["orphaned"]:
+            print(f"  {name}")
+        print(f"{action} thumbnails: {len(report['orphaned_thumbnails'])}")
+        print(f"Missing covers: {len(report['missing'])}")
+        for name in report["missing"]:
+            print(f"  {name}")
+        if not report["complete"]:
+            print("Run again to check the next batch")
@@ -0,0 +1,369 @@
+import argparse
+import os
+import re
+import threading
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from search_index import normalize_arabic
+
+# Only letters and digits are compared, so spacing and punctuation do not
+# make two copies of a book look different
+NON_WORD = re.compile(r"[\W_]+")
+KEY_SEPARATOR = "\x1f"
+
+# Near-duplicates are found with MinHash over the character 3-grams
+# ("shingles") of the title: each of SIGNATURE_SIZE hash functions keeps the
+# smallest hash of the title's shingles, and two titles agree on a value with
+# probability equal to the Jaccard similarity of their shingle sets. The
+# authors of a near-duplicate pair must be as similar as the titles.
+SHINGLE_SIZE = 3
+# The signature is cut into NUM_BANDS bands of BAND_ROWS values and books that
+# share a whole band become candidates (locality-sensitive hashing). A pair
+# with similarity s is found with probability 1 - (1 - s**3)**10: 0.91 at 0.6,
+# 0.99 at 0.75 and 0.24 at 0.3
+NUM_BANDS = 10
+BAND_ROWS = 3
+SIGNATURE_SIZE = NUM_BANDS * BAND_ROWS
+# Candidates whose titles and authors are both at least this similar are
+# reported as near-duplicates
+SIMILARITY_THRESHOLD = 0.6
+
+# Longer texts are cut to bound the width of a hashing batch
+MAX_TEXT_LENGTH = 120
+# Texts hashed per numpy batch
+SIGNATURE_BATCH = 10_000
+# Books taken from one band bucket per lookup; a bucket shared by very many
+# books says little about any one of them
+MAX_BUCKET_CANDIDATES = 20
+# In the cluster report each book is compared with the next BUCKET_WINDOW
+# books of its bucket, which bounds the work per book
+BUCKET_WINDOW = 8
+# Signature pairs compared per numpy batch in the cluster report
+PAIR_BATCH = 1_000_000
+# Books added or edited since the sorted arrays were built are kept in
+# dictionaries beside them; past this many the arrays are rebuilt on next use
+MAX_PENDING_CHANGES = 50_000
+
+SHINGLE_PRIME = np.uint64(0x100000001B3)
+MIX_MULTIPLIER = np.uint64(0xFF51AFD7ED558CCD)
+SEEDS = np.random.default_rng(2024).integers(1, 2**63, size=SIGNATURE_SIZE, dtype=np.uint64)
+MULTIPLIERS = np.random.default_rng(2025).integers(1, 2**63, size=SIGNATURE_SIZE, dtype=np.uint64) | np.uint64(1)
+
+
+# Function to get the comparison form of a title or author
+def match_text(text):
+    return NON_WORD.sub("", normalize_arabic(text))
+
+
+# Function to get the duplicate key of a title and author
+def book_key(title, author):
+    return f"{match_text(title)}{KEY_SEPARATOR}{match_text(author)}"
+
+
+# Function to get the keys of many books
+# Each distinct title and author is normalised once; authors repeat a lot
+def book_keys(titles, authors):
+    def matched(values):
+        codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=False)
+        return np.array([match_text(value) for value in uniques], dtype=object)[codes]
+    return list(matched(titles) + KEY_SEPARATOR + matched(authors))
+
+
+# Function to hash keys to 64-bit integers for exact matching
+def key_hashes(keys):
+    return pd.util.hash_array(np.array(keys, dtype=object), categorize=False)
+
+
+# Function to scramble 64-bit integers (the MurmurHash3 finaliser)
+def mix(values):
+    values = values ^ (values >> np.uint64(33))
+    values = values * MIX_MULTIPLIER
+    return values ^ (values >> np.uint64(33))
+
+
+# Function to split book keys back into their title and author parts
+def key_parts(keys):
+    parts = [key.partition(KEY_SEPARATOR) for key in keys]
+    return [title for title, _, _ in parts], [author for _, _, author in parts]
+
+
+# Function to compute the MinHash signatures of texts, one row per text
+# The texts of a batch are laid out as a matrix of code points so that every
+# shingle of every text is hashed by the same few numpy operations
+def signatures(texts):
+    result = np.empty((len(texts), SIGNATURE_SIZE), dtype=np.uint32)
+    for start in range(0, len(texts), SIGNATURE_BATCH):
+        batch = [text[:MAX_TEXT_LENGTH] for text in texts[start:start + SIGNATURE_BATCH]]
+        lengths = np.fromiter(map(len, batch), dtype=np.int64, count=len(batch))
+        width = max(int(lengths.max()), SHINGLE_SIZE)
+        codes = np.array(batch, dtype=f"<U{width}").view(np.uint32).reshape(len(batch), width).astype(np.uint64)
+        positions = width - SHINGLE_SIZE + 1
+        shingles = codes[:, :positions]
+        for offset in range(1, SHINGLE_SIZE):
+            shingles = shingles * SHINGLE_PRIME ^ codes[:, offset:offset + positions]
+        # Padding positions repeat the text's first shingle, which leaves every
+        # minimum unchanged; texts shorter than a shingle get one padded shingle
+        valid = np.arange(positions) <= np.maximum(lengths - SHINGLE_SIZE, 0)[:, None]
+        shingles = mix(np.where(valid, shingles, shingles[:, :1]))
+        # Each hash function is a multiply-shift over the mixed shingle hashes
+        for column, (seed, multiplier) in enumerate(zip(SEEDS, MULTIPLIERS)):
+            result[start:start + len(batch), column] = ((shingles ^ seed) * multiplier).min(axis=1) >> np.uint64(32)
+    return result
+
+
+# Function to hash every band of the signatures to one 32-bit bucket
+# Unrelated books occasionally share a bucket; candidates are always checked
+def band_hashes(signature):
+    bands = signature.reshape(len(signature), NUM_BANDS, BAND_ROWS).astype(np.uint64)
+    hashed = np.zeros((len(signature), NUM_BANDS), dtype=np.uint64)
+    for row in range(BAND_ROWS):
+        hashed = mix(hashed * SHINGLE_PRIME ^ bands[:, :, row])
+    return (hashed >> np.uint64(32)).astype(np.uint32)
+
+
+# Function to get the shingles of a text
+def shingle_set(text):
+    text = text[:MAX_TEXT_LENGTH]
+    return {text[start:start + SHINGLE_SIZE] for start in range(max(len(text) - SHINGLE_SIZE + 1, 1))}
+
+
+# Function to compute the Jaccard similarity of two texts' shingles
+def text_similarity(text, other):
+    shingles, other_shingles = shingle_set(text), shingle_set(other)
+    return len(shingles & other_shingles) / len(shingles | other_shingles)
+
+
+# Function to compute the similarity of two books from their keys: the lower
+# of the title and the author similarities
+def similarity(key, other):
+    (title, other_title), (author, other_author) = key_parts([key, other])
+    return min(text_similarity(title, other_title), text_similarity(author, other_author))
+
+
+# Duplicate-book index, kept up to date by the storage backend
+# Books are hashed to sorted numpy arrays (one for the exact keys, one per
+# LSH band) that are searched with binary search, so a lookup costs
+# O(log n) whatever the catalog size. The arrays are built lazily on the
+# first lookup after a reload; books added or edited afterwards go to
+# dictionaries beside them. Candidates are always checked against the
+# current frame, so entries left behind by edits and deletions are harmless.
+class DuplicateIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.frame = None
+        self.built = False
+        self.ids = None
+        self.key_order = None
+        self.sorted_keys = None
+        self.band_orders = []
+        self.sorted_bands = []
+        self.pending = {}
+        self.pending_keys = defaultdict(set)
+        self.pending_bands = [defaultdict(set) for _ in range(NUM_BANDS)]
+
+    # Backend listener hooks
+    def rebuild(self, df):
+        with self.lock:
+            self.frame = df
+            self.built = False
+
+    def apply(self, changes, df):
+        keys = list(dict.fromkeys(key for _, key, _ in changes))
+        with self.lock:
+            self.frame = df
+            if not self.built:
+                return
+            if len(self.pending) + len(keys) > MAX_PENDING_CHANGES:
+                self.built = False
+                return
+            for key in keys:
+                self.forget(key)
+            present = [key for key in keys if key in df.index]
+            entries = book_keys([df.at[key, "عنوان"] for key in present], [df.at[key, "مؤلف"] for key in present])
+            if not entries:
+                return
+            for key, key_hash, bands in zip(present, key_hashes(entries).tolist(), band_hashes(signatures(key_parts(entries)[0])).tolist()):
+                self.pending[key] = (key_hash, bands)
+                self.pending_keys[key_hash].add(key)
+                for band, value in enumerate(bands):
+                    self.pending_bands[band][value].add(key)
+
+    # Callers hold self.lock
+    def forget(self, key):
+        entry = self.pending.pop(key, None)
+        if entry is None:
+            return
+        key_hash, bands = entry
+        self.pending_keys[key_hash].discard(key)
+        if not self.pending_keys[key_hash]:
+            del self.pending_keys[key_hash]
+        for band, value in enumerate(bands):
+            self.pending_bands[band][value].discard(key)
+            if not self.pending_bands[band][value]:
+                del self.pending_bands[band][value]
+
+    # Callers hold self.lock
+    def build(self):
+        df = self.frame
+        keys = book_keys(df["عنوان"], df["مؤلف"])
+        hashes = key_hashes(keys)
+        bands = band_hashes(signatures(key_parts(keys)[0])) if keys else np.empty((0, NUM_BANDS), dtype=np.uint32)
+        self.ids = df.index.to_numpy(dtype=np.int64)
+        self.key_order = np.argsort(hashes, kind="stable").astype(np.int32)
+        self.sorted_keys = hashes[self.key_order]
+        self.band_orders = [np.argsort(bands[:, band], kind="stable").astype(np.int32) for band in range(NUM_BANDS)]
+        self.sorted_bands = [bands[order, band] for band, order in enumerate(self.band_orders)]
+        self.pending = {}
+        self.pending_keys = defaultdict(set)
+        self.pending_bands = [defaultdict(set) for _ in range(NUM_BANDS)]
+        self.built = True
+
+    # Function to find the catalog books that look like duplicates of the
+    # given book keys (see book_key)
+    # Returns one {"exact": [ids], "similar": [(id, similarity)]} per key,
+    # most similar first
+    def lookup(self, keys):
+        keys = list(keys)
+        if not keys:
+            return []
+        hashes = key_hashes(keys)
+        bands = band_hashes(signatures(key_parts(keys)[0]))
+        candidates = [set() for _ in keys]
+        with self.lock:
+            if self.frame is None:
+                return [{"exact": [], "similar": []} for _ in keys]
+            if not self.built:
+                self.build()
+            df = self.frame
+            left = np.searchsorted(self.sorted_keys, hashes, "left")
+            right = np.searchsorted(self.sorted_keys, hashes, "right")
+            for row in np.flatnonzero(right > left):
+                candidates[row].update(self.ids[self.key_order[left[row]:right[row]]].tolist())
+            if self.pending_keys:
+                for row, key_hash in enumerate(hashes.tolist()):
+                    candidates[row].update(self.pending_keys.get(key_hash, ()))
+            for band in range(NUM_BANDS):
+                values = bands[:, band]
+                left = np.searchsorted(self.sorted_bands[band], values, "left")
+                right = np.minimum(np.searchsorted(self.sorted_bands[band], values, "right"), left + MAX_BUCKET_CANDIDATES)
+                for row in np.flatnonzero(right > left):
+                    candidates[row].update(self.ids[self.band_orders[band][left[row]:right[row]]].tolist())
+                if self.pending_bands[band]:
+                    for row, value in enumerate(values.tolist()):
+                        candidates[row].update(self.pending_bands[band].get(value, ()))
+
+        results = []
+        for key, found in zip(keys, candidates):
+            exact, similar = [], []
+            for book_id in found:
+                if book_id not in df.index:
+                    continue
+                other = book_key(df.at[book_id, "عنوان"], df.at[book_id, "مؤلف"])
+                if other == key:
+                    exact.append(book_id)
+                else:
+                    score = similarity(key, other)
+                    if score >= SIMILARITY_THRESHOLD:
+                        similar.append((book_id, score))
+            similar.sort(key=lambda match: (-match[1], match[0]))
+            results.append({"exact": sorted(exact), "similar": similar})
+        return results
+
+
+# Function to list the pairs of positions whose values are equal and at most
+# `window` apart once sorted, as two arrays
+def bucket_pairs(values, window):
+    order = np.argsort(values, kind="stable")
+    ordered = values[order]
+    for offset in range(1, window + 1):
+        same = ordered[offset:] == ordered[:-offset]
+        if not same.any():
+            break
+        yield order[:-offset][same], order[offset:][same]
+
+
+# Function to label the connected components of a graph given as pairs of
+# node arrays: every node repeatedly takes the smallest label among its
+# neighbours, and label chains are short-cut until nothing changes
+def connected_labels(count, pairs):
+    labels = np.arange(count)
+    if not pairs:
+        return labels
+    first = np.concatenate([pair[0] for pair in pairs])
+    second = np.concatenate([pair[1] for pair in pairs])
+    while True:
+        lowest = np.minimum(labels[first], labels[second])
+        updated = labels.copy()
+        np.minimum.at(updated, first, lowest)
+        np.minimum.at(updated, second, lowest)
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+# Function to group the whole catalog into clusters of duplicate books
+# Books with the same key are one cluster from the start; distinct keys are
+# linked when their titles share an LSH bucket and both their title and
+# author signatures agree on at least `threshold` of their values (the MinHash
+# estimate of their similarity). Clusters
+# are transitive: if A is like B and B like C, all three are one cluster.
+# Only keys at most BUCKET_WINDOW apart in a bucket are compared, so the work
+# grows with the catalog size instead of its square.
+# Returns a frame indexed by book id with the cluster number, its size, the
+# title and the author, largest clusters first
+def duplicate_clusters(df, threshold=SIMILARITY_THRESHOLD):
+    codes, unique_keys = pd.factorize(pd.Series(book_keys(df["عنوان"], df["مؤلف"]), dtype=object))
+    if len(codes) == 0:
+        return pd.DataFrame(columns=["cluster", "size", "عنوان", "مؤلف"])
+    titles, authors = key_parts(unique_keys)
+    title_signatures = signatures(titles)
+    # Authors repeat, so each distinct author is hashed once
+    author_codes, unique_authors = pd.factorize(pd.Series(authors, dtype=object))
+    author_signatures = signatures(list(unique_authors))
+    bands = band_hashes(title_signatures)
+    needed = threshold * SIGNATURE_SIZE
+    pairs = []
+    for band in range(NUM_BANDS):
+        for first, second in bucket_pairs(bands[:, band], BUCKET_WINDOW):
+            for start in range(0, len(first), PAIR_BATCH):
+                first_batch = first[start:start + PAIR_BATCH]
+                second_batch = second[start:start + PAIR_BATCH]
+                linked = np.count_nonzero(title_signatures[first_batch] == title_signatures[second_batch], axis=1) >= needed
+                first_batch, second_batch = first_batch[linked], second_batch[linked]
+                first_authors = author_signatures[author_codes[first_batch]]
+                second_authors = author_signatures[author_codes[second_batch]]
+                linked = np.count_nonzero(first_authors == second_authors, axis=1) >= needed
+                pairs.append((first_batch[linked], second_batch[linked]))
+
+    labels = connected_labels(len(unique_keys), pairs)[codes]
+    sizes = np.bincount(labels, minlength=len(unique_keys))
+    clustered = np.flatnonzero(sizes[labels] > 1)
+    report = pd.DataFrame(
+        {"cluster": labels[clustered], "size": sizes[labels[clustered]]}, index=df.index[clustered]
+    ).join(df[["عنوان", "مؤلف"]])
+    report = report.sort_values(["size", "cluster"], ascending=[False, True], kind="stable")
+    report["cluster"] = pd.factorize(report["cluster"])[0] + 1
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report clusters of duplicate books")
+    parser.add_argument("catalog", nargs="?", default="books_data.csv", help="catalog file (.csv, .db or .parquet)")
+    parser.add_argument("--threshold", type=float, default=SIMILARITY_THRESHOLD, help="minimum estimated similarity")
+    parser.add_argument("--show", type=int, default=20, help="clusters printed")
+    args = parser.parse_args()
+
+    # Imported here because storage itself imports this module
+    import storage
+    kind = {".db": "sqlite", ".parquet": "parquet"}.get(os.path.splitext(args.catalog)[1].lower(), "csv")
+    report = duplicate_clusters(storage.open_backend(kind, args.catalog).load(), args.threshold)
+    clusters = report["cluster"].nunique()
+    print(f"{clusters} clusters, {len(report)} books")
+    for cluster, books in report[report["cluster"] <= args.show].groupby("cluster", sort=True):
+        print(f"[{cluster}] {len(books)} books")
+        for book_id, book in books.iterrows():
+            print(f"  {book_id}: {book['عنوان']} - {book['مؤلف']}")
@@ -0,0 +1,366 @@
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# Facets with one bitmap per value (few distinct values), and the catalog
+# column each is read from. A bitmap has one bit per book id, so combining
+# filters is a byte-wise AND/OR and a facet count is a popcount.
+BITMAP_FACETS = {"status": "الحالة", "category": "تصنيف", "rating": "التقييم"}
+# Facets with one sorted array of book ids per value (many distinct values);
+# years are selected as a range of values
+LIST_FACETS = {"author": "مؤلف", "year": "تاريخ النشر"}
+FACETS = {**BITMAP_FACETS, **LIST_FACETS}
+
+# Orders the results can be sorted by, and the column each is read from
+SORT_COLUMNS = {"rating": "التقييم", "pages": "عدد الصفحات", "published": "تاريخ النشر", "added": "تاريخ الإضافة"}
+
+# Bitmaps leave room for ids past the highest one, so that adding books
+# rarely has to grow them
+GROWTH_FACTOR = 1.25
+GROWTH_MIN = 1024
+
+# Bit of each position within a byte, in np.packbits order
+BITS = np.array([128 >> position for position in range(8)], dtype=np.uint8)
+# Number of bits set in every 16-bit value; bitmaps are counted two bytes
+# at a time, so their size is kept a multiple of 64 bits
+POPCOUNT = np.array([bin(value).count("1") for value in range(1 << 16)], dtype=np.uint8)
+# Counts over a selection of fewer than one book in SPARSE_RATIO ids gather
+# the selected ids instead of scanning every id
+SPARSE_RATIO = 8
+
+
+# Function to get the number of ids a bitmap covers for a highest id
+def capacity_for(max_id):
+    bits = max(int((max_id + 1) * GROWTH_FACTOR), max_id + 1 + GROWTH_MIN)
+    return (bits + 63) // 64 * 64
+
+
+# Function to build a bitmap with the bits of the given ids set
+def bitmap_of(ids, capacity):
+    marks = np.zeros(capacity, dtype=bool)
+    marks[ids] = True
+    return np.packbits(marks)
+
+
+# Function to get the ids whose bits are set, in ascending order
+def bitmap_ids(bits):
+    return np.flatnonzero(np.unpackbits(bits))
+
+
+# Function to count the bits set in a bitmap
+def popcount(bits):
+    return int(POPCOUNT[bits.view(np.uint16)].sum())
+
+
+# Function to turn a catalog column into facet values: ratings rounded to
+# whole stars, dates reduced to their year, missing values as NA
+def facet_column(facet, values):
+    if facet == "rating":
+        return pd.to_numeric(values, errors="coerce").round().astype("Int64")
+    if facet == "year":
+        return pd.to_datetime(values, errors="coerce").dt.year.astype("Int64")
+    return values
+
+
+# Function to turn a catalog column into sort values: numbers, dates as
+# days, and missing values as +inf so that they sort last
+def sort_column(name, values):
+    if name in ("published", "added"):
+        dates = pd.to_datetime(values, errors="coerce")
+        numbers = (dates - pd.Timestamp(0)).dt.total_seconds() / 86_400
+    else:
+        numbers = pd.to_numeric(values, errors="coerce").astype("float64")
+    return numbers.fillna(np.inf).to_numpy(dtype="float64")
+
+
+# Function to read one column of a few books out of a large frame
+# Scalar lookups avoid gathering whole Arrow-backed columns for a few rows
+def book_column(df, keys, column):
+    return pd.Series([df.at[key, column] for key in keys], index=keys, dtype=object)
+
+
+# Facet indexes over the catalog, kept up to date by the storage backend
+# Per facet, every book id has the code of its value (-1 when missing or when
+# there is no such book); bitmap facets keep a bitmap per code and list
+# facets a sorted id array per code. Sort orders (ids sorted by value, then
+# id) are built on first use. Like the duplicate index, everything is built
+# on the first query after a load and then patched with every change.
+class FacetIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.frame = None
+        self.built = False
+        self.capacity = 0
+        self.present = None
+        self.codes = {}
+        self.values = {}
+        self.value_codes = {}
+        self.bitmaps = {}
+        self.lists = {}
+        self.orders = {}
+
+    # Backend listener hooks
+    def rebuild(self, df):
+        with self.lock:
+            self.frame = df
+            self.built = False
+
+    def apply(self, changes, df):
+        keys = list(dict.fromkeys(key for _, key, _ in changes))
+        with self.lock:
+            previous = self.frame
+            self.frame = df
+            if not self.built or not keys:
+                return
+            if max(keys) >= self.capacity:
+                self.grow(max(keys))
+            present = [key for key in keys if key in df.index]
+            for key in keys:
+                if key in present:
+                    self.present[key >> 3] |= BITS[key & 7]
+                else:
+                    self.present[key >> 3] &= ~BITS[key & 7]
+            for facet, column in FACETS.items():
+                values = facet_column(facet, book_column(df, present, column))
+                new = {key: value for key, value in values.items() if not pd.isna(value)}
+                codes = self.codes[facet]
+                for key in keys:
+                    code = self.code_for(facet, new[key]) if key in new else -1
+                    old = int(codes[key])
+                    if code == old:
+                        continue
+                    if old >= 0:
+                        self.unlink(facet, old, key)
+                    if code >= 0:
+                        self.link(facet, code, key)
+                    codes[key] = code
+            for name in list(self.orders):
+                self.reorder(name, keys, previous, df)
+
+    # Callers hold self.lock
+    def build(self):
+        df = self.frame
+        ids = df.index.to_numpy(dtype=np.int64)
+        self.capacity = capacity_for(int(ids.max()) if len(ids) else 0)
+        self.present = bitmap_of(ids, self.capacity)
+        for facet, column in FACETS.items():
+            codes, uniques = pd.factorize(facet_column(facet, df[column]))
+            by_id = np.full(self.capacity, -1, dtype=np.int32)
+            by_id[ids] = codes
+            self.codes[facet] = by_id
+            self.values[facet] = list(uniques)
+            self.value_codes[facet] = {value: code for code, value in enumerate(self.values[facet])}
+            if facet in BITMAP_FACETS:
+                self.bitmaps[facet] = [np.packbits(by_id == code) for code in range(len(uniques))]
+            else:
+                order = np.lexsort((ids, codes))
+                starts = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+                sorted_ids = ids[order]
+                self.lists[facet] = [sorted_ids[start:end].copy() for start, end in zip(starts[:-1], starts[1:])]
+        self.orders = {}
+        self.built = True
+
+    # Callers hold self.lock
+    def grow(self, max_id):
+        capacity = capacity_for(max_id)
+        extra = (capacity - self.capacity) // 8
+        self.present = np.concatenate([self.present, np.zeros(extra, dtype=np.uint8)])
+        for facet in FACETS:
+            self.codes[facet] = np.concatenate([self.codes[facet], np.full(capacity - self.capacity, -1, dtype=np.int32)])
+        for bitmaps in self.bitmaps.values():
+            bitmaps[:] = [np.concatenate([bits, np.zeros(extra, dtype=np.uint8)]) for bits in bitmaps]
+        self.capacity = capacity
+
+    # Code of a facet value, allocating one for a new value
+    # Callers hold self.lock
+    def code_for(self, facet, value):
+        code = self.value_codes[facet].get(value)
+        if code is None:
+            code = len(self.values[facet])
+            self.values[facet].append(value)
+            self.value_codes[facet][value] = code
+            if facet in BITMAP_FACETS:
+                self.bitmaps[facet].append(np.zeros(self.capacity // 8, dtype=np.uint8))
+            else:
+                self.lists[facet].append(np.empty(0, dtype=np.int64))
+        return code
+
+    # Callers hold self.lock
+    def link(self, facet, code, key):
+        if facet in BITMAP_FACETS:
+            self.bitmaps[facet][code][key >> 3] |= BITS[key & 7]
+        else:
+            ids = self.lists[facet][code]
+            self.lists[facet][code] = np.insert(ids, np.searchsorted(ids, key), key)
+
+    # Callers hold self.lock
+    def unlink(self, facet, code, key):
+        if facet in BITMAP_FACETS:
+            self.bitmaps[facet][code][key >> 3] &= ~BITS[key & 7]
+        else:
+            ids = self.lists[facet][code]
+            position = np.searchsorted(ids, key)
+            if position < len(ids) and ids[position] == key:
+                self.lists[facet][code] = np.delete(ids, position)
+
+    # Ids sorted by a sort value (missing last), then by id, and the values
+    # Callers hold self.lock
+    def order(self, name):
+        if name not in self.orders:
+            ids = self.frame.index.to_numpy(dtype=np.int64)
+            values = sort_column(name, self.frame[SORT_COLUMNS[name]])
+            order = np.lexsort((ids, values))
+            self.orders[name] = (ids[order], values[order])
+        return self.orders[name]
+
+    # Move the changed books within a sort order: their old entries are
+    # deleted and their new ones inserted, each batch in one pass
+    # Callers hold self.lock
+    def reorder(self, name, keys, previous, df):
+        ids, values = self.orders[name]
+        column = SORT_COLUMNS[name]
+        before = [key for key in keys if key in previous.index]
+        after = [key for key in keys if key in df.index]
+        old = dict(zip(before, sort_column(name, book_column(previous, before, column))))
+        new = dict(zip(after, sort_column(name, book_column(df, after, column))))
+        moved = [key for key in keys if old.get(key) != new.get(key)]
+        if not moved:
+            return
+        positions = []
+        for key in moved:
+            if key in old:
+                position = self.locate(ids, values, key, old[key])
+                if position >= len(ids) or ids[position] != key:
+                    # Out of step with the frame: rebuilt on next use
+                    del self.orders[name]
+                    return
+                positions.append(position)
+        ids = np.delete(ids, positions)
+        values = np.delete(values, positions)
+        inserted = sorted((new[key], key) for key in moved if key in new)
+        if inserted:
+            positions = [self.locate(ids, values, key, value) for value, key in inserted]
+            ids = np.insert(ids, positions, [key for _, key in inserted])
+            values = np.insert(values, positions, [value for value, _ in inserted])
+        self.orders[name] = (ids, values)
+
+    # Position of (value, key) in a sort order
+    def locate(self, ids, values, key, value):
+        start = np.searchsorted(values, value, side="left")
+        end = np.searchsorted(values, value, side="right")
+        return start + np.searchsorted(ids[start:end], key)
+
+    # Bitmap of the books matching the selected values of one facet
+    # Callers hold self.lock
+    def facet_bitmap(self, facet, selected):
+        if facet == "year":
+            first, last = selected
+            codes = [code for code, year in enumerate(self.values[facet]) if first <= year <= last]
+        else:
+            codes = [self.value_codes[facet][value] for value in selected if value in self.value_codes[facet]]
+        if facet in BITMAP_FACETS:
+            bits = np.zeros(self.capacity // 8, dtype=np.uint8)
+            for code in codes:
+                bits |= self.bitmaps[facet][code]
+            return bits
+        ids = np.concatenate([self.lists[facet][code] for code in codes]) if codes else np.empty(0, dtype=np.int64)
+        return bitmap_of(ids, self.capacity)
+
+    # Combine facet bitmaps (optionally leaving one facet out) with AND or OR
+    # Returns None when nothing limits the selection (the whole catalog)
+    # Callers hold self.lock
+    def combine(self, bitmaps, match, within, skip=None):
+        active = [bits for facet, bits in bitmaps.items() if facet != skip]
+        if not active:
+            if within is None:
+                return None
+            combined = self.present.copy()
+        else:
+            combined = active[0].copy()
+            for bits in active[1:]:
+                if match == "any":
+                    combined |= bits
+                else:
+                    combined &= bits
+            combined &= self.present
+        if within is not None:
+            combined &= within
+        return combined
+
+    # Number of books with each value of a facet among the selected books
+    # (None: the whole catalog, counted from the indexes alone)
+    # Callers hold self.lock
+    def counts(self, facet, selection):
+        if facet in BITMAP_FACETS:
+            if selection is None:
+                return {value: popcount(bits) for value, bits in zip(self.values[facet], self.bitmaps[facet])}
+            return {value: popcount(self.bitmaps[facet][code] & selection) for code, value in enumerate(self.values[facet])}
+        if selection is None:
+            return {value: len(ids) for value, ids in zip(self.values[facet], self.lists[facet]) if len(ids)}
+        # Small selections gather the codes of their ids; for large ones (as
+        # OR filters give) weighting every book by its bit is faster
+        if popcount(selection) * SPARSE_RATIO < self.capacity:
+            tally = np.bincount(self.codes[facet][bitmap_ids(selection)] + 1, minlength=len(self.values[facet]) + 1)
+        else:
+            tally = np.bincount(self.codes[facet] + 1, weights=np.unpackbits(selection), minlength=len(self.values[facet]) + 1)
+        return {value: int(count) for value, count in zip(self.values[facet], tally[1:].tolist()) if count}
+
+    # Books matching the filters, a dict of facet -> selected values ("year"
+    # takes a (first, last) range); values of one facet are ORed and the
+    # facets are ANDed (match="all") or ORed (match="any"). ranked limits the
+    # result to these ids (search results, best first) and is the default order.
+    # Returns the matching ids in order, and per facet the count of every
+    # value among the books matching the other filters
+    def query(self, filters, match="all", ranked=None, sort=None, descending=False):
+        with self.lock:
+            if not self.built:
+                self.build()
+            bitmaps = {facet: self.facet_bitmap(facet, selected) for facet, selected in filters.items() if selected}
+            within = None
+            if ranked is not None:
+                ranked = np.asarray(ranked, dtype=np.int64)
+                ranked = ranked[ranked < self.capacity]
+                within = bitmap_of(ranked, self.capacity)
+            selection = self.combine(bitmaps, match, within)
+            if selection is None:
+                selection = self.present
+            if sort:
+                ids, values = self.order(sort)
+                matching = np.unpackbits(selection)[ids].astype(bool)
+                ids, values = ids[matching], values[matching]
+                if descending:
+                    known = np.searchsorted(values, np.inf)
+                    ids = np.concatenate([ids[:known][::-1], ids[known:]])
+            elif ranked is not None:
+                ids = ranked[np.unpackbits(selection)[ranked].astype(bool)]
+            else:
+                ids = bitmap_ids(selection)
+            counts = {facet: self.counts(facet, self.combine(bitmaps, match, within, skip=facet)) for facet in FACETS}
+            years = [year for year, ids_of_year in zip(self.values["year"], self.lists["year"]) if len(ids_of_year)]
+        return {
+            "ids": ids,
+            "counts": counts,
+            "years": (min(years), max(years)) if years else None,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time faceted queries over a catalog")
+    parser.add_argument("catalog", nargs="?", default="books_data.csv", help="catalog file (.csv, .db or .parquet)")
+    args = parser.parse_args()
+
+    # Imported here because storage imports this module
+    import storage
+    kind = {".db": "sqlite", ".parquet": "parquet"}.get(os.path.splitext(args.catalog)[1].lower(), "csv")
+    backend = storage.open_backend(kind, args.catalog)
+    backend.load()
+    start = time.perf_counter()
+    result = backend.facet_query({})
+    print(f"Built the facet indexes of {len(result['ids'])} books in {time.perf_counter() - start:.2f} s")
+    for facet, counts in result["counts"].items():
+        top = sorted(counts.items(), key=lambda item: -item[1])[:5]
+        print(f"{facet}: " + ", ".join(f"{value} ({count})" for value, count in top))
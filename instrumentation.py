@@ -0,0 +1,121 @@
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+# The rerun being recorded by the current thread: Streamlit runs every
+# session's script in its own thread, and code outside a recorded rerun
+# (background workers, other sessions with instrumentation off) records nothing
+current = threading.local()
+
+# Suffixes of the counter pairs that hit rates are computed from
+HIT_SUFFIX = "_hits"
+MISS_SUFFIX = "_misses"
+
+log_lock = threading.Lock()
+
+
+# Timings and counters of one script rerun
+class RerunRecord:
+    def __init__(self):
+        self.started_at = datetime.now().isoformat(timespec="milliseconds")
+        self.start = time.perf_counter()
+        self.total_ms = None
+        self.stages = defaultdict(lambda: {"calls": 0, "ms": 0.0})
+        self.counters = defaultdict(int)
+        self.notes = {}
+
+    def add_stage(self, name, seconds):
+        stage = self.stages[name]
+        stage["calls"] += 1
+        stage["ms"] += seconds * 1000
+
+    # Hit rate of every cache that counted both <name>_hits and <name>_misses
+    def hit_rates(self):
+        rates = {}
+        for name, hits in self.counters.items():
+            if name.endswith(HIT_SUFFIX):
+                cache = name[:-len(HIT_SUFFIX)]
+                lookups = hits + self.counters.get(cache + MISS_SUFFIX, 0)
+                rates[cache] = hits / lookups if lookups else 0.0
+        return rates
+
+    def as_dict(self):
+        return {
+            "started_at": self.started_at,
+            "total_ms": self.total_ms,
+            "notes": dict(self.notes),
+            "stages": {name: dict(stage) for name, stage in self.stages.items()},
+            "counters": dict(self.counters),
+            "hit_rates": self.hit_rates(),
+        }
+
+
+# Function to record one rerun: everything timed or counted by this thread
+# inside the block is collected; the finished record is appended to the
+# JSON Lines file at log_path if one is given
+@contextmanager
+def rerun(log_path=None):
+    record = RerunRecord()
+    current.record = record
+    try:
+        yield record
+    finally:
+        current.record = None
+        record.total_ms = (time.perf_counter() - record.start) * 1000
+        if log_path:
+            append_log(log_path, [record.as_dict()])
+
+
+# Function to time a block as one call of a named stage
+@contextmanager
+def stage(name):
+    record = getattr(current, "record", None)
+    if record is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record.add_stage(name, time.perf_counter() - start)
+
+
+# Decorator timing every call of a function as a named stage
+def timed(name):
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# Function to add to a named counter (bytes, cache hits, rows...)
+def count(name, value=1):
+    record = getattr(current, "record", None)
+    if record is not None:
+        record.counters[name] += value
+
+
+# Function to attach a value (such as the page shown) to the current rerun
+def note(name, value):
+    record = getattr(current, "record", None)
+    if record is not None:
+        record.notes[name] = value
+
+
+# Function to serialise records as JSON Lines
+def to_jsonl(records):
+    return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+
+
+# Function to append records to a JSON Lines file
+def append_log(log_path, records):
+    with log_lock:
+        with open(log_path, "a", encoding="utf-8") as log_file:
+            log_file.write(to_jsonl(records))
@@ -1,10 +1,20 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
+import heapq
+import html
 import os
-import base64
 from PIL import Image
-import io
+import math
+import storage
+import covers
+import cards
+import catalog_stats
+import catalog_analytics
+import bulk_io
+import duplicates
+import instrumentation
+import snapshots
 
 # Set page configuration for RTL support
 st.set_page_config(
@@ -169,60 +179,272 @@ BOOKS_FOLDER = "books"
 if not os.path.exists(BOOKS_FOLDER):
     os.makedirs(BOOKS_FOLDER)
 
+# Sidebar logo, found next to this script whatever the working directory
+LOGO_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Books", "logo.png")
+
+# Function to show the sidebar logo; a missing or unreadable file is skipped
+def show_logo():
+    try:
+        logo = Image.open(LOGO_FILE)
+    except OSError:
+        return
+    st.image(logo, use_column_width=True)
+
+# Memory budget for cached base64 cover payloads, shared by all sessions
+COVER_CACHE_BYTES = 64 * 1024 * 1024
+covers.payload_cache.resize(COVER_CACHE_BYTES)
+
+# How covers reach the browser: "static" publishes the thumbnails to
+# STATIC_COVERS_FOLDER for Streamlit's static file serving, so the browser
+# fetches each one once and then caches it; "inline" embeds them as base64
+# data URIs. Static serving is enabled in .streamlit/config.toml; without it
+# covers are sent inline. Streamlit serves the static folder next to this
+# script, whatever the working directory.
+COVER_SERVING = "static"
+STATIC_COVERS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "covers")
+STATIC_COVERS_URL = "app/static/covers"
+
+# Shown when an uploaded cover cannot be read as an image
+INVALID_COVER_MESSAGE = "تعذر قراءة صورة الغلاف. يرجى رفع صورة صالحة بصيغة JPG أو PNG."
+
+# Number of matches offered by the edit/delete book picker
+PICKER_LIMIT = 20
+
+# Possible duplicates listed when adding a book
+DUPLICATE_MATCHES_SHOWN = 5
+
+# Recent changes offered as restore points
+RESTORE_POINTS_SHOWN = 50
+
+# Page sizes offered when browsing books (only one page of cards is rendered)
+PAGE_SIZE_OPTIONS = [10, 20, 50, 100]
+
+# Ratings offered by the rating filter
+RATING_OPTIONS = [1, 2, 3, 4, 5]
+
+# Authors offered by the author filter: the ones with the most matching books
+FACET_AUTHORS_SHOWN = 50
+# Authors whose counts are listed under the author filter
+FACET_AUTHOR_COUNTS_SHOWN = 5
+
+# How the filters of different facets combine
+MATCH_OPTIONS = {"كل المرشحات": "all", "أي مرشح": "any"}
+
+# Orders offered when browsing books (None: by id, or by relevance when searching)
+SORT_OPTIONS = {
+    "الترتيب الافتراضي": None,
+    "التقييم": "rating",
+    "عدد الصفحات": "pages",
+    "تاريخ النشر": "published",
+    "تاريخ الإضافة": "added",
+}
+
+# Opt-in performance instrumentation: per-rerun stage timings, payload bytes
+# and cache hit rates, shown in a sidebar panel and appended to
+# INSTRUMENTATION_LOG as JSON Lines (None keeps them in the session only)
+INSTRUMENTATION = False
+INSTRUMENTATION_LOG = "perf_log.jsonl"
+# Reruns kept per session for the panel's averages and download
+INSTRUMENTATION_HISTORY = 50
+
 # Default data file path
 DATA_FILE = "books_data.csv"
 
+# Storage backend: "csv" keeps the catalog in DATA_FILE, "sqlite" keeps it in
+# SQLITE_FILE and "parquet" in PARQUET_FILE (an existing CSV catalog is
+# migrated on first use)
+STORAGE_BACKEND = "csv"
+SQLITE_FILE = "books_data.db"
+PARQUET_FILE = "books_data.parquet"
+
+# CSV storage mode: "incremental" records add/edit/delete as single journal
+# entries that are compacted into the data file in the background, "full"
+# rewrites the whole data file on every change
+STORAGE_MODE = "incremental"
+
+# Function to get the configured storage backend
+def get_backend():
+    if STORAGE_BACKEND == "sqlite":
+        return storage.open_backend("sqlite", SQLITE_FILE, csv_path=DATA_FILE)
+    if STORAGE_BACKEND == "parquet":
+        return storage.open_backend("parquet", PARQUET_FILE, csv_path=DATA_FILE)
+    return storage.open_backend("csv", DATA_FILE, mode=STORAGE_MODE)
+
 # Function to load existing data or create new dataframe
+# The backend parses the data once per on-disk version and shares the frame
+# across sessions and reruns, so callers must copy it before mutating in place
+@instrumentation.timed("load_data")
 def load_data():
-    if os.path.exists(DATA_FILE):
-        return pd.read_csv(DATA_FILE)
+    return get_backend().load()
+
+# Function to add one book
+@instrumentation.timed("insert_book")
+def insert_book(new_book):
+    get_backend().add(new_book)
+
+# Function to find catalog books that look like a new title and author
+def find_duplicates(title, author):
+    return get_backend().find_duplicates([duplicates.book_key(title, author)])[0]
+
+# Function to update one book, identified by its id and current title
+# base is the book as it was shown in the form, at catalog version base_version;
+# raises storage.EditConflict if someone else changed the same fields meanwhile
+@instrumentation.timed("update_book")
+def update_book(df, book_id, changes, base=None, base_version=None):
+    get_backend().update(book_id, df.at[book_id, "عنوان"], changes, base, base_version)
+
+# Function to delete one book by id
+@instrumentation.timed("remove_book")
+def remove_book(df, book_id):
+    get_backend().delete([book_id], df.at[book_id, "عنوان"])
+
+# Function to label a book in the pickers; duplicate titles get the author and id
+def book_label(df, book_id):
+    title = df.at[book_id, "عنوان"]
+    if len(get_backend().ids_for_title(title)) > 1:
+        return f"{title} — {df.at[book_id, 'مؤلف']} (#{book_id})"
+    return str(title)
+
+# Function to render the type-ahead book picker and return the selected id
+# Only the top matches are sent to the browser; with no query the most
+# recently added books are offered
+def pick_book(df, label, key):
+    query = st.text_input("ابحث بالعنوان أو اسم المؤلف", key=f"{key}_query")
+    if query:
+        book_ids = get_backend().search(query, limit=PICKER_LIMIT, fuzzy=True)
     else:
-        return pd.DataFrame({
-            "عنوان": [],
-            "مؤلف": [],
-            "تصنيف": [],
-            "تاريخ النشر": [],
-            "عدد الصفحات": [],
-            "الحالة": [],
-            "التقييم": [],
-            "ملاحظات": [],
-            "تاريخ الإضافة": [],
-            "صورة الغلاف": []  # New column for cover image filename
-        })
-
-# Function to save data
-def save_data(df):
-    df.to_csv(DATA_FILE, index=False)
+        book_ids = df.index[::-1][:PICKER_LIMIT].tolist()
+    
+    if not book_ids:
+        st.markdown(
+            """
+            <div class="warning-message">
+                لا توجد كتب تطابق البحث.
+            </div>
+            """, 
+            unsafe_allow_html=True
+        )
+        return None
+    
+    return st.selectbox(label, book_ids, format_func=lambda book_id: book_label(df, book_id), key=key)
 
 # Function to save uploaded cover image
-def save_cover_image(uploaded_file, book_title):
+# Covers are named by the hash of their content, so the same image uploaded for
+# several books is stored once. Decoding, orientation, resizing and thumbnails
+# run on the cover worker pool; the book can be saved while the cover is pending
+# Raises covers.InvalidCover if the upload is not a readable image
+@instrumentation.timed("save_cover_image")
+def save_cover_image(uploaded_file):
     if uploaded_file is not None:
-        # Create a safe filename based on book title
-        filename = "".join(c for c in book_title if c.isalnum() or c in [' ', '_']).rstrip()
-        filename = filename.replace(' ', '_')
-        filename = f"{filename}_{datetime.now().strftime('%Y%m%d%H%M%S')}.jpg"
-        
-        # Save the image
-        image_path = os.path.join(BOOKS_FOLDER, filename)
-        
-        # Process and save the image
-        img = Image.open(uploaded_file)
-        img.save(image_path)
-        
-        return filename
+        data = uploaded_file.getvalue()
+        instrumentation.count("cover_upload_bytes", len(data))
+        return covers.store_cover(BOOKS_FOLDER, data)
     return None
 
+# Function to delete a cover file once no book refers to it any more
+# Only for covers no saved book ever used: covers of deleted books and
+# replaced covers stay on disk so that restoring an earlier catalog brings
+# them back, and are removed by "covers.py gc" once the snapshots expire
+def release_cover(cover_filename):
+    if cover_filename and cover_filename not in get_backend().retained_covers():
+        covers.remove_cover(BOOKS_FOLDER, cover_filename)
+
 # Function to get image data for display
+# Encoded payloads are served from an in-process LRU cache
+@instrumentation.timed("get_image_data")
 def get_image_data(image_filename):
-    if image_filename and os.path.exists(os.path.join(BOOKS_FOLDER, image_filename)):
-        with open(os.path.join(BOOKS_FOLDER, image_filename), "rb") as img_file:
-            return base64.b64encode(img_file.read()).decode()
+    if image_filename:
+        return covers.payload_cache.get(os.path.join(BOOKS_FOLDER, image_filename))
+    return None
+
+# Function to get a cover's card thumbnail as a static URL or a data URI
+# Missing thumbnails for older covers are generated on first display
+def get_thumbnail_uri(image_filename):
+    thumbnail = covers.get_thumbnail(BOOKS_FOLDER, image_filename)
+    if thumbnail and COVER_SERVING == "static" and st.get_option("server.enableStaticServing"):
+        return covers.static_url(BOOKS_FOLDER, thumbnail, STATIC_COVERS_FOLDER, STATIC_COVERS_URL)
+    img_data = get_image_data(thumbnail)
+    if img_data:
+        return f"data:{covers.image_mime(thumbnail)};base64,{img_data}"
     return None
 
+# Function to show the background cover work in the sidebar: uploaded covers
+# still being processed and the "reprocess all covers" job
+def cover_status():
+    job = covers.reprocess_job(BOOKS_FOLDER)
+    running = job is not None and not job.done()
+    if st.button("إعادة معالجة كل الأغلفة", disabled=running):
+        job = covers.start_reprocess(BOOKS_FOLDER)
+        running = True
+    
+    waiting = len(covers.pending_covers(BOOKS_FOLDER))
+    if waiting:
+        st.info(f"جاري معالجة {waiting} من صور الأغلفة")
+    if running:
+        st.progress(job.fraction(), text=f"إعادة معالجة الأغلفة: {job.processed} من {job.total}")
+    elif job is not None and job.error() is not None:
+        st.error(f"تعذرت إعادة معالجة الأغلفة: {job.error()}")
+    elif job is not None:
+        st.markdown(
+            f"<p><small>تمت إعادة معالجة {job.processed} غلاف، وتعذرت معالجة {len(job.failed)}</small></p>",
+            unsafe_allow_html=True
+        )
+    if waiting or running:
+        st.button("تحديث الحالة", key="cover_status_refresh")
+
+# Function to move the book list by a number of pages (button callback)
+def change_page(step, total_pages):
+    page = st.session_state.get("view_page", 1) + step
+    st.session_state["view_page"] = min(max(page, 1), total_pages)
+
+# Function to render the page navigator and return the ids of the selected page
+def paginate(filtered_ids, filters):
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        page_size = st.selectbox("عدد الكتب في الصفحة", PAGE_SIZE_OPTIONS, key="view_page_size")
+    
+    total_pages = max(1, math.ceil(len(filtered_ids) / page_size))
+    
+    # Go back to the first page whenever the filters or page size change
+    filters = filters + (page_size,)
+    if st.session_state.get("view_filters") != filters:
+        st.session_state["view_filters"] = filters
+        st.session_state["view_page"] = 1
+    st.session_state["view_page"] = min(st.session_state.get("view_page", 1), total_pages)
+    
+    with col2:
+        page = st.number_input("الانتقال إلى الصفحة", min_value=1, max_value=total_pages, step=1, key="view_page")
+    
+    nav1, nav2, nav3 = st.columns([1, 2, 1])
+    with nav1:
+        st.button("السابق", on_click=change_page, args=(-1, total_pages), disabled=page <= 1)
+    with nav2:
+        st.markdown(f"<p>صفحة {page} من {total_pages}</p>", unsafe_allow_html=True)
+    with nav3:
+        st.button("التالي", on_click=change_page, args=(1, total_pages), disabled=page >= total_pages)
+    
+    start = (page - 1) * page_size
+    return filtered_ids[start:start + page_size]
+
+# Function to keep a filter's selection across reruns
+# Streamlit identifies a widget by its options, which change as books are
+# added and as the author list follows the other filters, so the selection
+# is handed to the widget explicitly
+def keep_selection(key, allowed=None):
+    selected = st.session_state.get(key, [])
+    if allowed is not None:
+        selected = [value for value in selected if value in allowed]
+    st.session_state[key] = selected
+    return selected
+
+# Function to list a filter's options with their numbers of matching books
+def facet_counts(counts, options, text=str):
+    return " · ".join(f"{text(value)}: {counts.get(value, 0):,}" for value in options)
+
 # Main app function
 def main():
-    # Load data
-    df = load_data()
+    backend = get_backend()
     
     # Display banner
     st.markdown(
@@ -238,47 +460,74 @@ def main():
 
     # Sidebar
     with st.sidebar:
-        st.image("D:\Streamlit Arabic Books Tracker\Books\logo.png", use_column_width=True)
+        show_logo()
         st.markdown("<h2 style='text-align: right;'>لوحة التحكم</h2>", unsafe_allow_html=True)
         
         # Display statistics
         
         st.markdown("<div class='stats-container'>", unsafe_allow_html=True)
-        st.markdown(f"<h3 style='text-align: right;'>إحصائيات</h3>", unsafe_allow_html=True)
+        st.markdown("<h3 style='text-align: right;'>إحصائيات</h3>", unsafe_allow_html=True)
         
-        if not df.empty:
-            total_books = len(df)
-            read_books = len(df[df["الحالة"] == "تمت القراءة"])
-            reading_books = len(df[df["الحالة"] == "قيد القراءة"])
-            unread_books = len(df[df["الحالة"] == "لم تتم القراءة بعد"])
+        # Aggregates are maintained by the backend on every write, so this
+        # does not scan the catalog
+        stats = backend.catalog_stats()
+        total_books = stats["total"]
+        if total_books:
+            read_books = stats["statuses"].get("تمت القراءة", 0)
+            reading_books = stats["statuses"].get("قيد القراءة", 0)
+            unread_books = stats["statuses"].get("لم تتم القراءة بعد", 0)
+            avg_rating = catalog_stats.average_rating(stats)
             
             st.markdown(f"<p>إجمالي الكتب: {total_books}</p>", unsafe_allow_html=True)
             st.markdown(f"<p>كتب تمت قراءتها: {read_books}</p>", unsafe_allow_html=True)
             st.markdown(f"<p>كتب قيد القراءة: {reading_books}</p>", unsafe_allow_html=True)
             st.markdown(f"<p>كتب لم تتم قراءتها: {unread_books}</p>", unsafe_allow_html=True)
+            st.markdown(f"<p>إجمالي الصفحات: {int(stats['total_pages'])}</p>", unsafe_allow_html=True)
+            if avg_rating is not None:
+                st.markdown(f"<p>متوسط التقييم: {avg_rating:.1f}</p>", unsafe_allow_html=True)
+            for category, count in sorted(stats["categories"].items(), key=lambda item: -item[1]):
+                st.markdown(f"<p><small>{category}: {count}</small></p>", unsafe_allow_html=True)
         else:
             st.markdown("<p>لا توجد بيانات بعد</p>", unsafe_allow_html=True)
         
         st.markdown("</div>", unsafe_allow_html=True)
         
+        # Recount everything from scratch and repair the stats if they drifted
+        if st.button("التحقق من الإحصائيات"):
+            if backend.verify_stats():
+                st.success("الإحصائيات مطابقة للبيانات")
+            else:
+                st.warning("تم تصحيح الإحصائيات بعد إعادة حسابها")
+        
+        cover_status()
+        
         # Operation selection
         operation = st.selectbox(
             "اختر العملية",
-            ["عرض الكتب", "إضافة كتاب", "تعديل كتاب", "حذف كتاب"]
+            ["عرض الكتب", "إضافة كتاب", "تعديل كتاب", "حذف كتاب", "استيراد كتب", "لوحة التحليلات", "الكتب المكررة", "استعادة نسخة سابقة"]
         )
+        instrumentation.note("operation", operation)
     
     # Main content area based on selected operation
     if operation == "إضافة كتاب":
-        add_book(df)
+        add_book()
     elif operation == "عرض الكتب":
-        view_books(df)
+        view_books(backend)
     elif operation == "تعديل كتاب":
-        edit_book(df)
+        edit_book(load_data())
     elif operation == "حذف كتاب":
-        delete_book(df)
+        delete_book(load_data())
+    elif operation == "استيراد كتب":
+        import_books(backend)
+    elif operation == "لوحة التحليلات":
+        show_dashboard(backend)
+    elif operation == "الكتب المكررة":
+        show_duplicates(backend)
+    elif operation == "استعادة نسخة سابقة":
+        restore_catalog(backend)
         
 # Add book function
-def add_book(df):
+def add_book():
     st.markdown("<h2>إضافة كتاب جديد</h2>", unsafe_allow_html=True)
     
     col1, col2 = st.columns(2)
@@ -286,30 +535,64 @@ def add_book(df):
     with col1:
         title = st.text_input("عنوان الكتاب")
         author = st.text_input("اسم المؤلف")
-        category = st.selectbox("التصنيف", [
-            "أدب", "تاريخ", "فلسفة", "علوم", "دين", 
-            "سياسة", "اقتصاد", "تنمية بشرية", "سيرة ذاتية", "أخرى"
-        ])
+        category = st.selectbox("التصنيف", storage.CATEGORIES)
         pub_date = st.date_input("تاريخ النشر")
         # New field for cover image
         cover_image = st.file_uploader("صورة الغلاف", type=["jpg", "jpeg", "png"])
     
     with col2:
         pages = st.number_input("عدد الصفحات", min_value=1, value=100)
-        status = st.selectbox("حالة القراءة", [
-            "تمت القراءة", "قيد القراءة", "لم تتم القراءة بعد"
-        ])
+        status = st.selectbox("حالة القراءة", storage.STATUSES)
         rating = st.slider("التقييم", 1, 5, 3)
         notes = st.text_area("ملاحظات")
     
     # Display preview of uploaded image
     if cover_image:
-        st.image(cover_image, width=150, caption="معاينة صورة الغلاف")
+        st.image(covers.preview_thumbnail(cover_image), width=150, caption="معاينة صورة الغلاف")
+    
+    # Warn while typing if the catalog already has this book or one spelled
+    # almost the same way; adding it anyway needs an explicit confirmation
+    confirmed = True
+    if title and author:
+        matches = find_duplicates(title, author)
+        if matches["exact"] or matches["similar"]:
+            df = load_data()
+            # Titles and authors are escaped like on the book cards
+            describe = lambda book_id: html.escape(f"{df.at[book_id, 'عنوان']} — {df.at[book_id, 'مؤلف']}")
+            lines = [f"<li>{describe(book_id)} (#{book_id})</li>" for book_id in matches["exact"]]
+            lines += [
+                f"<li>{describe(book_id)} (#{book_id}، تشابه {score:.0%})</li>"
+                for book_id, score in matches["similar"]
+            ]
+            heading = "هذا الكتاب موجود بالفعل:" if matches["exact"] else "توجد كتب مشابهة:"
+            st.markdown(
+                f"""
+                <div class="warning-message">
+                    {heading}
+                    <ul>{"".join(lines[:DUPLICATE_MATCHES_SHOWN])}</ul>
+                </div>
+                """, 
+                unsafe_allow_html=True
+            )
+            confirmed = st.checkbox("إضافة الكتاب رغم ذلك")
     
     if st.button("إضافة الكتاب"):
-        if title and author:
+        if title and author and not confirmed:
+            st.markdown(
+                """
+                <div class="warning-message">
+                    يرجى تأكيد إضافة الكتاب رغم وجود كتب مشابهة.
+                </div>
+                """, 
+                unsafe_allow_html=True
+            )
+        elif title and author:
             # Save cover image if uploaded
-            cover_filename = save_cover_image(cover_image, title) if cover_image else None
+            try:
+                cover_filename = save_cover_image(cover_image) if cover_image else None
+            except covers.InvalidCover:
+                st.error(INVALID_COVER_MESSAGE)
+                return
             
             # Create new book record
             new_book = {
@@ -325,9 +608,8 @@ def add_book(df):
                 "صورة الغلاف": cover_filename
             }
             
-            # Add to dataframe
-            df = pd.concat([df, pd.DataFrame([new_book])], ignore_index=True)
-            save_data(df)
+            # Add to the catalog
+            insert_book(new_book)
             
             st.markdown(
                 """
@@ -348,10 +630,10 @@ def add_book(df):
             )
 
 # View books function
-def view_books(df):
+def view_books(backend):
     st.markdown("<h2>عرض الكتب</h2>", unsafe_allow_html=True)
     
-    if df.empty:
+    if backend.catalog_stats()["total"] == 0:
         st.markdown(
             """
             <div class="warning-message">
@@ -362,44 +644,79 @@ def view_books(df):
         )
         return
     
-    # Filters
+    # Filters are answered from the backend's facet indexes before the widgets
+    # are drawn, so every option can show how many books it would match
+    # together with the other filters
+    categories = backend.categories()
+    filters = {
+        "status": keep_selection("filter_status", storage.STATUSES),
+        "category": keep_selection("filter_category", categories),
+        "rating": keep_selection("filter_rating", RATING_OPTIONS),
+        "author": keep_selection("filter_author"),
+        # A (first, last) range, only while the year filter is switched on
+        "year": st.session_state.get("filter_year") if st.session_state.get("filter_by_year") else None,
+    }
+    match = MATCH_OPTIONS[st.session_state.get("filter_match", "كل المرشحات")]
+    search_term = st.session_state.get("filter_search", "")
+    sort = SORT_OPTIONS[st.session_state.get("filter_sort", "الترتيب الافتراضي")]
+    descending = st.session_state.get("filter_descending", True)
+    with instrumentation.stage("filter"):
+        result = backend.facet_query(filters, match, search_term, sort, descending)
+    counts = result["counts"]
+    filtered_ids = result["ids"]
+    instrumentation.count("filtered_rows", len(filtered_ids))
+    
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        filter_status = st.multiselect(
-            "تصفية حسب الحالة",
-            ["تمت القراءة", "قيد القراءة", "لم تتم القراءة بعد"],
-            default=[]
-        )
+        st.multiselect("تصفية حسب الحالة", storage.STATUSES, key="filter_status")
+        st.caption(facet_counts(counts["status"], storage.STATUSES))
     
     with col2:
-        categories = df["تصنيف"].unique().tolist()
-        filter_category = st.multiselect(
-            "تصفية حسب التصنيف",
-            categories,
-            default=[]
-        )
+        st.multiselect("تصفية حسب التصنيف", categories, key="filter_category")
+        st.caption(facet_counts(counts["category"], categories))
     
     with col3:
-        search_term = st.text_input("البحث في العناوين أو المؤلفين")
+        st.text_input("البحث في العناوين أو المؤلفين", key="filter_search")
     
-    # Apply filters
-    filtered_df = df.copy()
+    col1, col2, col3 = st.columns(3)
     
-    if filter_status:
-        filtered_df = filtered_df[filtered_df["الحالة"].isin(filter_status)]
+    with col1:
+        st.multiselect("تصفية حسب التقييم", RATING_OPTIONS, key="filter_rating")
+        st.caption(facet_counts(counts["rating"], RATING_OPTIONS, lambda rating: "⭐" * rating))
     
-    if filter_category:
-        filtered_df = filtered_df[filtered_df["تصنيف"].isin(filter_category)]
+    with col2:
+        # Only the authors with the most matching books are offered, plus the
+        # ones already chosen
+        top_authors = heapq.nlargest(FACET_AUTHORS_SHOWN, counts["author"], key=counts["author"].get)
+        authors = filters["author"] + [author for author in top_authors if author not in filters["author"]]
+        st.multiselect("تصفية حسب المؤلف", authors, key="filter_author")
+        st.caption(facet_counts(counts["author"], authors[:FACET_AUTHOR_COUNTS_SHOWN]))
+    
+    with col3:
+        years = result["years"]
+        if years is not None and years[0] < years[1] and st.checkbox("تصفية حسب سنة النشر", key="filter_by_year"):
+            # The range is clamped to the years in the catalog, which move
+            # with its books
+            low, high = st.session_state.get("filter_year") or years
+            st.session_state["filter_year"] = (min(max(low, years[0]), years[1]), max(min(high, years[1]), years[0]))
+            low, high = st.slider("سنة النشر", years[0], years[1], key="filter_year")
+            in_range = sum(count for year, count in counts["year"].items() if low <= year <= high)
+            st.caption(f"{in_range:,} كتاب منشور بين {low} و{high}")
     
-    if search_term:
-        filtered_df = filtered_df[
-            filtered_df["عنوان"].str.contains(search_term, case=False) | 
-            filtered_df["مؤلف"].str.contains(search_term, case=False)
-        ]
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.radio("الجمع بين المرشحات", list(MATCH_OPTIONS), horizontal=True, key="filter_match")
+    
+    with col2:
+        st.selectbox("ترتيب حسب", list(SORT_OPTIONS), key="filter_sort")
+    
+    with col3:
+        st.checkbox("تنازلي", value=True, key="filter_descending", disabled=sort is None)
     
     # Display books as cards
-    if filtered_df.empty:
+    if len(filtered_ids) == 0:
         st.markdown(
             """
             <div class="warning-message">
@@ -409,50 +726,68 @@ def view_books(df):
             unsafe_allow_html=True
         )
     else:
-        st.markdown(f"<p>تم العثور على {len(filtered_df)} كتاب</p>", unsafe_allow_html=True)
+        st.markdown(f"<p>تم العثور على {len(filtered_ids)} كتاب</p>", unsafe_allow_html=True)
         
-        for i, (_, book) in enumerate(filtered_df.iterrows()):
-            # Determine rating stars
-            stars = "⭐" * int(book["التقييم"])
-            
-            # Determine status color
-            status_color = {
-                "تمت القراءة": "#28a745",
-                "قيد القراءة": "#ffc107",
-                "لم تتم القراءة بعد": "#6c757d"
-            }
-            
-            # Cover image handling
-            cover_img_html = ""
-            if pd.notna(book.get("صورة الغلاف")) and book["صورة الغلاف"]:
-                img_data = get_image_data(book["صورة الغلاف"])
-                if img_data:
-                    cover_img_html = f'<img src="data:image/jpeg;base64,{img_data}" class="book-cover" alt="غلاف الكتاب">'
-                else:
-                    cover_img_html = '<div class="no-cover">لا توجد صورة</div>'
-            else:
-                cover_img_html = '<div class="no-cover">لا توجد صورة</div>'
-            
-            # Display book card
-            st.markdown(
-                f"""
-                <div class="book-card">
-                    {cover_img_html}
-                    <div class="book-details">
-                        <h3>{book["عنوان"]}</h3>
-                        <p>المؤلف: {book["مؤلف"]}</p>
-                        <p>التصنيف: {book["تصنيف"]}</p>
-                        <p>تاريخ النشر: {book["تاريخ النشر"]}</p>
-                        <p>عدد الصفحات: {book["عدد الصفحات"]}</p>
-                        <p>الحالة: <span style="color: {status_color.get(book["الحالة"], "#000")};">{book["الحالة"]}</span></p>
-                        <p>التقييم: {stars}</p>
-                        <p>ملاحظات: {book["ملاحظات"]}</p>
-                        <p><small>تاريخ الإضافة: {book["تاريخ الإضافة"]}</small></p>
-                    </div>
-                </div>
-                """, 
-                unsafe_allow_html=True
-            )
+        df = result["frame"]
+        export_results(lambda: df.loc[filtered_ids])
+        
+        # Only the current page is rendered, so only its covers are loaded
+        page_ids = paginate(filtered_ids, (
+            tuple((facet, tuple(selected)) for facet, selected in filters.items() if selected),
+            match, search_term, sort, descending
+        ))
+        page_df = df.loc[page_ids]
+        
+        # Build every card on the page at once and emit them in a single call
+        with instrumentation.stage("render_cards"):
+            cards_html = cards.render_cards_html(page_df, get_thumbnail_uri, covers.pending_covers(BOOKS_FOLDER))
+        instrumentation.count("card_html_bytes", len(cards_html.encode("utf-8")))
+        with instrumentation.stage("emit_cards"):
+            st.markdown(cards_html, unsafe_allow_html=True)
+
+# Export the filtered books in the background and offer the file when ready
+# filtered_books returns the frame, so it is only gathered for an export
+def export_results(filtered_books):
+    with st.expander("تصدير النتائج"):
+        col1, col2 = st.columns(2)
+        with col1:
+            file_format = st.selectbox("صيغة الملف", list(bulk_io.EXPORT_FORMATS), key="export_format")
+        with col2:
+            with_covers = st.checkbox("تضمين صور الأغلفة (ملف ZIP)", key="export_covers")
+        
+        if st.button("تجهيز ملف التصدير"):
+            previous = st.session_state.pop("export_job", None)
+            if previous is not None:
+                previous.discard()
+            st.session_state.export_job = bulk_io.ExportJob(filtered_books(), file_format, with_covers, BOOKS_FOLDER)
+        
+        job = st.session_state.get("export_job")
+        if job is None:
+            return
+        if not job.done():
+            st.progress(job.fraction(), text=f"جاري التصدير: {job.written} من {job.total} كتاب")
+            st.button("تحديث الحالة")
+        elif job.error() is not None:
+            st.error(f"تعذر تصدير الكتب: {job.error()}")
+        else:
+            # Streamlit holds a download in the server's memory while it is
+            # offered, so the size is shown; the temporary file is removed
+            # once it has been downloaded
+            st.caption(f"حجم الملف: {job.size() / 2**20:.1f} ميجابايت، ويُحمَّل كاملاً في ذاكرة الخادم أثناء عرض زر التنزيل")
+            with open(job.path, "rb") as export_file:
+                st.download_button(
+                    "تنزيل الملف",
+                    export_file,
+                    file_name=job.file_name,
+                    mime=job.mime,
+                    on_click=discard_export
+                )
+
+# Remove the finished export once its file has been downloaded
+def discard_export():
+    job = st.session_state.pop("export_job", None)
+    if job is not None:
+        job.discard()
 
 # Edit book function
 def edit_book(df):
@@ -469,14 +804,20 @@ def edit_book(df):
         )
         return
     
-    # Select book to edit
-    book_titles = df["عنوان"].tolist()
-    selected_book = st.selectbox("اختر الكتاب الذي تريد تعديله", book_titles)
+    # Select book to edit (by id, so duplicate titles stay distinguishable)
+    selected_book = pick_book(df, "اختر الكتاب الذي تريد تعديله", "edit_book")
     
-    if selected_book:
-        # Get index of selected book
-        book_idx = df[df["عنوان"] == selected_book].index[0]
-        book = df.iloc[book_idx]
+    if selected_book is not None:
+        # Look the book up by id
+        book_idx = selected_book
+        book = df.loc[book_idx]
+        
+        # Remember the book as it was first shown, so that saving can tell the
+        # fields changed here from those changed by other users meanwhile
+        edit_base = st.session_state.get("edit_base")
+        if edit_base is None or edit_base[0] != book_idx:
+            edit_base = (book_idx, get_backend().catalog_version(), book.to_dict())
+            st.session_state.edit_base = edit_base
         
         st.markdown("<h3>تعديل بيانات الكتاب</h3>", unsafe_allow_html=True)
         
@@ -484,7 +825,13 @@ def edit_book(df):
         current_cover = None
         if pd.notna(book.get("صورة الغلاف")) and book["صورة الغلاف"]:
             img_path = os.path.join(BOOKS_FOLDER, book["صورة الغلاف"])
-            if os.path.exists(img_path):
+            if book["صورة الغلاف"] in covers.pending_covers(BOOKS_FOLDER):
+                st.info("جاري معالجة صورة الغلاف...")
+                current_cover = book["صورة الغلاف"]
+            elif os.path.exists(img_path):
+                preview = covers.get_thumbnail(BOOKS_FOLDER, book["صورة الغلاف"], "preview")
+                if preview:
+                    img_path = os.path.join(BOOKS_FOLDER, preview)
                 st.image(img_path, width=150, caption="صورة الغلاف الحالية")
                 current_cover = book["صورة الغلاف"]
         
@@ -493,12 +840,8 @@ def edit_book(df):
         with col1:
             title = st.text_input("عنوان الكتاب", value=book["عنوان"])
             author = st.text_input("اسم المؤلف", value=book["مؤلف"])
-            category = st.selectbox("التصنيف", [
-                "أدب", "تاريخ", "فلسفة", "علوم", "دين", 
-                "سياسة", "اقتصاد", "تنمية بشرية", "سيرة ذاتية", "أخرى"
-            ], index=["أدب", "تاريخ", "فلسفة", "علوم", "دين", 
-                    "سياسة", "اقتصاد", "تنمية بشرية", "سيرة ذاتية", "أخرى"].index(book["تصنيف"]) if book["تصنيف"] in ["أدب", "تاريخ", "فلسفة", "علوم", "دين", 
-                    "سياسة", "اقتصاد", "تنمية بشرية", "سيرة ذاتية", "أخرى"] else 0)
+            category = st.selectbox("التصنيف", storage.CATEGORIES,
+                index=storage.CATEGORIES.index(book["تصنيف"]) if book["تصنيف"] in storage.CATEGORIES else 0)
             try:
                 pub_date = st.date_input("تاريخ النشر", value=pd.to_datetime(book["تاريخ النشر"]))
             except:
@@ -507,43 +850,54 @@ def edit_book(df):
             new_cover = st.file_uploader("تغيير صورة الغلاف", type=["jpg", "jpeg", "png"])
         
         with col2:
-            pages = st.number_input("عدد الصفحات", min_value=1, value=int(book["عدد الصفحات"]))
-            status = st.selectbox("حالة القراءة", [
-                "تمت القراءة", "قيد القراءة", "لم تتم القراءة بعد"
-            ], index=["تمت القراءة", "قيد القراءة", "لم تتم القراءة بعد"].index(book["الحالة"]))
-            rating = st.slider("التقييم", 1, 5, int(book["التقييم"]))
-            notes = st.text_area("ملاحظات", value=book["ملاحظات"])
+            pages = st.number_input("عدد الصفحات", min_value=1,
+                value=int(book["عدد الصفحات"]) if pd.notna(book["عدد الصفحات"]) else 100)
+            status = st.selectbox("حالة القراءة", storage.STATUSES,
+                index=storage.STATUSES.index(book["الحالة"]) if book["الحالة"] in storage.STATUSES else 0)
+            rating = st.slider("التقييم", 1, 5, int(book["التقييم"]) if pd.notna(book["التقييم"]) else 3)
+            notes = st.text_area("ملاحظات", value=book["ملاحظات"] if pd.notna(book["ملاحظات"]) else "")
         
         # Preview new cover
         if new_cover:
-            st.image(new_cover, width=150, caption="معاينة صورة الغلاف الجديدة")
+            st.image(covers.preview_thumbnail(new_cover), width=150, caption="معاينة صورة الغلاف الجديدة")
         
         if st.button("حفظ التعديلات"):
             if title and author:
-                # Handle cover image update
+                # Save the new cover first. Covers are named by their content, so
+                # the old file is kept: other books or snapshots may use it, and
+                # "covers.py gc" removes it once nothing does
                 cover_filename = current_cover
                 if new_cover:
-                    # Remove old cover if exists
-                    if current_cover and os.path.exists(os.path.join(BOOKS_FOLDER, current_cover)):
-                        try:
-                            os.remove(os.path.join(BOOKS_FOLDER, current_cover))
-                        except:
-                            pass
-                    # Save new cover
-                    cover_filename = save_cover_image(new_cover, title)
+                    try:
+                        cover_filename = save_cover_image(new_cover)
+                    except covers.InvalidCover:
+                        st.error(INVALID_COVER_MESSAGE)
+                        return
                 
                 # Update book data
-                df.at[book_idx, "عنوان"] = title
-                df.at[book_idx, "مؤلف"] = author
-                df.at[book_idx, "تصنيف"] = category
-                df.at[book_idx, "تاريخ النشر"] = pub_date.strftime("%Y-%m-%d")
-                df.at[book_idx, "عدد الصفحات"] = pages
-                df.at[book_idx, "الحالة"] = status
-                df.at[book_idx, "التقييم"] = rating
-                df.at[book_idx, "ملاحظات"] = notes
-                df.at[book_idx, "صورة الغلاف"] = cover_filename
-                
-                save_data(df)
+                try:
+                    update_book(df, book_idx, {
+                        "عنوان": title,
+                        "مؤلف": author,
+                        "تصنيف": category,
+                        "تاريخ النشر": pub_date.strftime("%Y-%m-%d"),
+                        "عدد الصفحات": pages,
+                        "الحالة": status,
+                        "التقييم": rating,
+                        "ملاحظات": notes,
+                        "صورة الغلاف": cover_filename
+                    }, base=edit_base[2], base_version=edit_base[1])
+                except storage.EditConflict as conflict:
+                    if new_cover:
+                        release_cover(cover_filename)
+                    st.session_state.pop("edit_base", None)
+                    if conflict.columns:
+                        fields = "، ".join(conflict.columns)
+                        st.error(f"عدّل مستخدم آخر هذا الكتاب في الوقت نفسه ({fields}). يرجى مراجعة البيانات الحالية ثم الحفظ مرة أخرى.")
+                    else:
+                        st.error("تم حذف هذا الكتاب من قبل مستخدم آخر.")
+                    return
+                st.session_state.pop("edit_base", None)
                 
                 st.markdown(
                     """
@@ -578,29 +932,28 @@ def delete_book(df):
         )
         return
     
-    # Select book to delete
-    book_titles = df["عنوان"].tolist()
-    selected_book = st.selectbox("اختر الكتاب الذي تريد حذفه", book_titles)
+    # Select book to delete (by id, so only this copy of a duplicate title goes)
+    selected_book = pick_book(df, "اختر الكتاب الذي تريد حذفه", "delete_book")
     
-    if selected_book:
+    if selected_book is not None:
         # Get book details
-        book = df[df["عنوان"] == selected_book].iloc[0]
+        book = df.loc[selected_book]
         
         # Display book details with cover if exists
         cover_html = ""
         if pd.notna(book.get("صورة الغلاف")) and book["صورة الغلاف"]:
-            img_data = get_image_data(book["صورة الغلاف"])
-            if img_data:
-                cover_html = f'<img src="data:image/jpeg;base64,{img_data}" class="book-cover" alt="غلاف الكتاب">'
+            img_uri = get_thumbnail_uri(book["صورة الغلاف"])
+            if img_uri:
+                cover_html = f'<img src="{html.escape(img_uri)}" class="book-cover" alt="غلاف الكتاب">'
         
         st.markdown(
             f"""
             <div class="book-card">
                 {cover_html if cover_html else '<div class="no-cover">لا توجد صورة</div>'}
                 <div class="book-details">
-                    <h3>{book["عنوان"]}</h3>
-                    <p>المؤلف: {book["مؤلف"]}</p>
-                    <p>التصنيف: {book["تصنيف"]}</p>
+                    <h3>{html.escape(str(book["عنوان"]))}</h3>
+                    <p>المؤلف: {html.escape(str(book["مؤلف"]))}</p>
+                    <p>التصنيف: {html.escape(str(book["تصنيف"]))}</p>
                 </div>
             </div>
             """, 
@@ -611,25 +964,15 @@ def delete_book(df):
         st.markdown(
             """
             <div class="warning-message">
-                هل أنت متأكد من أنك تريد حذف هذا الكتاب؟ لا يمكن التراجع عن هذا الإجراء.
+                هل أنت متأكد من أنك تريد حذف هذا الكتاب؟ يمكنك التراجع عن الحذف لاحقاً من "استعادة نسخة سابقة".
             </div>
             """, 
             unsafe_allow_html=True
         )
         
         if st.button("نعم، احذف هذا الكتاب"):
-            # Remove cover image if exists
-            if pd.notna(book.get("صورة الغلاف")) and book["صورة الغلاف"]:
-                img_path = os.path.join(BOOKS_FOLDER, book["صورة الغلاف"])
-                if os.path.exists(img_path):
-                    try:
-                        os.remove(img_path)
-                    except:
-                        pass
-            
-            # Remove book from dataframe
-            df = df[df["عنوان"] != selected_book]
-            save_data(df)
+            # Remove book from the catalog; its cover is kept for a restore
+            remove_book(df, selected_book)
             
             st.markdown(
                 """
@@ -640,6 +983,240 @@ def delete_book(df):
                 unsafe_allow_html=True
             )
 
+# Function to turn an aggregate table into the dashboard's breakdown columns
+def breakdown_table(table):
+    return pd.DataFrame({
+        "عدد الكتب": table["books"],
+        "تمت قراءتها": table["read"],
+        "عدد الصفحات": table["pages"],
+        "متوسط التقييم": (table["rating_sum"] / table["rating_count"].where(table["rating_count"] > 0)).round(1),
+    })
+
+# Analytics dashboard function
+# Everything shown comes from aggregates the backend keeps up to date on each
+# write, so the page does not group the catalog itself
+def show_dashboard(backend):
+    st.markdown("<h2>لوحة التحليلات</h2>", unsafe_allow_html=True)
+    
+    analytics = backend.catalog_analytics()
+    if analytics is None or analytics["total"].empty:
+        st.markdown(
+            """
+            <div class="warning-message">
+                لا توجد كتب في قاعدة البيانات. يرجى إضافة كتب أولاً.
+            </div>
+            """, 
+            unsafe_allow_html=True
+        )
+        return
+    
+    total = analytics["total"].iloc[0]
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("كتب تمت قراءتها", f"{total['read']:,}")
+    with col2:
+        st.metric("صفحات تمت قراءتها", f"{total['read_pages']:,}")
+    with col3:
+        st.metric("متوسط التقييم", f"{total['rating_sum'] / total['rating_count']:.1f}" if total["rating_count"] else "-")
+    
+    # Books and pages read, by the month they were added
+    st.markdown("<h3>القراءة حسب الشهر</h3>", unsafe_allow_html=True)
+    monthly = analytics["monthly"]
+    col1, col2 = st.columns(2)
+    with col1:
+        st.bar_chart(monthly["read"].rename("كتب تمت قراءتها"))
+    with col2:
+        st.bar_chart(monthly["read_pages"].rename("صفحات تمت قراءتها"))
+    
+    st.markdown("<h3>توزيع التقييمات</h3>", unsafe_allow_html=True)
+    st.bar_chart(analytics["ratings"]["books"].rename("عدد الكتب"))
+    
+    st.markdown("<h3>حسب التصنيف</h3>", unsafe_allow_html=True)
+    st.dataframe(breakdown_table(analytics["categories"]), use_container_width=True)
+    
+    st.markdown(f"<h3>أكثر {catalog_analytics.TOP_AUTHORS} مؤلفين</h3>", unsafe_allow_html=True)
+    st.dataframe(breakdown_table(analytics["authors"]), use_container_width=True)
+
+# Duplicate report function
+# The report groups the whole catalog, so it only runs on request and is kept
+# in the session until the catalog changes
+def show_duplicates(backend):
+    st.markdown("<h2>الكتب المكررة</h2>", unsafe_allow_html=True)
+    st.markdown(
+        "<p>مجموعات الكتب التي لها نفس العنوان والمؤلف أو عنوان ومؤلف متقاربان في الكتابة</p>",
+        unsafe_allow_html=True
+    )
+    
+    version = backend.catalog_version()
+    report = st.session_state.get("duplicate_report")
+    if st.button("البحث عن الكتب المكررة"):
+        with st.spinner("جارٍ فحص الكتب..."):
+            report = (version, backend.duplicate_clusters())
+        st.session_state.duplicate_report = report
+    if report is None:
+        return
+    if report[0] != version:
+        st.info("تغيرت الكتب منذ آخر فحص؛ أعد البحث لتحديث النتائج")
+    
+    clusters = report[1]
+    if clusters.empty:
+        st.success("لا توجد كتب مكررة")
+        return
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("مجموعات مكررة", f"{clusters['cluster'].nunique():,}")
+    with col2:
+        st.metric("كتب في هذه المجموعات", f"{len(clusters):,}")
+    st.dataframe(
+        clusters.rename(columns={"cluster": "المجموعة", "size": "عدد الكتب"}).rename_axis("المعرف"),
+        use_container_width=True
+    )
+
+# Restore function
+# Every write records the books it changes as they were before it, so the
+# catalog can be put back as it was at any time within the retention period.
+# The restore is recorded like any other write and can be undone the same way.
+def restore_catalog(backend):
+    st.markdown("<h2>استعادة نسخة سابقة</h2>", unsafe_allow_html=True)
+    
+    history = backend.snapshots.history(RESTORE_POINTS_SHOWN)
+    if not history:
+        st.markdown(
+            """
+            <div class="warning-message">
+                لا توجد تغييرات مسجلة بعد.
+            </div>
+            """, 
+            unsafe_allow_html=True
+        )
+        return
+    
+    st.markdown("<p>آخر التغييرات المسجلة:</p>", unsafe_allow_html=True)
+    st.dataframe(
+        pd.DataFrame(history).rename(columns={
+            "at": "الوقت", "version": "الإصدار", "added": "كتب أضيفت", "changed": "كتب عُدّلت أو حُذفت"
+        }),
+        use_container_width=True,
+        hide_index=True
+    )
+    horizon = backend.snapshots.horizon()
+    if horizon:
+        st.caption(f"حُذفت التغييرات الأقدم من {horizon[:19].replace('T', ' ')} وفق مدة الاحتفاظ")
+    
+    mode = st.radio("الاستعادة إلى", ["ما قبل تغيير محدد", "تاريخ ووقت"], horizontal=True)
+    if mode == "ما قبل تغيير محدد":
+        change = st.selectbox(
+            "اختر التغيير",
+            history,
+            format_func=lambda entry: f"{entry['at'][:19].replace('T', ' ')} (الإصدار {entry['version']})"
+        )
+        # Undo this change and everything after it
+        at = snapshots.timestamp(datetime.fromisoformat(change["at"]) - timedelta(microseconds=1))
+    else:
+        # Fixed defaults: a default that moved with the clock would reset
+        # the pickers on every rerun
+        st.session_state.setdefault("restore_date", datetime.now().date())
+        st.session_state.setdefault("restore_time", datetime.now().time().replace(second=0, microsecond=0))
+        col1, col2 = st.columns(2)
+        with col1:
+            restore_date = st.date_input("التاريخ", key="restore_date")
+        with col2:
+            restore_time = st.time_input("الوقت", key="restore_time")
+        at = snapshots.timestamp(datetime.combine(restore_date, restore_time))
+    
+    confirmed = st.checkbox("أؤكد استبدال الكتب الحالية بالنسخة المختارة")
+    if st.button("استعادة", disabled=not confirmed):
+        try:
+            with st.spinner("جارٍ الاستعادة..."):
+                restored = backend.restore(at)
+        except snapshots.SnapshotExpired:
+            st.error("لم تعد هذه النسخة متاحة؛ اختر وقتاً أحدث.")
+            return
+        st.markdown(
+            f"""
+            <div class="success-message">
+                تمت الاستعادة بنجاح! عدد الكتب التي تغيرت: {restored}
+            </div>
+            """, 
+            unsafe_allow_html=True
+        )
+
+# Function to show the instrumentation panel at the bottom of the sidebar
+# The panel shows the rerun that just finished, with averages over the
+# session's last INSTRUMENTATION_HISTORY reruns
+def instrumentation_panel(record):
+    history = st.session_state.setdefault("instrumentation_history", [])
+    history.append(record)
+    del history[:-INSTRUMENTATION_HISTORY]
+    
+    with st.sidebar.expander("قياس الأداء"):
+        st.markdown(f"<p>زمن التشغيل: {record['total_ms']:.1f} ms</p>", unsafe_allow_html=True)
+        averages = pd.DataFrame([
+            {"stage": name, "ms": stage["ms"]} for past in history for name, stage in past["stages"].items()
+        ])
+        stages = pd.DataFrame.from_dict(record["stages"], orient="index", columns=["calls", "ms"])
+        if not stages.empty:
+            stages["avg ms"] = averages.groupby("stage")["ms"].sum().reindex(stages.index) / len(history)
+            st.dataframe(stages.round(2), use_container_width=True)
+        if record["counters"]:
+            st.dataframe(pd.Series(record["counters"], name="value"), use_container_width=True)
+        for cache, rate in record["hit_rates"].items():
+            st.markdown(f"<p><small>{cache}: {rate:.0%}</small></p>", unsafe_allow_html=True)
+        st.download_button(
+            "تنزيل القياسات (JSONL)",
+            instrumentation.to_jsonl(history),
+            file_name="perf_log.jsonl",
+            mime="application/x-ndjson",
+        )
+
+# Import books function
+def import_books(backend):
+    st.markdown("<h2>استيراد كتب من ملف</h2>", unsafe_allow_html=True)
+    st.markdown(
+        "<p>الأعمدة المقبولة: عنوان، مؤلف، تصنيف، تاريخ النشر، عدد الصفحات، الحالة، التقييم، ملاحظات، تاريخ الإضافة</p>",
+        unsafe_allow_html=True
+    )
+    
+    uploaded_file = st.file_uploader("اختر ملف الكتب", type=bulk_io.IMPORT_FORMATS)
+    
+    if uploaded_file is not None and st.button("استيراد"):
+        file_format = os.path.splitext(uploaded_file.name)[1].lower().lstrip(".")
+        progress = st.empty()
+        
+        def show_progress(report):
+            progress.markdown(f"<p>تمت معالجة {report['read']} صف...</p>", unsafe_allow_html=True)
+        
+        try:
+            report = bulk_io.import_books(backend, uploaded_file, file_format, progress=show_progress)
+        except Exception as e:
+            st.error(f"تعذر استيراد الملف: {e}")
+            return
+        progress.empty()
+        
+        st.markdown(
+            f"""
+            <div class="success-message">
+                تم استيراد {report['imported']} كتاب من أصل {report['read']} صف.
+            </div>
+            """, 
+            unsafe_allow_html=True
+        )
+        if report["duplicates"]:
+            st.info(f"تم تجاهل {report['duplicates']} كتاب مكرر (نفس العنوان والمؤلف)")
+        if report["similar"]:
+            st.warning(f"تم استيراد {report['similar']} كتاب يشبه كتبًا موجودة؛ راجعها في \"الكتب المكررة\"")
+            st.dataframe(pd.DataFrame(report["similar_rows"]), use_container_width=True)
+        if report["rejected"]:
+            st.warning(f"تم رفض {report['rejected']} صف لعدم مطابقتها للبيانات المطلوبة")
+            st.dataframe(pd.DataFrame(report["rejected_rows"]), use_container_width=True)
+            if report["rejected"] > len(report["rejected_rows"]):
+                st.caption(f"يتم عرض أول {len(report['rejected_rows'])} صف مرفوض فقط")
+
 # Run the app
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if INSTRUMENTATION:
+        with instrumentation.rerun(INSTRUMENTATION_LOG) as record:
+            main()
+        instrumentation_panel(record.as_dict())
+    else:
+        main()
\ No newline at end of file
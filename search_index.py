@@ -0,0 +1,241 @@
+import bisect
+import difflib
+import heapq
+import math
+import re
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+# Tashkeel (harakat, tanween, shadda, sukun, Quranic marks, dagger alef) and tatweel
+DIACRITICS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+
+# Letter variants that users commonly type interchangeably
+LETTER_MAP = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ة": "ه",
+    "ى": "ي",
+    "ؤ": "و",
+    "ئ": "ي",
+})
+
+TOKEN = re.compile(r"\w+")
+
+# Definite article forms stripped so that "الأيام" is also found as "ايام"
+ARTICLES = ("وال", "بال", "فال", "كال", "ال")
+
+# Relative weight of a match in each indexed field
+FIELD_WEIGHTS = {"عنوان": 3.0, "مؤلف": 2.0, "ملاحظات": 1.0}
+
+# Prefix matches score lower than whole-word matches
+PREFIX_WEIGHT = 0.5
+MIN_PREFIX_LENGTH = 2
+# Upper bound on vocabulary terms a single prefix may expand to
+PREFIX_EXPANSION_LIMIT = 200
+
+# Fuzzy matching (for typos) only looks at terms sharing the first letters
+FUZZY_WEIGHT = 0.3
+FUZZY_CUTOFF = 0.75
+FUZZY_ANCHOR_LENGTH = 2
+
+
+# Function to fold an Arabic string to its search form
+def normalize_arabic(text):
+    if not isinstance(text, str):
+        return ""
+    return DIACRITICS.sub("", text).translate(LETTER_MAP).casefold()
+
+
+# Function to split text into normalised tokens
+def tokenize(text):
+    return TOKEN.findall(normalize_arabic(text))
+
+
+# Function to get the index terms for one token (the token and its stem without the article)
+def token_variants(token):
+    for article in ARTICLES:
+        if token.startswith(article) and len(token) - len(article) >= 2:
+            return (token, token[len(article):])
+    return (token,)
+
+
+# Function to get all index terms of a field value
+# Cached because authors, categories and stock phrases repeat across many books
+@lru_cache(maxsize=65536)
+def text_terms(text):
+    return tuple(term for token in tokenize(text) for term in token_variants(token))
+
+
+# Inverted index over titles, authors and notes
+# Keys are the catalog row keys; the index is rebuilt when the backend reloads
+# the catalog from disk and patched in place on add/edit/delete.
+class SearchIndex:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.postings = defaultdict(dict)
+        self.doc_terms = {}
+        self.vocabulary = []
+
+    # Function to compute the weighted terms of one book
+    def terms_for(self, row):
+        terms = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            value = row.get(field)
+            if isinstance(value, str):
+                for term in text_terms(value):
+                    terms[term] += weight
+        return terms
+
+    def add(self, key, row):
+        with self.lock:
+            self.remove(key)
+            terms = self.terms_for(row)
+            for term, weight in terms.items():
+                posting = self.postings[term]
+                if not posting:
+                    bisect.insort(self.vocabulary, term)
+                posting[key] = weight
+            self.doc_terms[key] = list(terms)
+
+    def remove(self, key):
+        with self.lock:
+            for term in self.doc_terms.pop(key, ()):
+                posting = self.postings.get(term)
+                if posting is None:
+                    continue
+                posting.pop(key, None)
+                if not posting:
+                    del self.postings[term]
+                    position = bisect.bisect_left(self.vocabulary, term)
+                    if position < len(self.vocabulary) and self.vocabulary[position] == term:
+                        del self.vocabulary[position]
+
+    # Backend listener hooks
+    def rebuild(self, df):
+        with self.lock:
+            self.postings = defaultdict(dict)
+            self.doc_terms = {}
+            columns = [df[field] if field in df.columns else [None] * len(df) for field in FIELD_WEIGHTS]
+            for key, *values in zip(df.index, *columns):
+                terms = self.terms_for(dict(zip(FIELD_WEIGHTS, values)))
+                for term, weight in terms.items():
+                    self.postings[term][key] = weight
+                self.doc_terms[key] = list(terms)
+            self.vocabulary = sorted(self.postings)
+
+    def apply(self, changes, df):
+        with self.lock:
+            for op, key, _ in changes:
+                if op == "delete" or key not in df.index:
+                    self.remove(key)
+                else:
+                    self.add(key, df.loc[key])
+
+    # Function to find vocabulary terms close to a misspelt term
+    def fuzzy_matches(self, term):
+        if len(term) <= FUZZY_ANCHOR_LENGTH:
+            return []
+        anchor = term[:FUZZY_ANCHOR_LENGTH]
+        start = bisect.bisect_left(self.vocabulary, anchor)
+        end = start
+        while end < len(self.vocabulary) and end - start < PREFIX_EXPANSION_LIMIT and self.vocabulary[end].startswith(anchor):
+            end += 1
+        candidates = self.vocabulary[start:end]
+        return difflib.get_close_matches(term, candidates, n=10, cutoff=FUZZY_CUTOFF)
+
+    # Function to score every book matching one query term (exact, by prefix,
+    # or with fuzzy=True by a close spelling when nothing else matches)
+    def term_scores(self, term, fuzzy=False):
+        total = max(len(self.doc_terms), 1)
+        scores = {}
+        matches = [(term, 1.0)] if term in self.postings else []
+        if len(term) >= MIN_PREFIX_LENGTH:
+            position = bisect.bisect_right(self.vocabulary, term)
+            end = min(position + PREFIX_EXPANSION_LIMIT, len(self.vocabulary))
+            while position < end and self.vocabulary[position].startswith(term):
+                matches.append((self.vocabulary[position], PREFIX_WEIGHT))
+                position += 1
+        if fuzzy and not matches:
+            matches = [(match, FUZZY_WEIGHT) for match in self.fuzzy_matches(term)]
+        for match, factor in matches:
+            posting = self.postings[match]
+            idf = math.log(1 + total / len(posting))
+            for key, weight in posting.items():
+                score = weight * idf * factor
+                if score > scores.get(key, 0):
+                    scores[key] = score
+        return scores
+
+    # Function to find books containing every query term, best matches first
+    # With a limit only the top matches are ranked (a heap instead of a full sort)
+    def search(self, query, limit=None, fuzzy=False):
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self.lock:
+            # Start from the rarest term so the running intersection stays small
+            per_term = sorted((self.term_scores(term, fuzzy) for term in terms), key=len)
+            scores = per_term[0]
+            for term_scores in per_term[1:]:
+                if not scores:
+                    break
+                scores = {key: score + term_scores[key] for key, score in scores.items() if key in term_scores}
+        if limit:
+            return heapq.nsmallest(limit, scores, key=lambda key: (-scores[key], key))
+        return sorted(scores, key=lambda key: (-scores[key], key))
+
+
+# Hash index from the exact value of one column to the ids of the books
+# carrying it. Values are not unique, so every value maps to a set of ids
+class ValueIndex:
+    def __init__(self, column):
+        self.column = column
+        self.lock = threading.Lock()
+        self.ids_by_value = defaultdict(set)
+        self.value_by_id = {}
+
+    def unlink(self, key):
+        value = self.value_by_id.pop(key, None)
+        ids = self.ids_by_value.get(value)
+        if ids is not None:
+            ids.discard(key)
+            if not ids:
+                del self.ids_by_value[value]
+
+    # Backend listener hooks
+    def rebuild(self, df):
+        with self.lock:
+            self.ids_by_value = defaultdict(set)
+            self.value_by_id = dict(zip(df.index, df[self.column]))
+            for key, value in self.value_by_id.items():
+                self.ids_by_value[value].add(key)
+
+    def apply(self, changes, df):
+        with self.lock:
+            for _, key, _ in changes:
+                self.unlink(key)
+                if key in df.index:
+                    value = df.at[key, self.column]
+                    self.value_by_id[key] = value
+                    self.ids_by_value[value].add(key)
+
+    def ids(self, value):
+        with self.lock:
+            return sorted(self.ids_by_value.get(value, ()))
+
+
+# Title lookups for the book pickers and the title guards
+class TitleIndex(ValueIndex):
+    def __init__(self):
+        super().__init__("عنوان")
+
+
+# The books using each cover file: several books may share one cover
+class CoverIndex(ValueIndex):
+    def __init__(self):
+        super().__init__("صورة الغلاف")
+
+    # Every cover filename referenced by at least one book
+    def names(self):
+        with self.lock:
+            return {value for value in self.ids_by_value if isinstance(value, str) and value}
@@ -0,0 +1,223 @@
+import argparse
+import gzip
+import json
+import os
+import threading
+import zlib
+from datetime import datetime, timedelta
+
+import instrumentation
+
+# Snapshots of a catalog are kept in <data file>.snapshots as an undo log:
+# every write first records the rows it is about to change as they were
+# before it (None for books it adds). The catalog itself is the newest
+# snapshot, and any earlier one is reached by undoing the writes after it,
+# so a write costs in proportion to the books it changes, never to the catalog.
+SNAPSHOT_SUFFIX = ".snapshots"
+
+# Records are appended to gzip segments, one gzip member per write; a new
+# segment is started every day or once the current one reaches SEGMENT_BYTES
+SEGMENT_SUFFIX = ".jsonl.gz"
+SEGMENT_BYTES = 4 * 1024 * 1024
+COMPRESS_LEVEL = 6
+
+# Retention: segments whose writes are all older than RETENTION_DAYS are
+# dropped, as are the oldest segments while together they exceed MAX_BYTES
+RETENTION_DAYS = 30
+MAX_BYTES = 256 * 1024 * 1024
+
+# Start of the oldest segment kept after pruning: no restore before it
+HORIZON_FILE = "horizon"
+
+
+# Raised when a restore asks for a time older than the retained history
+class SnapshotExpired(Exception):
+    def __init__(self, horizon):
+        super().__init__(f"Snapshots before {horizon} have been removed")
+        self.horizon = horizon
+
+
+# Function to get the time of a write as stored in its record
+def timestamp(moment=None):
+    return (moment or datetime.now()).isoformat(timespec="microseconds")
+
+
+# Function to turn a record time into a sortable segment file name stem
+def segment_stem(at):
+    return at.replace("-", "").replace(":", "").replace(".", "")
+
+
+# Function to read the records of one segment, oldest first
+def read_segment(path):
+    records = []
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as segment:
+            for line in segment:
+                records.append(json.loads(line))
+    except (EOFError, OSError, zlib.error, ValueError):
+        # A torn final member from a crash mid-append ends the segment
+        pass
+    return records
+
+
+# The undo log of one data file. Writers call record() while holding the
+# catalog write lock, before the write itself: a record of a write that then
+# fails only restores rows to the values they still have.
+class SnapshotStore:
+    def __init__(self, data_file, retention_days=RETENTION_DAYS, max_bytes=MAX_BYTES):
+        self.folder = data_file + SNAPSHOT_SUFFIX
+        self.retention_days = retention_days
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+
+    # Segment file names, oldest first
+    def segments(self):
+        if not os.path.isdir(self.folder):
+            return []
+        return sorted(name for name in os.listdir(self.folder) if name.endswith(SEGMENT_SUFFIX))
+
+    # Record a write: rows maps each book id it changes to the book as it was
+    # (None if the write adds it); added is an inclusive id range of new books
+    def record(self, version, rows=None, added=None):
+        if added and added[1] < added[0]:
+            added = None
+        if not rows and not added:
+            return
+        at = timestamp()
+        entry = {"at": at, "version": version}
+        if rows:
+            entry["rows"] = [[key, row] for key, row in rows.items()]
+        if added:
+            entry["added"] = [int(added[0]), int(added[1])]
+        data = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        with instrumentation.stage("record_snapshot"), self.lock:
+            os.makedirs(self.folder, exist_ok=True)
+            segments = self.segments()
+            if segments and not self.rotate(segments[-1], at):
+                name = segments[-1]
+            else:
+                name = segment_stem(at) + SEGMENT_SUFFIX
+                self.prune(segments, at)
+            with open(os.path.join(self.folder, name), "ab") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="ab", compresslevel=COMPRESS_LEVEL) as member:
+                    member.write(data)
+                raw.flush()
+                os.fsync(raw.fileno())
+            instrumentation.count("snapshot_bytes", len(data))
+
+    # Whether a write at the given time starts a new segment
+    def rotate(self, name, at):
+        if name[:8] != segment_stem(at)[:8]:
+            return True
+        return os.path.getsize(os.path.join(self.folder, name)) >= SEGMENT_BYTES
+
+    # Drop whole segments past the retention policy, oldest first
+    # A segment's writes all precede the start of the next one
+    def prune(self, segments, at):
+        cutoff = segment_stem(timestamp(datetime.fromisoformat(at) - timedelta(days=self.retention_days)))
+        sizes = [os.path.getsize(os.path.join(self.folder, name)) for name in segments]
+        total = sum(sizes)
+        # A new segment is about to start, so every existing one may go
+        starts = segments[1:] + [segment_stem(at)]
+        dropped = 0
+        for name, size, next_start in zip(segments, sizes, starts):
+            if next_start >= cutoff and total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.folder, name))
+            total -= size
+            dropped += 1
+        if dropped:
+            kept = read_segment(os.path.join(self.folder, segments[dropped])) if dropped < len(segments) else []
+            horizon = kept[0]["at"] if kept else at
+            with open(os.path.join(self.folder, HORIZON_FILE), "w", encoding="utf-8") as horizon_file:
+                horizon_file.write(horizon)
+
+    # Time of the oldest write kept after pruning, or None if nothing was
+    # pruned yet: the catalog cannot be restored to an earlier time
+    def horizon(self):
+        try:
+            with open(os.path.join(self.folder, HORIZON_FILE), "r", encoding="utf-8") as horizon_file:
+                return horizon_file.read().strip() or None
+        except OSError:
+            return None
+
+    # Records newer than the given time, newest first; reads only the
+    # segments that can hold them
+    def records_since(self, at=None):
+        stem = segment_stem(at) if at else ""
+        for name in reversed(self.segments()):
+            records = read_segment(os.path.join(self.folder, name))
+            for entry in reversed(records):
+                if at is None or entry["at"] > at:
+                    yield entry
+            if name.split(".")[0] <= stem:
+                return
+
+    # Every book changed after the given time, mapped to the book as it was
+    # then (None if it did not exist yet)
+    # Records are undone newest first, so the oldest image of a book wins
+    def rows_since(self, at):
+        horizon = self.horizon()
+        if horizon and at < horizon:
+            raise SnapshotExpired(horizon)
+        rows = {}
+        for entry in self.records_since(at):
+            if "added" in entry:
+                first, last = entry["added"]
+                rows.update(dict.fromkeys(range(first, last + 1)))
+            for key, row in entry.get("rows", []):
+                rows[key] = row
+        return rows
+
+    # Summary of the most recent writes, newest first
+    def history(self, limit=None):
+        summary = []
+        for entry in self.records_since():
+            first, last = entry.get("added", (1, 0))
+            rows = entry.get("rows", [])
+            summary.append({
+                "at": entry["at"],
+                "version": entry["version"],
+                "added": last - first + 1 + sum(1 for _, row in rows if row is None),
+                "changed": sum(1 for _, row in rows if row is not None),
+            })
+            if limit and len(summary) >= limit:
+                break
+        return summary
+
+    # Cover filenames referenced by the retained history, so cover garbage
+    # collection keeps the covers a restore could bring back
+    def covers(self, cover_column):
+        names = set()
+        for entry in self.records_since():
+            for _, row in entry.get("rows", []):
+                if row and row.get(cover_column):
+                    names.add(row[cover_column])
+        return names
+
+    # Total compressed size of the retained history
+    def size(self):
+        return sum(os.path.getsize(os.path.join(self.folder, name)) for name in self.segments())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Catalog snapshot tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    history = commands.add_parser("history", help="list the most recent restore points")
+    history.add_argument("catalog", nargs="?", default="books_data.csv", help="catalog file (.csv, .db or .parquet)")
+    history.add_argument("--limit", type=int, default=20)
+    restore = commands.add_parser("restore", help="restore the catalog as it was at a given time")
+    restore.add_argument("catalog", nargs="?", default="books_data.csv", help="catalog file (.csv, .db or .parquet)")
+    restore.add_argument("at", help="local time, e.g. 2026-10-18T09:30:00")
+    args = parser.parse_args()
+
+    # Imported here because storage imports this module
+    import storage
+    kind = {".db": "sqlite", ".parquet": "parquet"}.get(os.path.splitext(args.catalog)[1].lower(), "csv")
+    backend = storage.open_backend(kind, args.catalog)
+    if args.command == "history":
+        for entry in backend.snapshots.history(args.limit):
+            print(f"{entry['at']}  version {entry['version']:>6}  added {entry['added']:>7}  changed {entry['changed']:>7}")
+        print(f"{backend.snapshots.size() / 1024:.1f} KiB of history kept")
+    elif args.command == "restore":
+        print(f"Restored {backend.restore(timestamp(datetime.fromisoformat(args.at)))} books")
@@ -0,0 +1,1229 @@
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import threading
+from contextlib import closing
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+import pandas as pd
+
+import catalog_analytics
+import catalog_schema
+import catalog_stats
+import duplicates
+import facets
+import instrumentation
+import snapshots
+from search_index import CoverIndex, SearchIndex, TitleIndex
+
+# Stable book id: the index of the in-memory frame, the first CSV column and
+# the INTEGER PRIMARY KEY in SQLite
+ID_COLUMN = "المعرف"
+
+# Catalog columns, in the order they are stored on disk after the id
+COLUMNS = [
+    "عنوان",
+    "مؤلف",
+    "تصنيف",
+    "تاريخ النشر",
+    "عدد الصفحات",
+    "الحالة",
+    "التقييم",
+    "ملاحظات",
+    "تاريخ الإضافة",
+    "صورة الغلاف",  # Cover image filename
+]
+
+# Allowed values of the category and reading status columns
+CATEGORIES = catalog_schema.CATEGORIES
+STATUSES = catalog_schema.STATUSES
+
+# Columns that get an index in the SQLite backend, for lookups by title or
+# author and for queries run directly against the database
+INDEXED_COLUMNS = ["عنوان", "مؤلف", "تصنيف", "الحالة"]
+
+# Number of journal entries after which the journal is folded into the data file
+JOURNAL_COMPACT_THRESHOLD = 500
+
+# Rows per Parquet row group; filters skip whole groups using their statistics
+PARQUET_ROW_GROUP_SIZE = 100_000
+
+# Process-wide registries. They live here rather than in main2.py because
+# Streamlit re-executes the app script on every rerun, while imported
+# modules stay loaded.
+registry_lock = threading.RLock()
+catalog_locks = {}
+compaction_threads = {}
+
+
+# Raised when an edit made from an outdated copy of a book touches fields
+# that someone else has changed in the meantime (or the book is gone)
+class EditConflict(Exception):
+    def __init__(self, key, columns):
+        self.key = key
+        self.columns = columns
+        super().__init__(f"Book {key} was changed concurrently: {', '.join(columns) or 'deleted'}")
+
+
+# Writer lock for one catalog, shared by every thread and process that
+# writes it: a re-entrant thread lock plus an exclusive OS lock on
+# "<data file>.lock", held while the outermost owner is inside
+class CatalogLock:
+    def __init__(self, data_file):
+        self.path = data_file + ".lock"
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+        self.handle = None
+
+    def acquire(self):
+        self.thread_lock.acquire()
+        if self.depth == 0:
+            try:
+                self.handle = open(self.path, "a+b")
+                lock_file(self.handle)
+            except BaseException:
+                if self.handle is not None:
+                    self.handle.close()
+                    self.handle = None
+                self.thread_lock.release()
+                raise
+        self.depth += 1
+
+    def release(self):
+        self.depth -= 1
+        if self.depth == 0:
+            unlock_file(self.handle)
+            self.handle.close()
+            self.handle = None
+        self.thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+# Function to take an exclusive OS lock on an open file, waiting for it
+def lock_file(handle):
+    if fcntl is not None:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        return
+    handle.seek(0)
+    while True:
+        try:
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            # LK_LOCK gives up after about 10 seconds; keep waiting
+            continue
+
+
+def unlock_file(handle):
+    if fcntl is not None:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    else:
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# Function to get the shared lock of a data file
+def lock_for(data_file):
+    key = os.path.abspath(data_file)
+    with registry_lock:
+        if key not in catalog_locks:
+            catalog_locks[key] = CatalogLock(data_file)
+        return catalog_locks[key]
+
+
+# Function to create an empty dataframe with the catalog columns
+def empty_frame():
+    return catalog_schema.apply_schema(pd.DataFrame({column: [] for column in COLUMNS}))
+
+
+# Function to compare a stored value with a submitted one, treating missing
+# values and blanks alike and dates by their text form
+def same_value(left, right):
+    left = plain(left)
+    right = plain(right)
+    return (None if left == "" else left) == (None if right == "" else right)
+
+
+# Function to turn numpy scalars, timestamps and missing values into plain
+# Python values
+def plain(value):
+    if value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.strftime(catalog_schema.DATE_FORMAT)
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+# Function to encode values json cannot serialise itself (numpy scalars, dates)
+def json_default(value):
+    if isinstance(value, pd.Timestamp):
+        return value.strftime(catalog_schema.DATE_FORMAT)
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+# Function to identify the on-disk version of a file
+def file_version(path):
+    if os.path.exists(path):
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    return None
+
+
+# Function to get the journal path that belongs to a data file
+def journal_path(data_file):
+    return data_file + ".journal"
+
+
+# Function to identify the exact on-disk version of the data file
+# A journal is only valid for the data file version it was started against
+def base_token(data_file):
+    if not os.path.exists(data_file):
+        return None
+    stat = os.stat(data_file)
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+
+# Function to read the journal entries that still apply to the data file
+def read_journal(data_file):
+    path = journal_path(data_file)
+    if not os.path.exists(path):
+        return []
+    entries = []
+    with open(path, "r", encoding="utf-8") as journal:
+        lines = journal.read().splitlines()
+    if not lines:
+        return []
+    try:
+        header = json.loads(lines[0])
+    except ValueError:
+        return []
+    # The data file was rewritten after this journal was started, so the
+    # journal has already been folded in (or superseded by a full save)
+    if header.get("base") != base_token(data_file):
+        return []
+    for line in lines[1:]:
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            # A torn final line from a crash mid-append is simply dropped
+            break
+    return entries
+
+
+# Marker for keys that do not (or no longer) exist while resolving the journal
+DELETED = object()
+
+
+# Function to turn journal entries into row changes against a loaded frame
+# Each change is (op, key, row) with op "add", "edit" or "delete". Edits and
+# deletes carry the title they expect, so an entry computed from an outdated
+# frame cannot land on a different book.
+# next_key is the first id never handed out, so that an add whose id is
+# taken does not reuse the id of a deleted book
+def resolve_journal(df, entries, next_key=1):
+    next_key = max(next_key, int(df.index.max()) + 1 if len(df) else 1)
+    titles = {}
+
+    def current_title(key):
+        if key in titles:
+            return titles[key]
+        return df.at[key, "عنوان"] if key in df.index else DELETED
+
+    changes = []
+    for entry in entries:
+        op = entry.get("op")
+        if op == "add":
+            key = entry.get("key", next_key)
+            if current_title(key) is not DELETED:
+                key = next_key
+            next_key = max(next_key, key + 1)
+            titles[key] = entry["row"].get("عنوان")
+            changes.append(("add", key, entry["row"]))
+        elif op == "edit":
+            key = entry["key"]
+            if current_title(key) == entry["title"]:
+                titles[key] = entry["row"].get("عنوان", entry["title"])
+                changes.append(("edit", key, entry["row"]))
+        elif op == "delete":
+            for key in entry["keys"]:
+                if current_title(key) == entry["title"]:
+                    titles[key] = DELETED
+                    changes.append(("delete", key, None))
+    return changes
+
+
+# Function to get the highest id in a frame (0 if it is empty)
+def highest_id(df):
+    return int(df.index.max()) if len(df) else 0
+
+
+# Function to get the highest id added by row changes (0 if none)
+def added_id(changes):
+    return max((int(key) for op, key, _ in changes if op == "add"), default=0)
+
+
+# Function to apply row changes to a frame, returning a new frame
+def apply_changes(df, changes):
+    if not changes:
+        return df
+    added = {}
+    edits = {}
+    dropped = set()
+    for op, key, row in changes:
+        if op == "add":
+            added[key] = dict(row)
+        elif op == "edit":
+            if key in added:
+                added[key].update(row)
+            else:
+                edits.setdefault(key, {}).update(row)
+        elif op == "delete":
+            if key in added:
+                del added[key]
+            else:
+                edits.pop(key, None)
+                dropped.add(key)
+
+    if edits:
+        df = df.copy()
+        for key, row in edits.items():
+            for column, value in row.items():
+                if column in df.columns:
+                    df, value = catalog_schema.typed_value(df, column, value)
+                    if pd.api.types.is_numeric_dtype(df[column]) and isinstance(value, str):
+                        df[column] = df[column].astype(object)
+                df.at[key, column] = value
+    if dropped:
+        df = df.drop(index=list(dropped))
+    if added:
+        new_rows = pd.DataFrame(list(added.values()), index=list(added.keys()))
+        df, new_rows = catalog_schema.conform_rows(df, new_rows)
+        df = pd.concat([df, new_rows]) if len(df) else new_rows
+    return df
+
+
+# Function to get the books a set of changes touches as they are before the
+# changes, for the snapshot undo log: plain values, or None for new books
+def before_rows(df, changes):
+    keys = list(dict.fromkeys(plain(key) for _, key, _ in changes))
+    rows = dict.fromkeys(keys)
+    present = [key for key in keys if key in df.index]
+    for key, row in zip(present, df.loc[present].to_dict("records")):
+        rows[key] = {column: plain(value) for column, value in row.items()}
+    return rows
+
+
+# Function to build a frame's index hash table before the frame is shared
+# pandas fills it lazily on the first lookup, and threads racing on that first
+# lookup can find keys missing from a half-built table
+def share_frame(df):
+    df.index.is_unique
+    return df
+
+
+# Function to apply journal entries to a frame loaded from the data file
+def replay_journal(df, entries, next_key=1):
+    return apply_changes(df, resolve_journal(df, entries, next_key))
+
+
+# Function to write a frame crash-safely: temp file, fsync, atomic rename
+# The frame index (the book id) is written as the first column
+def write_atomic(df, data_file):
+    tmp_path = f"{data_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as tmp:
+        df.to_csv(tmp, index=True, index_label=ID_COLUMN, date_format=catalog_schema.DATE_FORMAT)
+        tmp.flush()
+        os.fsync(tmp.fileno())
+    os.replace(tmp_path, data_file)
+
+
+# Function to append one entry to the journal, returning the entry count
+def append_entry(data_file, entry):
+    with lock_for(data_file):
+        path = journal_path(data_file)
+        entries = read_journal(data_file)
+        if not entries and os.path.exists(path):
+            # Stale or empty journal: start a fresh one for the current version
+            os.remove(path)
+        with open(path, "a", encoding="utf-8") as journal:
+            if journal.tell() == 0:
+                journal.write(json.dumps({"base": base_token(data_file)}) + "\n")
+            journal.write(json.dumps(entry, ensure_ascii=False, default=json_default) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+        return len(entries) + 1
+
+
+# Function to get the Arrow schema of the Parquet data file
+def parquet_schema():
+    import pyarrow as pa
+
+    integer_types = {"Int8": pa.int8(), "Int16": pa.int16(), "Int32": pa.int32(), "Int64": pa.int64()}
+    fields = [pa.field(ID_COLUMN, pa.int64())]
+    for column in COLUMNS:
+        if column in catalog_schema.CATEGORICAL_COLUMNS:
+            fields.append(pa.field(column, pa.dictionary(pa.int32(), pa.string())))
+        elif column in catalog_schema.INTEGER_COLUMNS:
+            fields.append(pa.field(column, integer_types[catalog_schema.INTEGER_COLUMNS[column]]))
+        elif column in catalog_schema.DATE_COLUMNS:
+            fields.append(pa.field(column, pa.timestamp("ns")))
+        else:
+            fields.append(pa.field(column, pa.string()))
+    return pa.schema(fields)
+
+
+# Function to convert a catalog frame to an Arrow table, id as the first column
+def parquet_table(df):
+    import pyarrow as pa
+
+    df = catalog_schema.apply_schema(df.reindex(columns=COLUMNS))
+    return pa.Table.from_pandas(df.rename_axis(ID_COLUMN).reset_index(), schema=parquet_schema(), preserve_index=False)
+
+
+# Function to write a frame to Parquet crash-safely: temp file, fsync, atomic rename
+def write_parquet_atomic(df, data_file):
+    import pyarrow.parquet as pq
+
+    tmp_path = f"{data_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as tmp:
+        pq.write_table(parquet_table(df), tmp, row_group_size=PARQUET_ROW_GROUP_SIZE)
+        tmp.flush()
+        os.fsync(tmp.fileno())
+    os.replace(tmp_path, data_file)
+
+
+# Shared behaviour of the storage backends: a process-wide cache of the
+# parsed catalog keyed on the backend's on-disk version, listeners (such as
+# the search index) that are rebuilt on reload and patched on our own writes,
+# and the snapshot undo log every write records its changed books in first
+class Backend:
+    def __init__(self, path):
+        self.path = path
+        self.lock = lock_for(path)
+        self.cache_lock = threading.RLock()
+        self.cached_version = None
+        self.cached_frame = None
+        self.search_index = SearchIndex()
+        self.titles = TitleIndex()
+        self.covers = CoverIndex()
+        self.stats = catalog_stats.CatalogStats()
+        self.analytics = catalog_analytics.CatalogAnalytics()
+        self.duplicates = duplicates.DuplicateIndex()
+        self.facets = facets.FacetIndex()
+        self.listeners = [
+            self.search_index, self.titles, self.covers, self.stats, self.analytics, self.duplicates, self.facets
+        ]
+        self.snapshots = snapshots.SnapshotStore(path)
+
+    # Sidebar statistics are persisted next to the data file
+    def stats_path(self):
+        return self.path + ".stats.json"
+
+    # Catalog version number: incremented by every write, from any process,
+    # so an edit can tell whether the catalog moved since its form was shown.
+    # The same file keeps the highest id ever handed out, so that the id of a
+    # deleted book is never given to a new one.
+    def version_path(self):
+        return self.path + ".version"
+
+    # (version, highest id ever used); older files hold only the version
+    def read_version_file(self):
+        try:
+            with open(self.version_path(), "r", encoding="utf-8") as version_file:
+                values = [int(value) for value in version_file.read().split()]
+        except (OSError, ValueError):
+            return 0, 0
+        values += [0, 0]
+        return values[0], values[1]
+
+    def catalog_version(self):
+        return self.read_version_file()[0]
+
+    def last_id(self):
+        return self.read_version_file()[1]
+
+    # Callers hold self.lock; last_id is the highest id the write used
+    def bump_catalog_version(self, last_id=0):
+        version, stored_last_id = self.read_version_file()
+        tmp_path = f"{self.version_path()}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as version_file:
+            version_file.write(f"{version + 1} {max(stored_last_id, int(last_id))}")
+            version_file.flush()
+            os.fsync(version_file.fileno())
+        os.replace(tmp_path, self.version_path())
+        return version + 1
+
+    # Reconcile an edit made from an older copy of a book (base) with the
+    # stored book: fields changed only here are applied, fields changed only
+    # elsewhere are kept, and fields changed on both sides to different
+    # values raise EditConflict. Returns the current title and the row to write.
+    def merge_edit(self, key, title, row, base=None, base_version=None):
+        if base is None or base_version == self.catalog_version():
+            return title, row
+        current = self.get_book(key)
+        if current is None:
+            raise EditConflict(key, [])
+        merged = {}
+        conflicts = []
+        for column, value in row.items():
+            original = base.get(column)
+            if same_value(value, original):
+                continue
+            if not same_value(current[column], original) and not same_value(current[column], value):
+                conflicts.append(column)
+            merged[column] = value
+        if conflicts:
+            raise EditConflict(key, conflicts)
+        return current["عنوان"], merged
+
+    # The returned frame is shared, so callers must copy it before mutating
+    # A cache that matches the on-disk version is returned under the cache
+    # lock alone, so readers do not wait for bulk imports or compaction.
+    # Writers in this process hold the lock from their write until the cache
+    # is patched; a reload runs under its thread half so that the version and
+    # the rows cannot straddle one of them. Other processes never patch our cache.
+    def load(self):
+        version = self.version()
+        with self.cache_lock:
+            if self.cached_frame is not None and self.cached_version == version:
+                instrumentation.count("frame_cache_hits")
+                return self.cached_frame
+        with self.lock.thread_lock:
+            version = self.version()
+            with self.cache_lock:
+                if self.cached_frame is None or self.cached_version != version:
+                    instrumentation.count("frame_cache_misses")
+                    with instrumentation.stage("read_catalog"):
+                        df = self.read_all()
+                    with instrumentation.stage("rebuild_indexes"):
+                        for listener in self.listeners:
+                            listener.rebuild(df)
+                    self.cached_frame = share_frame(df)
+                    self.cached_version = version
+                    self.persist_stats(version)
+                else:
+                    instrumentation.count("frame_cache_hits")
+                return self.cached_frame
+
+    # The cached frame if it matches the on-disk version, without loading
+    def current_frame(self):
+        version = self.version()
+        with self.cache_lock:
+            return self.cached_frame if self.cached_version == version else None
+
+    # Drop the cached frame explicitly in case the on-disk version did not move
+    def invalidate(self):
+        with self.cache_lock:
+            self.cached_frame = None
+
+    # Record the books a write is about to change in the snapshot undo log
+    # Callers hold self.lock and pass the frame the changes were resolved against
+    def record_snapshot(self, df, changes):
+        if changes:
+            self.snapshots.record(self.catalog_version(), before_rows(df, changes))
+
+    # Put the catalog back as it was at the given time (see
+    # snapshots.timestamp) by undoing every write after it. The restore is a
+    # write too, so it can be undone in turn. Returns the number of books
+    # restored or removed; raises snapshots.SnapshotExpired past the retention.
+    def restore(self, at):
+        with self.lock:
+            df = self.load()
+            rows = self.snapshots.rows_since(at)
+            restored = {key: row for key, row in rows.items() if row is not None}
+            removed = [key for key, row in rows.items() if row is None and key in df.index]
+            if not restored and not removed:
+                return 0
+            self.record_snapshot(df, [("delete", key, None) for key in removed] + [("edit", key, None) for key in restored])
+            df = df.drop(index=removed + [key for key in restored if key in df.index])
+            if restored:
+                books = pd.DataFrame(list(restored.values()), index=list(restored))
+                df, books = catalog_schema.conform_rows(df, books)
+                df = (pd.concat([df, books]) if len(df) else books).sort_index()
+            self.save(df)
+            return len(restored) + len(removed)
+
+    # Cover filenames the catalog or its retained snapshots refer to
+    def retained_covers(self):
+        return self.referenced_covers() | self.snapshots.covers("صورة الغلاف")
+
+    # Bring the cache and listeners up to date after one of our own writes
+    # If anyone else wrote in between, the cache is dropped and rebuilt instead
+    def patch(self, before, after, changes):
+        with self.cache_lock:
+            if self.cached_frame is None or self.cached_version != before:
+                self.cached_frame = None
+                return
+            df = apply_changes(self.cached_frame, changes)
+            for listener in self.listeners:
+                listener.apply(changes, df)
+            self.cached_frame = share_frame(df)
+            self.cached_version = after
+            self.persist_stats(after)
+
+    def persist_stats(self, version):
+        try:
+            catalog_stats.write_stats_file(self.stats_path(), version, self.stats.snapshot())
+        except OSError:
+            # The stats file is only a shortcut; it is rebuilt from the data
+            pass
+
+    # Sidebar statistics without touching the catalog when avoidable: from
+    # memory if the cache is current, else from the persisted stats file, and
+    # only as a last resort by loading the catalog
+    def catalog_stats(self):
+        version = self.version()
+        with self.cache_lock:
+            if self.cached_frame is not None and self.cached_version == version:
+                return self.stats.snapshot()
+        stored = catalog_stats.read_stats_file(self.stats_path(), version)
+        if stored is not None:
+            return stored
+        self.load()
+        return self.stats.snapshot()
+
+    # Dashboard aggregates (see catalog_analytics), maintained on every write
+    def catalog_analytics(self):
+        self.load()
+        return self.analytics.snapshot()
+
+    # Recount the statistics and dashboard aggregates from scratch and repair
+    # them if they drifted
+    # Returns whether the incrementally maintained numbers were correct
+    # load() takes the writer lock before the cache lock, as writers do, so it
+    # must not run under the cache lock; a write in between just retries
+    def verify_stats(self):
+        while True:
+            df = self.load()
+            with self.cache_lock:
+                if self.cached_frame is not df:
+                    continue
+                fresh = catalog_stats.compute_stats(df)
+                consistent = catalog_stats.stats_match(self.stats.snapshot(), fresh)
+                if not consistent:
+                    self.stats.rebuild(df)
+                    self.persist_stats(self.cached_version)
+                if not catalog_analytics.aggregates_match(self.analytics, df):
+                    self.analytics.rebuild(df)
+                    consistent = False
+            return consistent
+
+    # Keys of the books matching a free-text query, best matches first
+    def search(self, term, limit=None, fuzzy=False):
+        self.load()
+        return self.search_index.search(term, limit, fuzzy)
+
+    # Ids of the books with exactly this title
+    def ids_for_title(self, title):
+        self.load()
+        return self.titles.ids(title)
+
+    # Faceted filtering of the loaded catalog (see facets.FacetIndex.query),
+    # optionally within the results of a free-text search. The result also
+    # holds the frame its ids belong to: the query runs under the cache lock,
+    # so the indexes cannot be patched halfway through it.
+    def facet_query(self, filters, match="all", search=None, sort=None, descending=False):
+        while True:
+            df = self.load()
+            with self.cache_lock:
+                if self.cached_frame is not df:
+                    continue
+                ranked = self.search_index.search(search) if search else None
+                result = self.facets.query(filters, match, ranked, sort, descending)
+            result["frame"] = df
+            return result
+
+    # Books that look like duplicates of each of the given duplicate keys
+    # (see duplicates.book_key): exact matches and similar titles/authors
+    def find_duplicates(self, keys):
+        self.load()
+        return self.duplicates.lookup(keys)
+
+    # Clusters of duplicate books across the whole catalog
+    def duplicate_clusters(self, threshold=duplicates.SIMILARITY_THRESHOLD):
+        return duplicates.duplicate_clusters(self.load(), threshold)
+
+    # Set of all cover filenames used by the catalog
+    def referenced_covers(self):
+        self.load()
+        return self.covers.names()
+
+    # Categories in use, from the maintained statistics rather than a scan of
+    # the catalog; the app's own categories come first, in their usual order
+    def categories(self):
+        counts = self.catalog_stats()["categories"]
+        return [category for category in CATEGORIES if category in counts] + sorted(
+            category for category in counts if category not in CATEGORIES
+        )
+
+    # One book by id, or None if it no longer exists
+    def get_book(self, book_id):
+        df = self.load()
+        return df.loc[book_id] if book_id in df.index else None
+
+    # Next free id: one past the highest id ever used, deleted books included
+    # Callers hold self.lock until the write using it bumps the version
+    def next_id(self):
+        df = self.load()
+        return max(self.last_id(), highest_id(df)) + 1
+
+
+# CSV storage: a flat data file, optionally with an append-only journal
+# ("incremental" mode) that is compacted into the data file in the background
+class CsvBackend(Backend):
+    def __init__(self, path, mode="incremental"):
+        super().__init__(path)
+        self.mode = mode
+        self.migrate_ids()
+
+    # One-time migration for data files written before books had ids: the
+    # journal is folded in and rows are numbered from 1 in file order
+    def migrate_ids(self):
+        if not os.path.exists(self.path):
+            return False
+        with self.lock:
+            if ID_COLUMN in pd.read_csv(self.path, nrows=0).columns:
+                return False
+            df = replay_journal(pd.read_csv(self.path), read_journal(self.path))
+            df.index = df.index + 1
+            self.save(df)
+            return True
+
+    # Cache key for the current on-disk state (data file plus journal)
+    def version(self):
+        return (file_version(self.path), file_version(journal_path(self.path)))
+
+    def read_all(self):
+        if os.path.exists(self.path):
+            df = pd.read_csv(self.path, index_col=ID_COLUMN)
+            df.index.name = None
+        else:
+            df = empty_frame()
+        return catalog_schema.apply_schema(replay_journal(df, read_journal(self.path), self.last_id() + 1))
+
+    def save(self, df):
+        with self.lock:
+            write_atomic(df, self.path)
+            # Even if we crash before this unlink, the stale journal no longer
+            # matches the new data file version and will be ignored
+            if os.path.exists(journal_path(self.path)):
+                os.remove(journal_path(self.path))
+            self.bump_catalog_version(highest_id(df))
+        self.invalidate()
+
+    # Fold the journal back into the data file
+    def compact(self):
+        with self.lock:
+            if not read_journal(self.path):
+                return False
+            self.save(self.load())
+            return True
+
+    # Start compaction on a background thread once the journal is long enough
+    def maybe_compact(self, entry_count):
+        if entry_count < JOURNAL_COMPACT_THRESHOLD:
+            return
+        with self.lock:
+            running = compaction_threads.get(self.path)
+            if running is not None and running.is_alive():
+                return
+            thread = threading.Thread(target=self.compact, daemon=True)
+            compaction_threads[self.path] = thread
+            thread.start()
+
+    # Append a journal entry and patch the cached frame instead of reparsing
+    def record(self, entry):
+        with self.lock:
+            df = self.load()
+            before = self.version()
+            changes = resolve_journal(df, [entry], self.last_id() + 1)
+            self.record_snapshot(df, changes)
+            entry_count = append_entry(self.path, entry)
+            self.bump_catalog_version(added_id(changes))
+            self.patch(before, self.version(), changes)
+        self.maybe_compact(entry_count)
+
+    # "full" mode: apply one journal-style entry and rewrite the data file
+    def rewrite(self, entry):
+        with self.lock:
+            df = self.load()
+            changes = resolve_journal(df, [entry], self.last_id() + 1)
+            if changes:
+                self.record_snapshot(df, changes)
+                self.save(apply_changes(df, changes))
+
+    def add(self, row):
+        with self.lock:
+            entry = {"op": "add", "key": self.next_id(), "row": row}
+            if self.mode == "incremental":
+                self.record(entry)
+            else:
+                self.rewrite(entry)
+
+    # Rows are identified by their key plus their current title, so a change
+    # computed from an outdated frame cannot land on a different book
+    # base/base_version describe the book as it was when the edit started
+    def update(self, key, title, row, base=None, base_version=None):
+        with self.lock:
+            title, row = self.merge_edit(key, title, row, base, base_version)
+            entry = {"op": "edit", "key": int(key), "title": title, "row": row}
+            if self.mode == "incremental":
+                self.record(entry)
+            else:
+                self.rewrite(entry)
+
+    def delete(self, keys, title):
+        entry = {"op": "delete", "keys": [int(key) for key in keys], "title": title}
+        if self.mode == "incremental":
+            self.record(entry)
+        else:
+            self.rewrite(entry)
+
+    def bulk_writer(self):
+        return CsvBulkWriter(self)
+
+
+# Parquet storage: a compressed columnar file with typed columns. Parquet
+# files cannot be appended to in place, so every change rewrites the file;
+# in exchange, loading is fast and reads can skip columns.
+class ParquetBackend(Backend):
+    def __init__(self, path):
+        super().__init__(path)
+
+    def version(self):
+        return file_version(self.path)
+
+    # Read the data file, optionally only some columns
+    # Strings are converted straight to Arrow-backed columns, without
+    # materialising Python str objects
+    def read_table(self, columns=None):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not os.path.exists(self.path):
+            return empty_frame() if columns is None else empty_frame()[columns]
+        if columns is not None:
+            columns = [ID_COLUMN] + list(columns)
+        table = pq.read_table(self.path, columns=columns)
+        df = table.to_pandas(types_mapper={pa.string(): pd.api.types.pandas_dtype(catalog_schema.STRING_DTYPE)}.get)
+        df = df.set_index(ID_COLUMN)
+        df.index.name = None
+        return catalog_schema.apply_schema(df)
+
+    def read_all(self):
+        return self.read_table()
+
+    def save(self, df):
+        with self.lock:
+            write_parquet_atomic(df, self.path)
+            self.bump_catalog_version(highest_id(df))
+        self.invalidate()
+
+    # Apply journal-style entries (with their title guards) and rewrite the file
+    def write_entries(self, entries):
+        with self.lock:
+            df = self.load()
+            before = self.version()
+            changes = resolve_journal(df, entries, self.last_id() + 1)
+            if not changes:
+                return
+            self.record_snapshot(df, changes)
+            write_parquet_atomic(apply_changes(df, changes), self.path)
+            self.bump_catalog_version(added_id(changes))
+            self.patch(before, self.version(), changes)
+
+    def add(self, row):
+        with self.lock:
+            self.write_entries([{"op": "add", "key": self.next_id(), "row": row}])
+
+    def update(self, key, title, row, base=None, base_version=None):
+        with self.lock:
+            title, row = self.merge_edit(key, title, row, base, base_version)
+            self.write_entries([{"op": "edit", "key": int(key), "title": title, "row": row}])
+
+    def delete(self, keys, title):
+        self.write_entries([{"op": "delete", "keys": [int(key) for key in keys], "title": title}])
+
+    def bulk_writer(self):
+        return ParquetBulkWriter(self)
+
+
+# SQLite storage: one row per book with a stable integer id, WAL journaling
+# so that single-book writes do not rewrite the catalog, and indexes on the
+# columns books are looked up by
+class SqliteBackend(Backend):
+    def __init__(self, path):
+        super().__init__(path)
+        with closing(self.connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            columns = ", ".join(
+                f'"{column}" INTEGER' if column in ("عدد الصفحات", "التقييم") else f'"{column}" TEXT'
+                for column in COLUMNS
+            )
+            conn.execute(f"CREATE TABLE IF NOT EXISTS books (id INTEGER PRIMARY KEY AUTOINCREMENT, {columns})")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+            conn.execute("INSERT OR IGNORE INTO meta VALUES ('version', 0)")
+            for position, column in enumerate(INDEXED_COLUMNS):
+                conn.execute(f'CREATE INDEX IF NOT EXISTS books_idx_{position} ON books ("{column}")')
+
+    # Connections are opened per call: Streamlit serves each session from its
+    # own thread and sqlite3 connections may not be shared between threads
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # Every write bumps a counter in the same transaction; it is the cache key
+    def bump_version(self, conn):
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+        return conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    def version(self):
+        with closing(self.connect()) as conn:
+            return conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    # The write counter doubles as the catalog version number
+    def catalog_version(self):
+        return self.version()
+
+    # AUTOINCREMENT keeps the highest id ever used in sqlite_sequence
+    def last_id(self):
+        with closing(self.connect()) as conn:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'books'").fetchone()
+        return row[0] if row else 0
+
+    def read_sql(self, sql, params=()):
+        with closing(self.connect()) as conn:
+            df = pd.read_sql_query(sql, conn, params=params, index_col="id")
+        df.index.name = None
+        return catalog_schema.apply_schema(df)
+
+    def read_all(self):
+        return self.read_sql("SELECT * FROM books ORDER BY id")
+
+    # Replace the whole table, keeping the ids carried in the frame index
+    def save(self, df):
+        rows = [
+            (plain(key),) + tuple(plain(row.get(column)) for column in COLUMNS)
+            for key, row in zip(df.index, df.to_dict("records"))
+        ]
+        placeholders = ", ".join("?" for _ in range(len(COLUMNS) + 1))
+        names = ", ".join(f'"{column}"' for column in COLUMNS)
+        with closing(self.connect()) as conn, conn:
+            conn.execute("DELETE FROM books")
+            conn.executemany(f"INSERT INTO books (id, {names}) VALUES ({placeholders})", rows)
+            self.bump_version(conn)
+        self.invalidate()
+
+    # Books with the given ids and title as they are stored, for the snapshot
+    # undo log; read inside the writing transaction
+    def stored_rows(self, conn, keys, title):
+        rows = {}
+        for key in keys:
+            cursor = conn.execute('SELECT * FROM books WHERE id = ? AND "عنوان" = ?', (plain(key), title))
+            values = cursor.fetchone()
+            if values is not None:
+                names = [column[0] for column in cursor.description]
+                row = dict(zip(names, values))
+                rows[row.pop("id")] = row
+        return rows
+
+    def add(self, row):
+        names = ", ".join(f'"{column}"' for column in row)
+        placeholders = ", ".join("?" for _ in row)
+        with self.lock:
+            with closing(self.connect()) as conn, conn:
+                cursor = conn.execute(
+                    f"INSERT INTO books ({names}) VALUES ({placeholders})",
+                    [plain(value) for value in row.values()]
+                )
+                self.snapshots.record(self.catalog_version(), {cursor.lastrowid: None})
+                after = self.bump_version(conn)
+            self.patch(after - 1, after, [("add", cursor.lastrowid, row)])
+
+    def update(self, key, title, row, base=None, base_version=None):
+        with self.lock:
+            title, row = self.merge_edit(key, title, row, base, base_version)
+            if not row:
+                return
+            assignments = ", ".join(f'"{column}" = ?' for column in row)
+            with closing(self.connect()) as conn, conn:
+                self.snapshots.record(self.catalog_version(), self.stored_rows(conn, [key], title))
+                cursor = conn.execute(
+                    f'UPDATE books SET {assignments} WHERE id = ? AND "عنوان" = ?',
+                    [plain(value) for value in row.values()] + [plain(key), title]
+                )
+                changes = [("edit", plain(key), row)] if cursor.rowcount else []
+                after = self.bump_version(conn)
+            self.patch(after - 1, after, changes)
+
+    def delete(self, keys, title):
+        changes = []
+        with self.lock:
+            with closing(self.connect()) as conn, conn:
+                self.snapshots.record(self.catalog_version(), self.stored_rows(conn, keys, title))
+                for key in keys:
+                    cursor = conn.execute('DELETE FROM books WHERE id = ? AND "عنوان" = ?', (plain(key), title))
+                    if cursor.rowcount:
+                        changes.append(("delete", plain(key), None))
+                after = self.bump_version(conn)
+            self.patch(after - 1, after, changes)
+
+    def bulk_writer(self):
+        return SqliteBulkWriter(self)
+
+
+# Bulk writers stage a large batch of new books and commit it in one write.
+# They hold the process write lock from start to commit so that ids handed
+# out to the batch cannot collide with single-book adds.
+class CsvBulkWriter:
+    def __init__(self, backend):
+        self.backend = backend
+        backend.lock.acquire()
+        try:
+            # Fold the journal first: appending to the data file gives it a new
+            # version, which would orphan any pending journal entries
+            backend.compact()
+            self.next_id = backend.next_id()
+            self.first_id = self.next_id
+            if os.path.exists(backend.path):
+                self.columns = list(pd.read_csv(backend.path, nrows=0, index_col=ID_COLUMN).columns)
+            else:
+                self.columns = COLUMNS
+            self.staging_path = f"{backend.path}.{os.getpid()}.import.tmp"
+            self.staging = open(self.staging_path, "w", encoding="utf-8", newline="")
+        except Exception:
+            backend.lock.release()
+            raise
+        self.count = 0
+
+    # Stage one chunk of validated rows, assigning their ids
+    def write(self, df):
+        df = df.reindex(columns=self.columns).set_axis(range(self.next_id, self.next_id + len(df)))
+        df.to_csv(self.staging, header=False, index=True)
+        self.next_id += len(df)
+        self.count += len(df)
+
+    # Copy the data file and the staged rows into a new file and swap it in
+    # atomically; this streams bytes without parsing the existing catalog
+    def commit(self):
+        try:
+            self.staging.close()
+            tmp_path = f"{self.backend.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as out:
+                if os.path.exists(self.backend.path):
+                    with open(self.backend.path, "rb") as base:
+                        shutil.copyfileobj(base, out)
+                    if out.tell() and not self.ends_with_newline(self.backend.path):
+                        out.write(b"\n")
+                else:
+                    out.write((",".join([ID_COLUMN] + self.columns) + "\n").encode("utf-8"))
+                with open(self.staging_path, "rb") as staged:
+                    shutil.copyfileobj(staged, out)
+                out.flush()
+                os.fsync(out.fileno())
+            self.backend.snapshots.record(self.backend.catalog_version(), added=(self.first_id, self.next_id - 1))
+            os.replace(tmp_path, self.backend.path)
+            self.backend.bump_catalog_version(self.next_id - 1)
+            self.backend.invalidate()
+        finally:
+            self.close()
+        return self.count
+
+    def ends_with_newline(self, path):
+        with open(path, "rb") as data:
+            data.seek(-1, os.SEEK_END)
+            return data.read(1) == b"\n"
+
+    def abort(self):
+        self.staging.close()
+        self.close()
+
+    def close(self):
+        if os.path.exists(self.staging_path):
+            os.remove(self.staging_path)
+        self.backend.lock.release()
+
+
+class SqliteBulkWriter:
+    def __init__(self, backend):
+        self.backend = backend
+        backend.lock.acquire()
+        try:
+            self.conn = backend.connect()
+            self.conn.execute("BEGIN IMMEDIATE")
+            row = self.conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'books'").fetchone()
+            self.first_id = (row[0] if row else 0) + 1
+        except Exception:
+            backend.lock.release()
+            raise
+        self.count = 0
+        names = ", ".join(f'"{column}"' for column in COLUMNS)
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        self.insert = f"INSERT INTO books ({names}) VALUES ({placeholders})"
+
+    # Stage one chunk inside the open transaction; ids come from SQLite
+    def write(self, df):
+        df = df.reindex(columns=COLUMNS)
+        self.conn.executemany(self.insert, ([plain(value) for value in row] for row in df.itertuples(index=False)))
+        self.count += len(df)
+
+    def commit(self):
+        try:
+            last_id = self.conn.execute("SELECT MAX(id) FROM books").fetchone()[0] or 0
+            self.backend.snapshots.record(self.backend.catalog_version(), added=(self.first_id, last_id))
+            self.backend.bump_version(self.conn)
+            self.conn.commit()
+            self.backend.invalidate()
+        finally:
+            self.close()
+        return self.count
+
+    def abort(self):
+        self.conn.rollback()
+        self.close()
+
+    def close(self):
+        self.conn.close()
+        self.backend.lock.release()
+
+
+# The new file is the existing row groups followed by the imported chunks,
+# streamed batch by batch into a temp file that atomically replaces the data
+class ParquetBulkWriter:
+    def __init__(self, backend):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.backend = backend
+        self.tmp_path = f"{backend.path}.{os.getpid()}.import.tmp"
+        self.out = None
+        self.writer = None
+        backend.lock.acquire()
+        try:
+            self.next_id = backend.next_id()
+            self.first_id = self.next_id
+            self.out = open(self.tmp_path, "wb")
+            self.writer = pq.ParquetWriter(self.out, parquet_schema())
+            if os.path.exists(backend.path):
+                for batch in pq.ParquetFile(backend.path).iter_batches(batch_size=PARQUET_ROW_GROUP_SIZE):
+                    self.writer.write_table(pa.Table.from_batches([batch]), row_group_size=PARQUET_ROW_GROUP_SIZE)
+        except Exception:
+            self.abort()
+            raise
+        self.count = 0
+
+    def write(self, df):
+        df = df.set_axis(range(self.next_id, self.next_id + len(df)))
+        self.writer.write_table(parquet_table(df), row_group_size=PARQUET_ROW_GROUP_SIZE)
+        self.next_id += len(df)
+        self.count += len(df)
+
+    def commit(self):
+        try:
+            self.writer.close()
+            self.out.flush()
+            os.fsync(self.out.fileno())
+            self.out.close()
+            self.backend.snapshots.record(self.backend.catalog_version(), added=(self.first_id, self.next_id - 1))
+            os.replace(self.tmp_path, self.backend.path)
+            self.backend.bump_catalog_version(self.next_id - 1)
+            self.backend.invalidate()
+        finally:
+            self.close()
+        return self.count
+
+    def abort(self):
+        if self.writer is not None:
+            self.writer.close()
+        if self.out is not None:
+            self.out.close()
+        self.close()
+
+    def close(self):
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+        self.backend.lock.release()
+
+
+# Function to check for a CSV catalog to migrate; until its first compaction
+# a new catalog lives only in its journal
+def csv_catalog_exists(csv_path):
+    return bool(csv_path) and (os.path.exists(csv_path) or os.path.exists(journal_path(csv_path)))
+
+
+# Function to copy a CSV catalog (including its journal) into a SQLite database
+def migrate_csv_to_sqlite(csv_path, db_path):
+    df = CsvBackend(csv_path).load()
+    backend = SqliteBackend(db_path)
+    backend.save(df)
+    return len(df)
+
+
+# Function to copy a CSV catalog (including its journal) into a Parquet file
+def migrate_csv_to_parquet(csv_path, parquet_path):
+    df = CsvBackend(csv_path).load()
+    ParquetBackend(parquet_path).save(df)
+    return len(df)
+
+
+backends = {}
+
+
+# Function to get the shared backend object for a storage configuration
+# On first use of SQLite or Parquet with an existing CSV catalog, the CSV is
+# migrated once
+def open_backend(name, path, csv_path=None, mode="incremental"):
+    key = (name, path, mode)
+    with registry_lock:
+        if key not in backends:
+            if name == "sqlite":
+                if not os.path.exists(path) and csv_catalog_exists(csv_path):
+                    migrate_csv_to_sqlite(csv_path, path)
+                backends[key] = SqliteBackend(path)
+            elif name == "parquet":
+                if not os.path.exists(path) and csv_catalog_exists(csv_path):
+                    migrate_csv_to_parquet(csv_path, path)
+                backends[key] = ParquetBackend(path)
+            elif name == "csv":
+                backends[key] = CsvBackend(path, mode)
+            else:
+                raise ValueError(f"Unknown storage backend: {name}")
+        return backends[key]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Book catalog storage tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate = commands.add_parser("migrate", help="copy a CSV catalog into a SQLite database or a .parquet file")
+    migrate.add_argument("csv_path", nargs="?", default="books_data.csv")
+    migrate.add_argument("db_path", nargs="?", default="books_data.db")
+    compact = commands.add_parser("compact", help="fold the CSV journal into the data file")
+    compact.add_argument("csv_path", nargs="?", default="books_data.csv")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        migrate_to = migrate_csv_to_parquet if args.db_path.endswith(".parquet") else migrate_csv_to_sqlite
+        print(f"Migrated {migrate_to(args.csv_path, args.db_path)} books to {args.db_path}")
+    elif args.command == "compact":
+        CsvBackend(args.csv_path).compact()
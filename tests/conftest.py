@@ -0,0 +1,57 @@
+import io
+import os
+import sys
+
+import pytest
+from PIL import Image
+
+# The modules live at the top of the repository, which is not a package
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY)
+
+import benchmark
+import storage
+
+# Data file of a fresh catalog for each storage backend
+BACKEND_FILES = {"csv": "books.csv", "sqlite": "books.db", "parquet": "books.parquet"}
+
+
+@pytest.fixture(params=list(BACKEND_FILES))
+def backend(request, tmp_path):
+    if request.param == "parquet":
+        pytest.importorskip("pyarrow")
+    return storage.open_backend(request.param, str(tmp_path / BACKEND_FILES[request.param]))
+
+
+# Function to make a generated book with some fields overridden
+@pytest.fixture
+def make_book():
+    def make(seed=0, **fields):
+        return {**benchmark.generate_catalog(1, seed=seed).iloc[0].to_dict(), **fields}
+    return make
+
+
+# Function to encode a plain test image
+@pytest.fixture
+def make_image():
+    def make(size=(300, 450), color=(200, 30, 30), image_format="PNG", mode="RGB"):
+        buffer = io.BytesIO()
+        Image.new(mode, size, color).save(buffer, image_format)
+        return buffer.getvalue()
+    return make
+
+
+# Function to run the Streamlit app headlessly on a fresh CSV catalog of
+# generated books, in a temporary working directory
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    from streamlit.testing.v1 import AppTest
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(storage, "backends", {})
+
+    def run(books=0):
+        if books:
+            storage.CsvBackend("books_data.csv").save(benchmark.generate_catalog(books).set_axis(range(1, books + 1)))
+        return AppTest.from_file(os.path.join(REPOSITORY, "main2.py"), default_timeout=60).run()
+    return run
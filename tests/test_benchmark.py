@@ -0,0 +1,56 @@
+import io
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+import benchmark
+import storage
+
+
+def test_catalog_is_deterministic_per_seed():
+    pd.testing.assert_frame_equal(benchmark.generate_catalog(200, seed=3), benchmark.generate_catalog(200, seed=3))
+    assert not benchmark.generate_catalog(200, seed=3).equals(benchmark.generate_catalog(200, seed=4))
+
+
+def test_catalog_has_the_app_columns():
+    df = benchmark.generate_catalog(500)
+    assert list(df.columns) == storage.COLUMNS
+    assert set(df["تصنيف"]) <= set(storage.CATEGORIES)
+    assert set(df["الحالة"]) <= set(storage.STATUSES)
+    assert df["التقييم"].between(1, 5).all()
+    assert df["عنوان"].str.len().gt(0).all()
+    assert pd.to_datetime(df["تاريخ الإضافة"], format="%Y-%m-%d").notna().all()
+    assert df["صورة الغلاف"].isna().all()
+
+
+def test_cover_names_are_assigned():
+    df = benchmark.generate_catalog(1000, cover_names=["a.jpg", "b.png"])
+    assert set(df["صورة الغلاف"].dropna()) == {"a.jpg", "b.png"}
+    assert abs(df["صورة الغلاف"].notna().mean() - benchmark.COVER_SHARE) < 0.1
+
+
+def test_generated_cover():
+    data = benchmark.generate_cover(np.random.default_rng(0), (300, 450), "JPEG")
+    with Image.open(io.BytesIO(data)) as img:
+        assert (img.format, img.size) == ("JPEG", (300, 450))
+
+
+def test_legacy_filter():
+    df = benchmark.generate_catalog(500)
+    filtered = benchmark.legacy_filter(df, statuses=["تمت القراءة"], categories=["أدب"], search="رحلة")
+    assert (filtered["الحالة"] == "تمت القراءة").all()
+    assert (filtered["تصنيف"] == "أدب").all()
+    assert (filtered["عنوان"].str.contains("رحلة") | filtered["مؤلف"].str.contains("رحلة")).all()
+    assert benchmark.legacy_filter(df).equals(df)
+
+
+def test_compare_results(capsys):
+    baseline = {"sizes": {"1000": {"search_ms": 10.0, "app": {"first_run_ms": 100.0}}}}
+    current = {"sizes": {"1000": {"search_ms": 5.0, "app": {"first_run_ms": 200.0}}, "10000": {"search_ms": 1.0}}}
+    benchmark.compare_results(baseline, current)
+    lines = capsys.readouterr().out.splitlines()[1:]
+    assert len(lines) == 2
+    assert lines[0].split()[-1] == "0.50"
+    assert lines[1].split()[1:2] == ["app.first_run_ms"]
+    assert lines[1].split()[-1] == "2.00"
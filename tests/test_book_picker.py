@@ -0,0 +1,46 @@
+import storage
+
+
+# Function to open a page of the app from the sidebar, optionally with a query
+# typed into its book picker
+# The query is set before the picker is drawn: this version of AppTest cannot
+# rerun a page once a selectbox with a format_func is on it
+def open_page(at, page, picker=None, query=None):
+    if query is not None:
+        at.session_state[f"{picker}_query"] = query
+    at.sidebar.selectbox[0].set_value(page).run()
+    assert not at.exception
+    return at
+
+
+def test_recent_books_are_offered_without_a_query(app):
+    at = open_page(app(books=30), "تعديل كتاب")
+    titles = storage.CsvBackend("books_data.csv").load()["عنوان"]
+    options = at.selectbox(key="edit_book").options
+    assert len(options) == 20
+    assert options[0] == titles[30]
+
+
+def test_query_searches_titles_and_authors(app):
+    at = app(books=30)
+    backend = storage.open_backend("csv", "books_data.csv")
+    backend.add({"عنوان": "ثلاثية غرناطة", "مؤلف": "رضوى عاشور"})
+    at = open_page(at, "حذف كتاب", "delete_book", "غرناطه")
+    assert at.selectbox(key="delete_book").options == ["ثلاثية غرناطة"]
+    at = open_page(app(), "تعديل كتاب", "edit_book", "عاشور")
+    assert at.selectbox(key="edit_book").options == ["ثلاثية غرناطة"]
+
+
+def test_same_titles_are_told_apart(app):
+    at = app()
+    backend = storage.open_backend("csv", "books_data.csv")
+    backend.add({"عنوان": "الأيام", "مؤلف": "طه حسين"})
+    backend.add({"عنوان": "الأيام", "مؤلف": "مؤلف آخر"})
+    at = open_page(at, "تعديل كتاب")
+    assert at.selectbox(key="edit_book").options == ["الأيام — مؤلف آخر (#2)", "الأيام — طه حسين (#1)"]
+
+
+def test_no_match(app):
+    at = open_page(app(books=5), "تعديل كتاب", "edit_book", "لا يوجد كتاب بهذا الاسم")
+    assert not at.main.selectbox
+    assert any("لا توجد كتب تطابق البحث" in block.value for block in at.markdown)
@@ -0,0 +1,92 @@
+import json
+
+import pandas as pd
+import pytest
+
+import bulk_io
+
+
+def test_normalise_a_chunk():
+    chunk = pd.DataFrame({
+        " Title ": ["  الأيام  ", "", "كتاب", "كتاب آخر", "كتاب ثالث", "كتاب رابع"],
+        "AUTHOR": ["طه   حسين", "مؤلف", "مؤلف", "مؤلف", "مؤلف", "مؤلف"],
+        "category": ["أدب", "", "طبخ", "", "", ""],
+        "pages": ["250", "", "", "12.5", "", ""],
+        "rating": ["5", "", "", "", "7", ""],
+        "published": ["1929-01-01", "", "", "", "", "ليس تاريخاً"],
+    })
+    rows, reasons = bulk_io.normalize_chunk(chunk, today="2026-01-02")
+    assert rows.index.tolist() == [0]
+    book = rows.loc[0]
+    assert (book["عنوان"], book["مؤلف"], book["تصنيف"]) == ("الأيام", "طه حسين", "أدب")
+    assert (book["عدد الصفحات"], book["التقييم"]) == (250, 5)
+    assert book["الحالة"] == "لم تتم القراءة بعد"
+    assert book["تاريخ الإضافة"] == "2026-01-02"
+    assert reasons.to_dict() == {
+        1: "عنوان مفقود",
+        2: "تصنيف غير معروف",
+        3: "عدد صفحات غير صالح",
+        4: "تقييم خارج النطاق 1-5",
+        5: "تاريخ نشر غير صالح",
+    }
+
+
+# A missing rating stays missing instead of being made up
+def test_missing_rating_and_pages_stay_empty():
+    rows, _ = bulk_io.normalize_chunk(pd.DataFrame({"title": ["كتاب"], "author": ["مؤلف"]}))
+    assert rows["التقييم"].isna().all()
+    assert rows["عدد الصفحات"].isna().all()
+    assert rows.loc[0, "تصنيف"] == "أخرى"
+
+
+def test_import_skips_duplicates_and_reports(backend, make_book, tmp_path):
+    backend.add(make_book(1, عنوان="ثلاثية غرناطة", مؤلف="رضوى عاشور"))
+    source = tmp_path / "import.csv"
+    pd.DataFrame({
+        "title": ["ثلاثيه غرناطه", "كتاب جديد", "كتاب جديد", "", "الحرب والسلام"],
+        "author": ["رضوى عاشور", "مؤلف", "مؤلف", "مؤلف", "تولستوي"],
+        "rating": ["", "4", "4", "", ""],
+    }).to_csv(source, index=False)
+    progress = []
+    report = bulk_io.import_books(backend, str(source), "csv", chunk_size=2, progress=progress.append)
+    assert report["read"] == 5
+    assert report["imported"] == 2
+    assert report["duplicates"] == 2
+    assert report["rejected"] == 1
+    assert report["rejected_rows"] == [{"الصف": 4, "السبب": "عنوان مفقود"}]
+    assert len(progress) == 3
+    df = backend.load()
+    assert sorted(df["عنوان"].tolist()) == sorted(["ثلاثية غرناطة", "كتاب جديد", "الحرب والسلام"])
+    assert df.loc[df["عنوان"] == "الحرب والسلام", "التقييم"].isna().all()
+    assert backend.verify_stats()
+
+
+@pytest.mark.parametrize("file_format", ["jsonl", "json", "xlsx"])
+def test_formats(file_format, tmp_path):
+    books = [{"title": "كتاب", "author": "مؤلف", "pages": 100}, {"title": "آخر", "author": "مؤلف", "pages": None}]
+    source = tmp_path / f"import.{file_format}"
+    if file_format == "jsonl":
+        source.write_text("\n".join(json.dumps(book, ensure_ascii=False) for book in books), encoding="utf-8")
+    elif file_format == "json":
+        source.write_text(json.dumps(books, ensure_ascii=False), encoding="utf-8")
+    else:
+        pytest.importorskip("openpyxl")
+        pd.DataFrame(books).to_excel(source, index=False)
+    chunks = list(bulk_io.read_chunks(str(source), file_format, chunk_size=1))
+    assert len(chunks) == 2
+    rows, reasons = bulk_io.normalize_chunk(pd.concat(chunks))
+    assert rows["عنوان"].tolist() == ["كتاب", "آخر"]
+    assert rows["عدد الصفحات"].tolist()[0] == 100
+    assert reasons.empty
+
+
+# A file that fails to parse halfway leaves the catalog as it was
+def test_failed_import_changes_nothing(backend, make_book, tmp_path):
+    backend.add(make_book(1, عنوان="kept"))
+    source = tmp_path / "import.jsonl"
+    source.write_text('{"title": "a", "author": "b"}\n{"title": "c", "author": "d"}\nnot json\n', encoding="utf-8")
+    with pytest.raises(ValueError):
+        bulk_io.import_books(backend, str(source), "jsonl", chunk_size=2)
+    assert backend.load()["عنوان"].tolist() == ["kept"]
+    backend.add(make_book(2, عنوان="after"))
+    assert backend.load().index.tolist() == [1, 2]
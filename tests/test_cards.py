@@ -0,0 +1,55 @@
+import pandas as pd
+
+import benchmark
+import cards
+import catalog_schema
+
+
+def books(count=3, **columns):
+    df = catalog_schema.apply_schema(benchmark.generate_catalog(count).set_axis(range(1, count + 1)))
+    return df.assign(**columns)
+
+
+def no_cover(name):
+    return None
+
+
+def test_one_card_per_line():
+    html = cards.render_cards_html(books(3), no_cover)
+    lines = html.split("\n")
+    assert len(lines) == 3
+    assert all(line.startswith('<div class="book-card">') and line.endswith("</div></div>") for line in lines)
+    assert cards.render_cards_html(books(0), no_cover) == ""
+
+
+def test_text_is_escaped():
+    df = books(1, **{"عنوان": "<script>alert(1)</script>", "ملاحظات": 'a "quoted" & <b>'})
+    html = cards.render_cards_html(df, no_cover)
+    assert "<script>" not in html
+    assert "&lt;script&gt;alert(1)&lt;/script&gt;" in html
+    assert "a &quot;quoted&quot; &amp; &lt;b&gt;" in html
+
+
+def test_missing_values_are_blank():
+    df = books(1, **{"عدد الصفحات": pd.NA, "التقييم": pd.NA, "ملاحظات": pd.NA, "تاريخ النشر": pd.NaT})
+    html = cards.render_cards_html(df, no_cover)
+    assert "<p>عدد الصفحات: </p>" in html
+    assert "<p>التقييم: </p>" in html
+    assert "<p>ملاحظات: </p>" in html
+    assert "<p>تاريخ النشر: </p>" in html
+
+
+def test_rating_and_status():
+    df = books(1, **{"التقييم": 4, "الحالة": "تمت القراءة"})
+    html = cards.render_cards_html(df, no_cover)
+    assert f"<p>التقييم: {'⭐' * 4}</p>" in html
+    assert '<span style="color: #28a745;">تمت القراءة</span>' in html
+
+
+def test_covers():
+    df = books(3, **{"صورة الغلاف": ["a.png", "b.png", None]})
+    uris = {"a.png": '/covers/a.webp?v="x"'}
+    html = cards.render_cards_html(df, uris.get, pending={"b.png"}).split("\n")
+    assert '<img src="/covers/a.webp?v=&quot;x&quot;" class="book-cover"' in html[0]
+    assert cards.PENDING_COVER_HTML in html[1]
+    assert cards.NO_COVER_HTML in html[2]
@@ -0,0 +1,64 @@
+import pandas as pd
+
+import benchmark
+import catalog_analytics
+
+
+# Every write updates the aggregates from the changed books only, and ends up
+# where a full recount over the catalog would
+def test_aggregates_follow_writes(backend, make_book):
+    for seed in range(6):
+        backend.add(make_book(seed))
+    backend.load()
+    backend.update(1, backend.get_book(1)["عنوان"], {"الحالة": "تمت القراءة", "مؤلف": "مؤلف جديد", "التقييم": 5})
+    backend.delete([2], backend.get_book(2)["عنوان"])
+    backend.delete([3], backend.get_book(3)["عنوان"])
+    df = backend.load()
+    assert catalog_analytics.aggregates_match(backend.analytics, df)
+    snapshot = backend.catalog_analytics()
+    assert snapshot["total"].loc["all", "books"] == len(df)
+    assert snapshot["authors"].loc["مؤلف جديد", "read"] == 1
+    assert backend.verify_stats()
+
+
+def test_empty_groups_are_dropped(backend, make_book):
+    backend.add(make_book(1, مؤلف="وحيد"))
+    backend.add(make_book(2))
+    backend.load()
+    backend.delete([1], backend.get_book(1)["عنوان"])
+    assert "وحيد" not in backend.catalog_analytics()["authors"].index
+
+
+def test_drifted_aggregates_are_repaired(backend, make_book):
+    backend.add(make_book(1))
+    backend.load()
+    backend.analytics.tables["total"].counts[0, 0] += 3
+    assert not backend.verify_stats()
+    assert catalog_analytics.aggregates_match(backend.analytics, backend.load())
+
+
+def test_compute_aggregates():
+    df = pd.DataFrame({
+        "الحالة": ["تمت القراءة", "قيد القراءة", "تمت القراءة"],
+        "عدد الصفحات": [100, 200, None],
+        "التقييم": [4, None, 2],
+        "تاريخ الإضافة": ["2024-01-05", "2024-01-20", "2024-02-01"],
+        "تصنيف": ["أدب", "أدب", "تاريخ"],
+        "مؤلف": ["أ", "ب", "أ"],
+    })
+    aggregates = catalog_analytics.compute_aggregates(df)
+    total = aggregates["total"].loc["all"]
+    assert total.tolist() == [3, 2, 300, 100, 6, 2]
+    assert aggregates["monthly"].loc["2024-01", "books"] == 2
+    assert sorted(aggregates["ratings"].index) == [2, 4]
+    assert aggregates["authors"].loc["أ", "read_pages"] == 100
+
+
+def test_top_authors_only():
+    analytics = catalog_analytics.CatalogAnalytics()
+    df = benchmark.generate_catalog(2000)
+    analytics.rebuild(df)
+    authors = analytics.snapshot()["authors"]
+    assert len(authors) == min(catalog_analytics.TOP_AUTHORS, df["مؤلف"].nunique())
+    assert authors["books"].tolist() == df["مؤلف"].value_counts().head(len(authors)).tolist()
+    assert analytics.snapshot() is analytics.snapshot()
@@ -0,0 +1,39 @@
+import storage
+
+
+def test_load_is_cached_until_the_catalog_changes(backend, make_book):
+    backend.add(make_book(1, عنوان="book"))
+    frame = backend.load()
+    assert backend.load() is frame
+    backend.add(make_book(2, عنوان="another"))
+    assert backend.load() is not frame
+    assert len(backend.load()) == 2
+
+
+# Another process writing the catalog is seen on the next load
+def test_write_from_another_instance_is_picked_up(backend, make_book):
+    backend.add(make_book(1, عنوان="book"))
+    backend.load()
+    other = type(backend)(backend.path)
+    other.update(1, "book", {"عنوان": "renamed"})
+    assert backend.load().at[1, "عنوان"] == "renamed"
+
+
+def test_replaced_data_file_is_reread(tmp_path, make_book):
+    path = str(tmp_path / "books.csv")
+    backend = storage.CsvBackend(path, mode="full")
+    backend.add(make_book(1, عنوان="book"))
+    backend.load()
+    edited = backend.read_all()
+    edited.loc[1, "عنوان"] = "edited by hand"
+    storage.write_atomic(edited, path)
+    assert backend.load().at[1, "عنوان"] == "edited by hand"
+
+
+def test_invalidate_forces_a_reread(backend, make_book):
+    backend.add(make_book(1, عنوان="book"))
+    frame = backend.load()
+    backend.invalidate()
+    reloaded = backend.load()
+    assert reloaded is not frame
+    assert reloaded["عنوان"].tolist() == frame["عنوان"].tolist()
@@ -0,0 +1,79 @@
+import pandas as pd
+
+import benchmark
+import catalog_schema
+
+
+def raw_catalog(size=50):
+    return benchmark.generate_catalog(size)
+
+
+def test_apply_schema_dtypes():
+    typed = catalog_schema.apply_schema(raw_catalog())
+    assert typed["عدد الصفحات"].dtype == "Int32"
+    assert typed["التقييم"].dtype == "Int8"
+    assert isinstance(typed["الحالة"].dtype, pd.CategoricalDtype)
+    assert list(typed["تصنيف"].cat.categories[:len(catalog_schema.CATEGORIES)]) == catalog_schema.CATEGORIES
+    for column in catalog_schema.DATE_COLUMNS:
+        assert pd.api.types.is_datetime64_any_dtype(typed[column])
+    for column in catalog_schema.TEXT_COLUMNS:
+        assert typed[column].dtype == catalog_schema.STRING_DTYPE
+
+
+def test_unknown_values():
+    raw = pd.DataFrame({
+        "تصنيف": ["أدب", "شعر", None],
+        "التقييم": ["4", "x", None],
+        "تاريخ النشر": ["2001-02-03", "not a date", None],
+    })
+    typed = catalog_schema.apply_schema(raw)
+    assert "شعر" in typed["تصنيف"].cat.categories
+    assert typed["تصنيف"].isna().tolist() == [False, False, True]
+    assert typed["التقييم"].isna().tolist() == [False, True, True]
+    assert typed["تاريخ النشر"].isna().tolist() == [False, True, True]
+
+
+def test_typed_frame_unchanged():
+    typed = catalog_schema.apply_schema(raw_catalog())
+    again = catalog_schema.apply_schema(typed)
+    pd.testing.assert_frame_equal(typed, again)
+
+
+def test_dates_round_trip():
+    raw = raw_catalog()
+    typed = catalog_schema.apply_schema(raw)
+    formatted = catalog_schema.format_dates(typed)
+    for column in catalog_schema.DATE_COLUMNS:
+        assert formatted[column].tolist() == raw[column].tolist()
+
+
+def test_conform_rows_adds_categories():
+    df = catalog_schema.apply_schema(raw_catalog(10))
+    rows = pd.DataFrame({"عنوان": ["new"], "تصنيف": ["شعر"], "عدد الصفحات": [120.0]}, index=[100])
+    df, rows = catalog_schema.conform_rows(df, rows)
+    assert list(rows.columns) == list(df.columns)
+    assert "شعر" in df["تصنيف"].cat.categories
+    assert rows["تصنيف"].dtype == df["تصنيف"].dtype
+    assert rows["عدد الصفحات"].dtype == "Int32"
+    combined = pd.concat([df, rows])
+    assert isinstance(combined["تصنيف"].dtype, pd.CategoricalDtype)
+    assert combined["عدد الصفحات"].dtype == "Int32"
+
+
+def test_typed_value():
+    df = catalog_schema.apply_schema(raw_catalog(5))
+    df, value = catalog_schema.typed_value(df, "تصنيف", "شعر")
+    assert value == "شعر" and "شعر" in df["تصنيف"].cat.categories
+    assert catalog_schema.typed_value(df, "عدد الصفحات", "12.6")[1] == 13
+    assert catalog_schema.typed_value(df, "تاريخ النشر", "2020-05-06")[1] == pd.Timestamp("2020-05-06")
+    assert catalog_schema.typed_value(df, "التقييم", float("nan"))[1] is None
+
+
+def test_memory_report_shrinks():
+    raw = raw_catalog(500)
+    typed = catalog_schema.apply_schema(raw)
+    raw_report = catalog_schema.memory_report(raw)
+    typed_report = catalog_schema.memory_report(typed)
+    assert list(typed_report.columns) == ["dtype", "bytes", "share"]
+    assert abs(typed_report["share"].sum() - 1) < 1e-9
+    assert typed_report["bytes"].sum() < raw_report["bytes"].sum() / 2
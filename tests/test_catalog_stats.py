@@ -0,0 +1,66 @@
+import threading
+
+import catalog_stats
+
+
+def test_stats_follow_writes(backend, make_book):
+    for seed in range(5):
+        backend.add(make_book(seed, **{"التقييم": seed % 5 + 1, "عدد الصفحات": 100}))
+    backend.update(1, backend.get_book(1)["عنوان"], {"عدد الصفحات": 300, "الحالة": "تمت القراءة"})
+    backend.delete([2], backend.get_book(2)["عنوان"])
+    stats = backend.catalog_stats()
+    assert stats["total"] == 4
+    assert stats["total_pages"] == 600
+    assert stats["statuses"]["تمت القراءة"] >= 1
+    assert catalog_stats.stats_match(stats, catalog_stats.compute_stats(backend.load()))
+    assert backend.verify_stats()
+
+
+def test_average_rating_skips_unrated_books(backend, make_book):
+    assert catalog_stats.average_rating(backend.catalog_stats()) is None
+    backend.add(make_book(1, **{"التقييم": 2}))
+    backend.add(make_book(2, **{"التقييم": None}))
+    backend.add(make_book(3, **{"التقييم": 5}))
+    assert catalog_stats.average_rating(backend.catalog_stats()) == 3.5
+
+
+def test_drifted_stats_are_repaired(backend, make_book):
+    backend.add(make_book(1))
+    backend.load()
+    backend.stats.total_pages += 7
+    assert not backend.verify_stats()
+    assert backend.verify_stats()
+
+
+# Another process reads the sidebar numbers from the stats file instead of
+# loading the catalog
+def test_stats_file(backend, make_book):
+    backend.add(make_book(1, **{"عدد الصفحات": 120}))
+    expected = backend.catalog_stats()
+    other = type(backend)(backend.path)
+    assert other.catalog_stats() == expected
+    assert other.cached_frame is None
+    assert catalog_stats.read_stats_file(backend.stats_path(), "another version") is None
+
+
+# verify_stats must take the locks in the order writers do
+def test_verify_while_another_thread_writes(backend, make_book):
+    backend.add(make_book(1))
+    holding = threading.Event()
+
+    def write():
+        with backend.lock:
+            holding.set()
+            threading.Event().wait(0.2)
+            backend.add(make_book(2))
+
+    writer = threading.Thread(target=write, daemon=True)
+    writer.start()
+    holding.wait(5)
+    verifier = threading.Thread(target=backend.verify_stats, daemon=True)
+    verifier.start()
+    writer.join(10)
+    verifier.join(10)
+    assert not writer.is_alive()
+    assert not verifier.is_alive()
+    assert backend.catalog_stats()["total"] == 2
@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+
+import benchmark
+import storage
+
+
+# Several processes, each with several threads, add books to one catalog and
+# edit them from stale copies; every book must land exactly once and every
+# non-conflicting edit must be merged
+@pytest.mark.parametrize("backend_name", list(benchmark.CONCURRENCY_FILES))
+def test_concurrent_writers(backend_name, tmp_path):
+    if backend_name == "parquet":
+        pytest.importorskip("pyarrow")
+    result = benchmark.concurrency_check(backend_name, str(tmp_path), books=5, processes=2, threads=2)
+    assert result["lost"] == 0
+    assert result["duplicated"] == 0
+    assert result["unmerged"] == 0
+    assert result["stats"] is True
+
+
+def test_stale_edit_is_merged(backend, make_book):
+    backend.add(make_book(1, عنوان="book", ملاحظات="", **{"عدد الصفحات": 100}))
+    base_version = backend.catalog_version()
+    base = backend.get_book(1).to_dict()
+    backend.update(1, "book", {"ملاحظات": "elsewhere"})
+    # The form sends every field, unchanged ones included
+    backend.update(1, "book", {"ملاحظات": "", "عدد الصفحات": 200}, base=base, base_version=base_version)
+    book = backend.get_book(1)
+    assert book["ملاحظات"] == "elsewhere"
+    assert book["عدد الصفحات"] == 200
+
+
+def test_same_change_on_both_sides_is_not_a_conflict(backend, make_book):
+    backend.add(make_book(1, عنوان="book", **{"عدد الصفحات": 100}))
+    base_version = backend.catalog_version()
+    base = backend.get_book(1).to_dict()
+    backend.update(1, "book", {"عدد الصفحات": 200})
+    backend.update(1, "book", {"عدد الصفحات": 200}, base=base, base_version=base_version)
+    assert backend.get_book(1)["عدد الصفحات"] == 200
+
+
+def test_conflicting_edit_raises(backend, make_book):
+    backend.add(make_book(1, عنوان="book", ملاحظات="", **{"عدد الصفحات": 100}))
+    base_version = backend.catalog_version()
+    base = backend.get_book(1).to_dict()
+    backend.update(1, "book", {"عدد الصفحات": 150})
+    with pytest.raises(storage.EditConflict) as conflict:
+        backend.update(1, "book", {"عدد الصفحات": 200, "ملاحظات": "mine"}, base=base, base_version=base_version)
+    assert conflict.value.key == 1
+    assert conflict.value.columns == ["عدد الصفحات"]
+    book = backend.get_book(1)
+    assert book["عدد الصفحات"] == 150
+    assert book["ملاحظات"] == ""
+
+
+def test_edit_of_deleted_book_raises(backend, make_book):
+    backend.add(make_book(1, عنوان="book"))
+    base_version = backend.catalog_version()
+    base = backend.get_book(1).to_dict()
+    backend.delete([1], "book")
+    with pytest.raises(storage.EditConflict) as conflict:
+        backend.update(1, "book", {"عدد الصفحات": 200}, base=base, base_version=base_version)
+    assert conflict.value.columns == []
+    assert len(backend.load()) == 0
+
+
+def test_lock_is_reentrant_and_exclusive(tmp_path):
+    lock = storage.CatalogLock(str(tmp_path / "books.csv"))
+    entered = threading.Event()
+
+    def other_thread():
+        with lock:
+            entered.set()
+
+    with lock:
+        with lock:
+            thread = threading.Thread(target=other_thread)
+            thread.start()
+            assert not entered.wait(0.2)
+    thread.join(5)
+    assert entered.is_set()
+
+
+# A long write (a bulk import, a CSV compaction) holds the writer lock; a
+# current cache is still served without waiting for it
+def test_cached_load_does_not_wait_for_writers(backend, make_book):
+    backend.add(make_book(1, عنوان="book"))
+    frame = backend.load()
+    holding = threading.Event()
+    release = threading.Event()
+
+    def long_write():
+        with backend.lock:
+            holding.set()
+            release.wait(10)
+
+    thread = threading.Thread(target=long_write)
+    thread.start()
+    try:
+        holding.wait(5)
+        start = time.perf_counter()
+        assert backend.load() is frame
+        assert time.perf_counter() - start < 1
+    finally:
+        release.set()
+        thread.join(5)
@@ -0,0 +1,72 @@
+import os
+import time
+
+import covers
+
+
+def stored_cover(folder, data):
+    name = covers.store_cover(folder, data)
+    covers.wait_for_cover(folder, name)
+    return name
+
+
+def age(path, seconds):
+    old = time.time() - seconds
+    os.utime(path, (old, old))
+
+
+# The same image uploaded twice is stored once
+def test_covers_are_named_by_content(tmp_path, make_image):
+    folder = str(tmp_path)
+    first = stored_cover(folder, make_image(color=(1, 2, 3)))
+    assert stored_cover(folder, make_image(color=(1, 2, 3))) == first
+    second = stored_cover(folder, make_image(color=(3, 2, 1)))
+    assert second != first
+    assert covers.cover_files(folder) == sorted([first, second])
+
+
+def test_unreferenced_covers_are_collected(tmp_path, make_image):
+    folder = str(tmp_path)
+    kept = stored_cover(folder, make_image(color=(1, 1, 1)))
+    orphan = stored_cover(folder, make_image(color=(2, 2, 2)))
+    young = stored_cover(folder, make_image(color=(3, 3, 3)))
+    for name in [kept, orphan]:
+        age(os.path.join(folder, name), covers.GC_GRACE_SECONDS + 60)
+    orphan_thumbnail = covers.thumbnail_name(covers.cover_digest(folder, orphan), "card")
+    age(os.path.join(folder, orphan_thumbnail), covers.GC_GRACE_SECONDS + 60)
+
+    report = covers.collect_garbage(folder, {kept, "gone.png"})
+    assert report["orphaned"] == [orphan]
+    assert report["missing"] == ["gone.png"]
+    assert report["complete"]
+    assert os.path.exists(os.path.join(folder, orphan))
+
+    report = covers.collect_garbage(folder, {kept}, remove=True)
+    assert report["orphaned"] == [orphan]
+    assert covers.cover_files(folder) == sorted([kept, young])
+    assert orphan not in covers.load_manifest(folder)
+    assert os.path.basename(orphan_thumbnail) in report["orphaned_thumbnails"]
+    assert not os.path.exists(os.path.join(folder, orphan_thumbnail))
+
+
+def test_retained_covers_are_kept(tmp_path, make_image):
+    folder = str(tmp_path)
+    name = stored_cover(folder, make_image())
+    report = covers.collect_garbage(folder, set(), remove=True, grace=0, retained={name})
+    assert report["orphaned"] == []
+    assert covers.cover_files(folder) == [name]
+
+
+def test_collection_runs_in_batches(tmp_path, make_image):
+    folder = str(tmp_path)
+    names = [stored_cover(folder, make_image(color=(index, 0, 0))) for index in range(5)]
+    checked = [covers.collect_garbage(folder, set(names), limit=2, grace=0)["checked"] for _ in range(4)]
+    assert checked == [2, 2, 1, 2]
+
+
+def test_manifest_is_kept_on_disk(tmp_path, make_image):
+    folder = str(tmp_path)
+    name = stored_cover(folder, make_image())
+    digest = covers.cover_digest(folder, name)
+    covers.manifests.pop(folder)
+    assert covers.load_manifest(folder)[name]["digest"] == digest
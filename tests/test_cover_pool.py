@@ -0,0 +1,103 @@
+import io
+import os
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+import covers
+
+
+def test_upload_is_normalised_in_the_background(tmp_path, make_image):
+    folder = str(tmp_path)
+    name = covers.store_cover(folder, make_image((2400, 2400), image_format="JPEG"))
+    assert name.endswith(".jpg")
+    covers.wait_for_cover(folder, name)
+    with Image.open(os.path.join(folder, name)) as img:
+        assert img.size == (covers.MAX_COVER_SIZE[0], covers.MAX_COVER_SIZE[0])
+    assert os.path.exists(os.path.join(folder, covers.thumbnail_name(covers.cover_digest(folder, name), "card")))
+
+
+# A photo taken sideways is stored upright
+def test_exif_orientation_is_applied(tmp_path):
+    folder = str(tmp_path)
+    buffer = io.BytesIO()
+    with Image.new("RGB", (300, 200)) as img:
+        exif = img.getexif()
+        exif[0x0112] = 6
+        img.save(buffer, "JPEG", exif=exif)
+    name = covers.store_cover(folder, buffer.getvalue())
+    covers.wait_for_cover(folder, name)
+    with Image.open(os.path.join(folder, name)) as img:
+        assert img.size == (200, 300)
+        assert not covers.needs_normalising(img)
+
+
+def test_cover_is_pending_until_processed(tmp_path, make_image):
+    folder = str(tmp_path)
+    release = threading.Event()
+    blockers = [covers.cover_pool.submit(release.wait) for _ in range(covers.COVER_WORKERS)]
+    try:
+        name = covers.store_cover(folder, make_image())
+        assert covers.pending_covers(folder) == {name}
+        assert not os.path.exists(os.path.join(folder, name))
+        # Uploading the same image again while it is pending queues nothing
+        assert covers.store_cover(folder, make_image()) == name
+    finally:
+        release.set()
+    for blocker in blockers:
+        blocker.result()
+    covers.wait_for_cover(folder, name)
+    assert os.path.exists(os.path.join(folder, name))
+
+
+def test_invalid_cover(tmp_path):
+    with pytest.raises(covers.InvalidCover):
+        covers.store_cover(str(tmp_path), b"not an image")
+    assert os.listdir(tmp_path) == []
+
+
+def test_claim_is_exclusive(tmp_path):
+    path = str(tmp_path / "cover.png")
+    assert covers.claim_cover(path)
+    assert not covers.claim_cover(path)
+
+
+# A claim left by a process that died is taken over once it is old enough
+def test_stale_claim_is_taken_over(tmp_path):
+    path = str(tmp_path / "cover.png")
+    assert covers.claim_cover(path)
+    old = time.time() - covers.CLAIM_TIMEOUT - 1
+    os.utime(path + covers.CLAIM_SUFFIX, (old, old))
+    assert covers.claim_cover(path)
+
+
+def test_reprocess(tmp_path, make_image):
+    folder = str(tmp_path)
+    for index, size in enumerate([(300, 450), (2400, 3600)]):
+        with open(os.path.join(folder, f"cover{index}.png"), "wb") as cover_file:
+            cover_file.write(make_image(size))
+    job = covers.ReprocessJob(folder, workers=1)
+    assert job.future.result(timeout=120) == 2
+    assert job.done() and job.error() is None
+    assert (job.changed, job.failed, job.fraction()) == (1, [], 1.0)
+    with Image.open(os.path.join(folder, "cover1.png")) as img:
+        assert img.size == covers.MAX_COVER_SIZE
+    for name in ["cover0.png", "cover1.png"]:
+        digest = covers.load_manifest(folder)[name]["digest"]
+        assert os.path.exists(os.path.join(folder, covers.thumbnail_name(digest, "card")))
+
+
+# A reprocess job runs on its own executor, so uploads are not queued behind it
+def test_upload_during_reprocess(tmp_path, make_image):
+    folder = str(tmp_path)
+    release = threading.Event()
+    blocker = covers.reprocess_pool.submit(release.wait)
+    try:
+        name = covers.store_cover(folder, make_image())
+        covers.wait_for_cover(folder, name)
+        assert os.path.exists(os.path.join(folder, name))
+    finally:
+        release.set()
+    blocker.result()
@@ -0,0 +1,56 @@
+import pandas as pd
+
+import duplicates
+
+
+def catalog(books):
+    return pd.DataFrame(books, columns=["عنوان", "مؤلف"], index=range(1, len(books) + 1))
+
+
+BOOKS = [
+    ("ثلاثية غرناطة", "رضوى عاشور"),
+    ("الحرب والسلام", "ليو تولستوي"),
+    ("موسم الهجرة إلى الشمال", "الطيب صالح"),
+]
+
+
+def test_key_ignores_diacritics_letter_variants_and_punctuation():
+    assert duplicates.book_key("ثلاثيّة غرناطة", "رضوى عاشور") == duplicates.book_key("ثلاثيه  غرناطه!", "رضوي عاشور")
+    assert duplicates.book_key("ثلاثية غرناطة", "رضوى عاشور") != duplicates.book_key("ثلاثية غرناطة", "الطيب صالح")
+    assert duplicates.book_keys(["ثلاثيّة غرناطة"], ["رضوى عاشور"]) == [duplicates.book_key("ثلاثيّة غرناطة", "رضوى عاشور")]
+
+
+def test_lookup_finds_exact_and_similar_books():
+    index = duplicates.DuplicateIndex()
+    index.rebuild(catalog(BOOKS))
+    exact, misspelt, unrelated = index.lookup([
+        duplicates.book_key("ثلاثيه غرناطه", "رضوي عاشور"),
+        duplicates.book_key("الحرب و السلم", "ليو تولستوى"),
+        duplicates.book_key("الأيام", "طه حسين"),
+    ])
+    assert exact == {"exact": [1], "similar": []}
+    assert misspelt["exact"] == []
+    assert [book_id for book_id, _ in misspelt["similar"]] == [2]
+    assert misspelt["similar"][0][1] >= duplicates.SIMILARITY_THRESHOLD
+    assert unrelated == {"exact": [], "similar": []}
+
+
+def test_lookup_sees_books_added_after_the_build():
+    index = duplicates.DuplicateIndex()
+    df = catalog(BOOKS)
+    index.rebuild(df)
+    index.lookup([duplicates.book_key("الأيام", "طه حسين")])
+    df = pd.concat([df, catalog([("الأيام", "طه حسين")]).set_axis([4])])
+    index.apply([("add", 4, None)], df)
+    assert index.lookup([duplicates.book_key("الايام", "طه حسين")])[0]["exact"] == [4]
+    index.apply([("delete", 4, None)], df.drop(index=[4]))
+    assert index.lookup([duplicates.book_key("الايام", "طه حسين")])[0]["exact"] == []
+
+
+def test_clusters_group_exact_and_similar_books():
+    df = catalog(BOOKS + [("ثلاثيه غرناطه", "رضوي عاشور"), ("الحرب و السلم", "ليو تولستوى")])
+    report = duplicates.duplicate_clusters(df)
+    groups = [sorted(ids) for ids in report.groupby("cluster").groups.values()]
+    assert [1, 4] in groups
+    assert [2, 5] in groups
+    assert 3 not in report.index
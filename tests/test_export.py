@@ -0,0 +1,95 @@
+import io
+import json
+import os
+import tempfile
+import time
+import zipfile
+
+import pandas as pd
+import pytest
+
+import bulk_io
+import storage
+
+
+@pytest.fixture
+def books(backend, make_book):
+    for seed in range(5):
+        backend.add(make_book(seed))
+    return backend.load()
+
+
+@pytest.fixture
+def export_folder(tmp_path, monkeypatch):
+    folder = tmp_path / "exports"
+    folder.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(folder))
+    return folder
+
+
+def test_csv_round_trip(books):
+    out = io.BytesIO()
+    progress = []
+    assert bulk_io.write_export(books, "csv", out, chunk_size=2, progress=progress.append) == 5
+    assert progress == [2, 4, 5]
+    data = out.getvalue()
+    assert data.startswith("\ufeff".encode("utf-8"))
+    exported = pd.read_csv(io.BytesIO(data), encoding="utf-8-sig", index_col=storage.ID_COLUMN)
+    assert exported.index.tolist() == books.index.tolist()
+    assert exported["عنوان"].tolist() == books["عنوان"].tolist()
+    assert list(exported.columns) == list(books.columns)
+
+
+def test_jsonl_round_trip(books):
+    out = io.BytesIO()
+    bulk_io.write_export(books, "jsonl", out, chunk_size=3)
+    records = [json.loads(line) for line in out.getvalue().decode("utf-8").splitlines()]
+    assert [record[storage.ID_COLUMN] for record in records] == books.index.tolist()
+    assert [record["مؤلف"] for record in records] == books["مؤلف"].tolist()
+
+
+def test_parquet_export(books):
+    pytest.importorskip("pyarrow")
+    out = io.BytesIO()
+    bulk_io.write_export(books, "parquet", out, chunk_size=2)
+    exported = pd.read_parquet(io.BytesIO(out.getvalue()))
+    assert exported[storage.ID_COLUMN].tolist() == books.index.tolist()
+
+
+def test_unknown_format(books):
+    with pytest.raises(ValueError):
+        bulk_io.write_export(books, "pdf", io.BytesIO())
+
+
+def test_archive_holds_the_export(books, tmp_path):
+    out = io.BytesIO()
+    bulk_io.write_export_archive(books, "csv", out, str(tmp_path))
+    with zipfile.ZipFile(out) as archive:
+        assert "books.csv" in archive.namelist()
+
+
+def test_export_job(books, export_folder):
+    job = bulk_io.ExportJob(books, "jsonl")
+    job.future.result(timeout=30)
+    assert job.done() and job.error() is None
+    assert job.fraction() == 1.0
+    assert job.file_name.endswith(".jsonl")
+    assert job.size() > 0
+    assert job.path in bulk_io.live_exports
+    job.discard()
+    assert not os.path.exists(job.path)
+    assert job.path not in bulk_io.live_exports
+
+
+def test_stale_exports_removed(books, export_folder):
+    stale = export_folder / f"{bulk_io.EXPORT_PREFIX}old.csv"
+    other = export_folder / "unrelated.csv"
+    for path in (stale, other):
+        path.write_text("x")
+        old = time.time() - bulk_io.EXPORT_MAX_AGE - 60
+        os.utime(path, (old, old))
+    job = bulk_io.ExportJob(books, "csv")
+    job.future.result(timeout=30)
+    assert not stale.exists()
+    assert other.exists()
+    job.remove()
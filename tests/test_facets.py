@@ -0,0 +1,103 @@
+import random
+
+import numpy as np
+import pytest
+
+import benchmark
+import facets
+import storage
+
+
+# Function to compute a faceted query with pandas
+def expected_ids(df, filters, match):
+    masks = []
+    for facet, selected in filters.items():
+        values = facets.facet_column(facet, df[facets.FACETS[facet]])
+        mask = values.between(*selected) if facet == "year" else values.isin(selected)
+        masks.append(mask.fillna(False).to_numpy(bool))
+    if not masks:
+        return df.index.tolist()
+    combined = np.logical_or.reduce(masks) if match == "any" else np.logical_and.reduce(masks)
+    return df.index[combined].tolist()
+
+
+def random_filters(df, rng):
+    filters = {}
+    if rng.random() < 0.5:
+        filters["status"] = rng.sample(storage.STATUSES, rng.randint(1, 2))
+    if rng.random() < 0.5:
+        filters["category"] = rng.sample(storage.CATEGORIES, rng.randint(1, 3))
+    if rng.random() < 0.3:
+        filters["rating"] = rng.sample([1, 2, 3, 4, 5], 2)
+    if rng.random() < 0.3 and len(df):
+        filters["author"] = list(df["مؤلف"].sample(min(3, len(df)), random_state=rng.randint(0, 1000)))
+    if rng.random() < 0.3:
+        filters["year"] = (1900, 1950)
+    return filters
+
+
+# Small growth steps so that the bitmaps are resized during the writes
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    monkeypatch.setattr(facets, "GROWTH_MIN", 8)
+    backend = storage.open_backend("csv", str(tmp_path / "books.csv"))
+    backend.save(benchmark.generate_catalog(200).set_axis(range(1, 201)))
+    return backend
+
+
+def test_queries_match_pandas_after_writes(catalog):
+    rng = random.Random(1)
+    for step in range(60):
+        df = catalog.load()
+        choice = rng.random()
+        if choice < 0.4:
+            catalog.add(benchmark.generate_catalog(1, seed=step).iloc[0].to_dict())
+        elif choice < 0.7:
+            key = rng.choice(df.index.tolist())
+            row = benchmark.generate_catalog(1, seed=1000 + step).iloc[0].to_dict()
+            row.pop("عنوان")
+            catalog.update(key, df.at[key, "عنوان"], row)
+        else:
+            key = rng.choice(df.index.tolist())
+            catalog.delete([key], df.at[key, "عنوان"])
+        filters = random_filters(catalog.load(), rng)
+        match = rng.choice(["all", "any"])
+        result = catalog.facet_query(filters, match)
+        assert result["ids"].tolist() == expected_ids(result["frame"], filters, match)
+
+
+def test_sorted_query(catalog):
+    result = catalog.facet_query({"category": ["أدب"]}, sort="pages", descending=True)
+    df = result["frame"]
+    assert sorted(result["ids"].tolist()) == expected_ids(df, {"category": ["أدب"]}, "all")
+    pages = facets.sort_column("pages", df.loc[result["ids"], "عدد الصفحات"])
+    known = pages[np.isfinite(pages)]
+    assert (np.diff(known) <= 0).all()
+    assert np.isfinite(pages[:len(known)]).all()
+
+
+# Each facet is counted among the books matching the other filters only
+def test_counts(catalog):
+    result = catalog.facet_query({"category": ["أدب"], "status": [storage.STATUSES[0]]})
+    df = result["frame"]
+    nonzero = lambda counts: {value: count for value, count in counts.items() if count}
+    in_category = df[df["تصنيف"] == "أدب"]
+    in_status = df[df["الحالة"] == storage.STATUSES[0]]
+    assert nonzero(result["counts"]["status"]) == in_category["الحالة"].value_counts().to_dict()
+    assert nonzero(result["counts"]["category"]) == in_status["تصنيف"].value_counts().to_dict()
+    both = in_category[in_category["الحالة"] == storage.STATUSES[0]]
+    assert result["counts"]["author"] == both["مؤلف"].value_counts().to_dict()
+
+
+# The category filter lists the categories in use, the standard ones first
+def test_categories_come_from_the_stats(backend, make_book):
+    backend.add(make_book(1, تصنيف="شعر"))
+    backend.add(make_book(2, تصنيف="تاريخ"))
+    backend.add(make_book(3, تصنيف="أدب"))
+    backend.add(make_book(4, تصنيف="رحلات"))
+    assert backend.categories() == ["أدب", "تاريخ", "رحلات", "شعر"]
+    backend.delete([1], backend.get_book(1)["عنوان"])
+    assert backend.categories() == ["أدب", "تاريخ", "رحلات"]
+    other = type(backend)(backend.path)
+    assert other.categories() == ["أدب", "تاريخ", "رحلات"]
+    assert other.cached_frame is None
@@ -0,0 +1,59 @@
+import pandas as pd
+
+import bulk_io
+import storage
+
+
+def test_ids_are_never_reused(backend, make_book):
+    backend.add(make_book(1, عنوان="first"))
+    backend.add(make_book(2, عنوان="second"))
+    backend.delete([2], "second")
+    backend.add(make_book(3, عنوان="third"))
+    df = backend.load()
+    assert df.index.tolist() == [1, 3]
+    assert df.at[3, "عنوان"] == "third"
+
+
+# The highest id handed out survives a restart and a rewrite of the catalog
+def test_ids_continue_after_reopening_and_compaction(tmp_path, make_book):
+    path = str(tmp_path / "books.csv")
+    backend = storage.CsvBackend(path)
+    for seed in range(3):
+        backend.add(make_book(seed, عنوان=f"book {seed}"))
+    backend.delete([3], "book 2")
+    backend.compact()
+    reopened = storage.CsvBackend(path)
+    reopened.add(make_book(9, عنوان="new"))
+    assert reopened.load().index.tolist() == [1, 2, 4]
+
+
+def test_bulk_import_continues_the_ids(backend, make_book, tmp_path):
+    backend.add(make_book(1, عنوان="first"))
+    backend.add(make_book(2, عنوان="second"))
+    backend.delete([2], "second")
+    source = tmp_path / "import.csv"
+    pd.DataFrame({"title": ["imported 1", "imported 2"], "author": ["a", "b"]}).to_csv(source, index=False)
+    bulk_io.import_books(backend, str(source), "csv")
+    backend.add(make_book(3, عنوان="after"))
+    assert backend.load()["عنوان"].to_dict() == {1: "first", 3: "imported 1", 4: "imported 2", 5: "after"}
+
+
+def test_books_with_the_same_title(backend, make_book):
+    backend.add(make_book(1, عنوان="same", مؤلف="one"))
+    backend.add(make_book(2, عنوان="same", مؤلف="two"))
+    backend.add(make_book(3, عنوان="other"))
+    assert backend.ids_for_title("same") == [1, 2]
+    backend.update(2, "same", {"عنوان": "renamed"})
+    assert backend.ids_for_title("same") == [1]
+    assert backend.ids_for_title("renamed") == [2]
+    assert backend.get_book(2)["مؤلف"] == "two"
+
+
+# Data files written before books had ids get ids in file order
+def test_legacy_csv_gets_ids(tmp_path, make_book):
+    path = tmp_path / "books.csv"
+    pd.DataFrame([make_book(1, عنوان="a"), make_book(2, عنوان="b")]).to_csv(path, index=False)
+    backend = storage.CsvBackend(str(path))
+    assert backend.load()["عنوان"].to_dict() == {1: "a", 2: "b"}
+    backend.add(make_book(3, عنوان="c"))
+    assert backend.load().index.tolist() == [1, 2, 3]
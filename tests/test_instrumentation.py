@@ -0,0 +1,52 @@
+import json
+import threading
+
+import instrumentation
+
+
+@instrumentation.timed("work")
+def work(value):
+    instrumentation.count("items", value)
+    return value * 2
+
+
+def test_rerun_records_stages_counters_and_notes():
+    with instrumentation.rerun() as record:
+        with instrumentation.stage("outer"):
+            assert work(2) == 4
+            assert work(3) == 6
+        instrumentation.note("page", 2)
+        instrumentation.count("cache_hits", 3)
+        instrumentation.count("cache_misses")
+    assert record.total_ms >= record.stages["outer"]["ms"] >= record.stages["work"]["ms"]
+    assert record.stages["work"]["calls"] == 2
+    assert record.stages["outer"]["calls"] == 1
+    assert record.counters["items"] == 5
+    data = record.as_dict()
+    assert data["notes"] == {"page": 2}
+    assert data["hit_rates"] == {"cache": 0.75}
+
+
+# Outside a recorded rerun (and on other threads) nothing is recorded
+def test_nothing_recorded_outside_a_rerun():
+    assert work(1) == 2
+    instrumentation.note("page", 1)
+    with instrumentation.rerun() as record:
+        thread = threading.Thread(target=work, args=(5,))
+        thread.start()
+        thread.join()
+    assert record.counters == {}
+    assert record.stages == {}
+
+
+def test_log_is_appended(tmp_path):
+    log_path = str(tmp_path / "timings.jsonl")
+    for page in range(2):
+        with instrumentation.rerun(log_path):
+            instrumentation.note("page", page)
+            work(1)
+    with open(log_path, encoding="utf-8") as log_file:
+        records = [json.loads(line) for line in log_file]
+    assert [record["notes"]["page"] for record in records] == [0, 1]
+    assert records[0]["stages"]["work"]["calls"] == 1
+    assert records[0]["total_ms"] > 0
@@ -0,0 +1,77 @@
+import os
+
+import storage
+
+
+def test_journal_replay(tmp_path, make_book):
+    path = str(tmp_path / "books.csv")
+    writer = storage.CsvBackend(path)
+    for seed in range(3):
+        writer.add(make_book(seed, عنوان=f"book {seed}"))
+    writer.update(2, "book 1", {"عدد الصفحات": 321})
+    writer.delete([1], "book 0")
+    expected = writer.load()
+    assert len(storage.read_journal(path)) == 5
+
+    # A second process sees the same catalog by replaying the journal
+    replayed = storage.CsvBackend(path).load()
+    assert replayed.index.tolist() == [2, 3]
+    assert replayed.at[2, "عدد الصفحات"] == 321
+    assert replayed["عنوان"].tolist() == expected["عنوان"].tolist()
+
+    assert writer.compact()
+    assert not os.path.exists(storage.journal_path(path))
+    compacted = storage.CsvBackend(path).load()
+    assert compacted["عنوان"].tolist() == expected["عنوان"].tolist()
+
+
+# An edit recorded against a title the book no longer has is dropped on replay
+def test_replay_skips_edit_of_replaced_book(tmp_path, make_book):
+    path = str(tmp_path / "books.csv")
+    writer = storage.CsvBackend(path)
+    writer.add(make_book(1, عنوان="old"))
+    writer.update(1, "old", {"عنوان": "new"})
+    writer.update(1, "old", {"عدد الصفحات": 999})
+    book = storage.CsvBackend(path).load().loc[1]
+    assert book["عنوان"] == "new"
+    assert book["عدد الصفحات"] != 999
+
+
+def test_torn_last_line_is_dropped(tmp_path, make_book):
+    path = str(tmp_path / "books.csv")
+    writer = storage.CsvBackend(path)
+    writer.add(make_book(1, عنوان="kept"))
+    with open(storage.journal_path(path), "a", encoding="utf-8") as journal:
+        journal.write('{"op": "add", "key": 2, "row": {"عنو')
+    assert storage.CsvBackend(path).load()["عنوان"].tolist() == ["kept"]
+
+
+# A journal started against an older data file has already been folded in
+def test_journal_of_an_older_data_file_is_ignored(tmp_path, make_book):
+    path = str(tmp_path / "books.csv")
+    writer = storage.CsvBackend(path, mode="full")
+    writer.add(make_book(1, عنوان="saved"))
+    with open(storage.journal_path(path), "w", encoding="utf-8") as journal:
+        journal.write('{"base": [0, 0, 0]}\n{"op": "delete", "keys": [1], "title": "saved"}\n')
+    assert storage.read_journal(path) == []
+    assert storage.CsvBackend(path).load()["عنوان"].tolist() == ["saved"]
+
+
+def test_full_mode_rewrites_the_data_file(tmp_path, make_book):
+    path = str(tmp_path / "books.csv")
+    writer = storage.CsvBackend(path, mode="full")
+    writer.add(make_book(1, عنوان="book"))
+    writer.update(1, "book", {"عدد الصفحات": 50})
+    assert not os.path.exists(storage.journal_path(path))
+    assert writer.read_all().at[1, "عدد الصفحات"] == 50
+
+
+def test_long_journal_is_compacted_in_the_background(tmp_path, make_book, monkeypatch):
+    monkeypatch.setattr(storage, "JOURNAL_COMPACT_THRESHOLD", 3)
+    path = str(tmp_path / "books.csv")
+    writer = storage.CsvBackend(path)
+    for seed in range(3):
+        writer.add(make_book(seed, عنوان=f"book {seed}"))
+    storage.compaction_threads[path].join(10)
+    assert storage.read_journal(path) == []
+    assert storage.CsvBackend(path).load()["عنوان"].tolist() == ["book 0", "book 1", "book 2"]
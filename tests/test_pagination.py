@@ -0,0 +1,34 @@
+# Function to count the book cards on the page
+def card_count(at):
+    return sum(block.value.count('<div class="book-card">') for block in at.markdown)
+
+
+# Function to get the "page x of y" line
+def page_line(at):
+    return next(block.value for block in at.markdown if block.value.startswith("<p>صفحة"))
+
+
+def test_pages(app):
+    at = app(books=45)
+    assert not at.exception
+    assert card_count(at) == 10
+    assert page_line(at) == "<p>صفحة 1 من 5</p>"
+
+    next(button for button in at.button if button.label == "التالي").click().run()
+    assert page_line(at) == "<p>صفحة 2 من 5</p>"
+    at.number_input(key="view_page").set_value(5).run()
+    assert card_count(at) == 5
+    assert page_line(at) == "<p>صفحة 5 من 5</p>"
+
+
+def test_changing_the_page_size_or_filters_goes_back_to_the_first_page(app):
+    at = app(books=45)
+    at.number_input(key="view_page").set_value(3).run()
+    at.selectbox(key="view_page_size").set_value(20).run()
+    assert page_line(at) == "<p>صفحة 1 من 3</p>"
+    assert card_count(at) == 20
+
+    at.number_input(key="view_page").set_value(3).run()
+    at.selectbox(key="view_page_size").set_value(50).run()
+    assert page_line(at) == "<p>صفحة 1 من 1</p>"
+    assert card_count(at) == 45
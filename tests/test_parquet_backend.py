@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+import storage
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+@pytest.fixture
+def parquet(tmp_path):
+    return storage.ParquetBackend(str(tmp_path / "books.parquet"))
+
+
+# A new CSV catalog lives only in its journal until it is first compacted
+def test_csv_catalog_is_migrated_on_first_use(tmp_path, make_book):
+    csv_path = str(tmp_path / "books.csv")
+    csv = storage.CsvBackend(csv_path)
+    for seed in range(3):
+        csv.add(make_book(seed, عنوان=f"book {seed}"))
+    csv.delete([2], "book 1")
+    parquet_path = str(tmp_path / "books.parquet")
+    backend = storage.open_backend("parquet", parquet_path, csv_path=csv_path)
+    assert backend.load()["عنوان"].to_dict() == {1: "book 0", 3: "book 2"}
+    assert backend.next_id() == 4
+
+
+def test_read_only_some_columns(parquet, make_book):
+    for seed in range(3):
+        parquet.add(make_book(seed))
+    df = parquet.read_table(["مؤلف", "التقييم"])
+    assert list(df.columns) == ["مؤلف", "التقييم"]
+    assert df.index.tolist() == [1, 2, 3]
+    assert df["التقييم"].dtype == "Int8"
+
+
+def test_missing_file_reads_empty(parquet):
+    assert parquet.load().empty
+    assert list(parquet.read_table(["مؤلف"]).columns) == ["مؤلف"]
+
+
+def test_row_groups(parquet, make_book, monkeypatch):
+    monkeypatch.setattr(storage, "PARQUET_ROW_GROUP_SIZE", 2)
+    writer = parquet.bulk_writer()
+    writer.write(pd.DataFrame([make_book(seed) for seed in range(5)]))
+    assert writer.commit() == 5
+    assert pq.ParquetFile(parquet.path).metadata.num_row_groups == 3
+    assert parquet.load().index.tolist() == [1, 2, 3, 4, 5]
+
+
+# A write by another process (here another backend object) is seen on the
+# next load
+def test_reload_after_outside_write(parquet, make_book):
+    parquet.add(make_book(1, عنوان="first"))
+    assert parquet.load()["عنوان"].tolist() == ["first"]
+    storage.ParquetBackend(parquet.path).add(make_book(2, عنوان="second"))
+    assert parquet.load()["عنوان"].tolist() == ["first", "second"]
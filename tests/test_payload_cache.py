@@ -0,0 +1,64 @@
+import base64
+import os
+
+from covers import PayloadCache
+
+
+def write(folder, name, data):
+    path = os.path.join(folder, name)
+    with open(path, "wb") as out:
+        out.write(data)
+    return path
+
+
+def test_hit_after_miss(tmp_path):
+    path = write(str(tmp_path), "a.webp", b"a" * 30)
+    cache = PayloadCache(1000)
+    assert cache.get(path) == base64.b64encode(b"a" * 30).decode()
+    assert cache.get(path) == base64.b64encode(b"a" * 30).decode()
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"], stats["bytes"]) == (1, 1, 1, 40)
+
+
+def test_least_recently_used_is_evicted(tmp_path):
+    folder = str(tmp_path)
+    paths = [write(folder, f"{name}.webp", name.encode() * 30) for name in "abc"]
+    cache = PayloadCache(100)
+    cache.get(paths[0])
+    cache.get(paths[1])
+    cache.get(paths[0])
+    cache.get(paths[2])
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] <= 100
+    cache.get(paths[0])
+    assert cache.stats()["hits"] == 2
+
+
+def test_replaced_file_is_not_served_stale(tmp_path):
+    path = write(str(tmp_path), "a.webp", b"old")
+    cache = PayloadCache(1000)
+    cache.get(path)
+    os.utime(path, ns=(1, 1))
+    write(str(tmp_path), "a.webp", b"new")
+    assert cache.get(path) == base64.b64encode(b"new").decode()
+    assert cache.stats()["entries"] == 1
+
+
+def test_oversized_and_missing_files_are_not_kept(tmp_path):
+    path = write(str(tmp_path), "big.webp", b"x" * 300)
+    cache = PayloadCache(100)
+    assert cache.get(path)
+    assert cache.stats()["entries"] == 0
+    os.remove(path)
+    assert cache.get(path) is None
+
+
+def test_resize_evicts(tmp_path):
+    folder = str(tmp_path)
+    cache = PayloadCache(1000)
+    for name in "abc":
+        cache.get(write(folder, f"{name}.webp", name.encode() * 30))
+    cache.resize(50)
+    assert cache.stats()["entries"] == 1
+    cache.invalidate(os.path.join(folder, "c.webp"))
+    assert cache.stats()["bytes"] == 0
@@ -0,0 +1,73 @@
+import pandas as pd
+
+from search_index import SearchIndex, normalize_arabic, tokenize
+
+
+def catalog(books):
+    return pd.DataFrame(books, columns=["عنوان", "مؤلف", "ملاحظات"], index=range(1, len(books) + 1))
+
+
+BOOKS = [
+    ("الأيام", "طه حسين", "سيرة ذاتية"),
+    ("ثلاثية غرناطة", "رضوى عاشور", ""),
+    ("رواية عن الأيام الأخيرة", "كاتب آخر", ""),
+    ("مدن الملح", "عبد الرحمن منيف", "عن الأيام الأولى للنفط"),
+]
+
+
+def index_of(books):
+    index = SearchIndex()
+    index.rebuild(catalog(books))
+    return index
+
+
+def test_normalisation():
+    assert normalize_arabic("أَحْمَد") == "احمد"
+    assert normalize_arabic("مدرسةٌ") == "مدرسه"
+    assert normalize_arabic("كتـــاب") == "كتاب"
+    assert normalize_arabic("مستشفى") == "مستشفي"
+    assert normalize_arabic(None) == ""
+    assert tokenize("إلى الأبد!") == ["الي", "الابد"]
+
+
+def test_article_and_letter_variants_match():
+    index = index_of(BOOKS)
+    assert 1 in index.search("ايام")
+    assert 1 in index.search("الايام")
+    assert index.search("غرناطه") == [2]
+
+
+def test_every_term_must_match():
+    index = index_of(BOOKS)
+    assert index.search("الأيام طه") == [1]
+    assert index.search("الأيام غرناطة") == []
+    assert index.search("") == []
+
+
+def test_title_matches_rank_above_notes():
+    index = index_of(BOOKS)
+    ranked = index.search("الأيام")
+    assert set(ranked) == {1, 3, 4}
+    assert ranked[-1] == 4
+    assert index.search("الأيام", limit=2) == ranked[:2]
+
+
+def test_prefix_and_fuzzy_matches():
+    index = index_of(BOOKS)
+    assert index.search("غرن") == [2]
+    assert index.search("غرناظة") == []
+    assert index.search("غرناظة", fuzzy=True) == [2]
+
+
+def test_apply_follows_edits_and_deletes():
+    df = catalog(BOOKS)
+    index = SearchIndex()
+    index.rebuild(df)
+    df = df.copy()
+    df.loc[2, "عنوان"] = "الطنطورية"
+    index.apply([("edit", 2, None)], df)
+    assert index.search("غرناطة") == []
+    assert index.search("الطنطورية") == [2]
+    index.apply([("delete", 1, None)], df.drop(index=[1]))
+    assert 1 not in index.search("الأيام")
+    assert "طه" not in index.vocabulary
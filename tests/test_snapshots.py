@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+import snapshots
+
+COMPARED = ["عنوان", "مؤلف", "عدد الصفحات"]
+
+
+# Function to get the compared fields of every book, by id
+def catalog(backend):
+    return backend.load()[COMPARED].to_dict("index")
+
+
+def test_restore_undoes_later_writes(backend, make_book):
+    for seed in range(3):
+        backend.add(make_book(seed, عنوان=f"book {seed}"))
+    before = catalog(backend)
+    at = snapshots.timestamp()
+    time.sleep(0.01)
+    backend.update(1, "book 0", {"عدد الصفحات": 999})
+    backend.delete([2], "book 1")
+    backend.add(make_book(9, عنوان="later"))
+    after = catalog(backend)
+
+    restored_at = snapshots.timestamp()
+    time.sleep(0.01)
+    assert backend.restore(at) == 3
+    assert catalog(backend) == before
+
+    # The restore is a write too, so it can be undone
+    backend.restore(restored_at)
+    assert catalog(backend) == after
+
+def test_restore_without_later_writes_changes_nothing(backend, make_book):
+    backend.add(make_book(1, عنوان="book"))
+    version = backend.catalog_version()
+    assert backend.restore(snapshots.timestamp()) == 0
+    assert backend.catalog_version() == version
+
+
+def test_restore_past_horizon_raises(backend, make_book, monkeypatch):
+    # Every write starts a new segment and only the newest one is kept
+    monkeypatch.setattr(snapshots, "SEGMENT_BYTES", 1)
+    backend.snapshots.max_bytes = 1
+    backend.add(make_book(1, عنوان="first"))
+    at = snapshots.timestamp()
+    time.sleep(0.01)
+    backend.add(make_book(2, عنوان="second"))
+    backend.add(make_book(3, عنوان="third"))
+    assert len(backend.snapshots.segments()) == 1
+    assert backend.snapshots.horizon() > at
+    with pytest.raises(snapshots.SnapshotExpired):
+        backend.restore(at)
+    assert len(backend.load()) == 3
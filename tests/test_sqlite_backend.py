@@ -0,0 +1,53 @@
+import sqlite3
+
+import pytest
+
+import storage
+
+
+# Every backend offers the same per-book writes
+def test_add_update_delete(backend, make_book):
+    backend.add(make_book(1, عنوان="first"))
+    backend.add(make_book(2, عنوان="second"))
+    backend.update(1, "first", {"عدد الصفحات": 42, "الحالة": "تمت القراءة"})
+    backend.delete([2], "second")
+    reloaded = type(backend)(backend.path).load()
+    assert reloaded.index.tolist() == [1]
+    assert reloaded.at[1, "عدد الصفحات"] == 42
+    assert reloaded.at[1, "الحالة"] == "تمت القراءة"
+    assert backend.get_book(2) is None
+
+
+# An edit or delete naming a title the book no longer has changes nothing
+def test_write_checks_the_title(backend, make_book):
+    backend.add(make_book(1, عنوان="book"))
+    backend.update(1, "another title", {"عدد الصفحات": 42})
+    backend.delete([1], "another title")
+    assert backend.get_book(1)["عدد الصفحات"] != 42
+
+
+def test_csv_catalog_is_migrated_on_first_use(tmp_path, make_book):
+    csv_path = str(tmp_path / "books.csv")
+    csv = storage.CsvBackend(csv_path)
+    for seed in range(3):
+        csv.add(make_book(seed, عنوان=f"book {seed}"))
+    csv.delete([2], "book 1")
+    db_path = str(tmp_path / "books.db")
+    backend = storage.open_backend("sqlite", db_path, csv_path=csv_path)
+    assert backend.load()["عنوان"].to_dict() == {1: "book 0", 3: "book 2"}
+    assert storage.open_backend("sqlite", db_path, csv_path=csv_path) is backend
+
+
+def test_indexed_columns(tmp_path):
+    path = str(tmp_path / "books.db")
+    storage.SqliteBackend(path)
+    with sqlite3.connect(path) as conn:
+        indexed = {row[0] for row in conn.execute(
+            "SELECT ii.name FROM sqlite_master AS m, pragma_index_info(m.name) AS ii WHERE m.type = 'index' AND m.tbl_name = 'books'"
+        )}
+    assert indexed == set(storage.INDEXED_COLUMNS)
+
+
+def test_unknown_backend(tmp_path):
+    with pytest.raises(ValueError):
+        storage.open_backend("xml", str(tmp_path / "books.xml"))
@@ -0,0 +1,49 @@
+import os
+import time
+
+import covers
+
+
+def thumbnail(folder, make_image):
+    with open(os.path.join(folder, "cover.png"), "wb") as cover_file:
+        cover_file.write(make_image())
+    return covers.get_thumbnail(folder, "cover.png")
+
+
+def test_static_url(tmp_path, make_image):
+    folder = str(tmp_path / "books")
+    os.makedirs(folder)
+    static_folder = str(tmp_path / "static" / "covers")
+    name = thumbnail(folder, make_image)
+    url = covers.static_url(folder, name, static_folder, "app/static/covers")
+    published = os.path.basename(name)
+    assert url == f"app/static/covers/{published}?v={covers.cover_digest(folder, 'cover.png')}"
+    with open(os.path.join(static_folder, published), "rb") as static_file, open(os.path.join(folder, name), "rb") as thumbnail_file:
+        assert static_file.read() == thumbnail_file.read()
+
+
+# A published thumbnail never changes, so it is only written once
+def test_published_once(tmp_path, make_image):
+    folder = str(tmp_path / "books")
+    os.makedirs(folder)
+    static_folder = str(tmp_path / "static")
+    name = thumbnail(folder, make_image)
+    published = os.path.join(static_folder, covers.publish_thumbnail(folder, name, static_folder))
+    os.utime(published, ns=(1, 1))
+    covers.publish_thumbnail(folder, name, static_folder)
+    assert os.stat(published).st_mtime_ns == 1
+    assert [entry for entry in os.listdir(static_folder) if entry.endswith(".tmp")] == []
+
+
+def test_collected_thumbnails_are_unpublished(tmp_path, make_image):
+    folder = str(tmp_path / "books")
+    os.makedirs(folder)
+    static_folder = str(tmp_path / "static")
+    name = thumbnail(folder, make_image)
+    published = covers.publish_thumbnail(folder, name, static_folder)
+    old = time.time() - 60
+    for path in [os.path.join(folder, "cover.png"), os.path.join(folder, name)]:
+        os.utime(path, (old, old))
+    report = covers.collect_garbage(folder, set(), remove=True, grace=0, static_folder=static_folder)
+    assert published in report["orphaned_thumbnails"]
+    assert not os.path.exists(os.path.join(static_folder, published))
@@ -0,0 +1,68 @@
+import io
+import os
+
+from PIL import Image
+
+import covers
+
+
+def write_cover(folder, name, data):
+    with open(os.path.join(folder, name), "wb") as cover_file:
+        cover_file.write(data)
+    return name
+
+
+def test_card_thumbnail_is_made_once(tmp_path, make_image):
+    folder = str(tmp_path)
+    name = write_cover(folder, "cover.png", make_image((600, 600)))
+    thumbnail = covers.get_thumbnail(folder, name)
+    assert thumbnail.startswith(covers.THUMBNAIL_FOLDER)
+    path = os.path.join(folder, thumbnail)
+    with Image.open(path) as img:
+        assert img.size == covers.THUMBNAIL_SIZES["card"]
+    written = os.stat(path).st_mtime_ns
+    assert covers.get_thumbnail(folder, name) == thumbnail
+    assert os.stat(path).st_mtime_ns == written
+
+
+# Thumbnails are named by content, so covers with the same image share them
+# and a replaced cover gets new ones
+def test_thumbnails_follow_the_content(tmp_path, make_image):
+    folder = str(tmp_path)
+    first = covers.get_thumbnail(folder, write_cover(folder, "a.png", make_image(color=(1, 2, 3))))
+    assert covers.get_thumbnail(folder, write_cover(folder, "b.png", make_image(color=(1, 2, 3)))) == first
+    # The new image has the same size, so make sure the modification time moves
+    os.utime(os.path.join(folder, "a.png"), ns=(1, 1))
+    write_cover(folder, "a.png", make_image(color=(9, 9, 9)))
+    assert covers.get_thumbnail(folder, "a.png") != first
+
+
+def test_missing_or_unreadable_cover(tmp_path):
+    folder = str(tmp_path)
+    assert covers.get_thumbnail(folder, None) is None
+    assert covers.get_thumbnail(folder, "gone.png") is None
+    assert covers.get_thumbnail(folder, write_cover(folder, "broken.png", b"not an image")) is None
+
+
+def test_transparent_cover_is_flattened(tmp_path, make_image):
+    folder = str(tmp_path)
+    name = write_cover(folder, "logo.png", make_image(color=(0, 0, 0, 0), mode="RGBA"))
+    with Image.open(os.path.join(folder, covers.get_thumbnail(folder, name))) as img:
+        assert img.mode == "RGB"
+        assert img.getpixel((10, 10)) > (240, 240, 240)
+
+
+def test_preview_keeps_the_aspect_ratio_and_the_upload(make_image):
+    upload = io.BytesIO(make_image((300, 600)))
+    preview = covers.preview_thumbnail(upload)
+    assert preview.size == (150, 300)
+    assert upload.tell() == 0
+
+
+def test_backfill(tmp_path, make_image):
+    folder = str(tmp_path)
+    for number in range(3):
+        write_cover(folder, f"c{number}.png", make_image(color=(number, 0, 0)))
+    assert covers.backfill_thumbnails(folder) == 3
+    assert covers.backfill_thumbnails(folder) == 0
+    assert os.path.exists(os.path.join(folder, covers.THUMBNAIL_FOLDER, covers.MANIFEST_FILE))